@@ -0,0 +1,234 @@
+"""
+Content-addressed cache of analysis results on local disk.
+
+An entry is keyed by the SHA-256 of each view's video bytes, the pipeline
+version and the analysis parameters, and holds the per-view DataFrames,
+the fused DataFrame and metrics, and the uploaded artifact URLs.
+
+Hashing needs the bytes, so the cache also remembers url -> content hash
+together with the HTTP validators (ETag / Last-Modified / Content-Length)
+the URL was served with. A re-run only has to send a HEAD request per view
+to find its result.
+
+The cache is bounded to ANALYSIS_CACHE_MAX_BYTES; least recently used
+entries are evicted first.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "./analysis_cache")
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_url(url: str) -> Optional[str]:
+    """SHA-256 of the bytes served at url (streamed, nothing written to disk)."""
+    import requests
+    try:
+        hasher = hashlib.sha256()
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    except Exception as e:
+        print(f"Could not hash {url}: {e}")
+        return None
+
+
+def url_validators(url: str) -> Optional[dict]:
+    """
+    HTTP validators of url from a HEAD request, or None if the server gives
+    neither an ETag nor a Last-Modified (then the URL cannot be trusted to
+    still serve the same bytes).
+    """
+    import requests
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=10)
+        response.raise_for_status()
+    except Exception:
+        return None
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_length": response.headers.get("Content-Length"),
+    }
+    if not validators["etag"] and not validators["last_modified"]:
+        return None
+    return validators
+
+
+class AnalysisCache:
+    """Size-bounded LRU cache of analysis results, see module docstring."""
+
+    META_FILE = "meta.json"
+
+    def __init__(self, root: str = ANALYSIS_CACHE_DIR, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(root, "entries")
+        self.urls_dir = os.path.join(root, "urls")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.urls_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(video_hashes: dict, pipeline_version: str, params: dict) -> str:
+        """
+        Cache key of one analysis.
+
+        Args:
+            video_hashes: {view_name: content hash}; the view set is part of the key
+            pipeline_version: Bumped whenever the pipeline output changes
+            params: Analysis parameters (volume, fps override, ...)
+        """
+        payload = {"views": video_hashes, "pipeline": pipeline_version, "params": params}
+        return _sha256(json.dumps(payload, sort_keys=True, default=str))
+
+    # ---- url -> content hash index ----
+
+    def _url_path(self, url: str) -> str:
+        return os.path.join(self.urls_dir, _sha256(url) + ".json")
+
+    def remember_url(self, url: str, content_hash: str, validators: dict = None):
+        """Records the content hash of url, if the server provides validators."""
+        if validators is None:
+            validators = url_validators(url)
+        if validators is None:
+            return
+        record = {"url": url, "content_hash": content_hash, "validators": validators}
+        self._write_json(self._url_path(url), record)
+
+    def known_content_hash(self, url: str) -> Optional[str]:
+        """
+        Content hash of url if it was seen before and the server still
+        reports the same validators, else None.
+        """
+        path = self._url_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("url") != url or url_validators(url) != record.get("validators"):
+            return None
+        return record.get("content_hash")
+
+    # ---- result entries ----
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the cached payload ({'result', 'metrics', 'final_df', 'view_dfs'})
+        or None, and marks the entry as recently used.
+        """
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, self.META_FILE)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            payload = {
+                "result": meta["result"],
+                "metrics": meta["metrics"],
+                "final_df": pd.read_pickle(os.path.join(entry_dir, "final.pkl")),
+                "view_dfs": {
+                    view: pd.read_pickle(os.path.join(entry_dir, f"view_{view}.pkl"))
+                    for view in meta["views"]
+                },
+            }
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(entry_dir):
+                print(f"Discarding unreadable cache entry {key}: {e}")
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        # LRU order is the mtime of the meta file
+        os.utime(meta_path)
+        return payload
+
+    def put(self, key: str, result: dict, metrics: dict, final_df: pd.DataFrame, view_dfs: dict):
+        """
+        Stores one analysis, then evicts least recently used entries until the
+        cache fits in max_bytes. The entry is written to a temporary directory
+        and renamed into place, so readers never see a partial entry.
+        """
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.entries_dir)
+        try:
+            final_df.to_pickle(os.path.join(tmp_dir, "final.pkl"))
+            for view, df in view_dfs.items():
+                df.to_pickle(os.path.join(tmp_dir, f"view_{view}.pkl"))
+            meta = {"result": result, "metrics": metrics, "views": sorted(view_dfs)}
+            self._write_json(os.path.join(tmp_dir, self.META_FILE), meta)
+
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # Another worker stored the same key first, or the disk is full
+            print(f"Could not store cache entry {key}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.entries_dir):
+            entry_dir = os.path.join(self.entries_dir, name)
+            meta_path = os.path.join(entry_dir, self.META_FILE)
+            if name.startswith(".tmp_"):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir)
+                )
+                entries.append((os.path.getmtime(meta_path), size, entry_dir))
+            except OSError:
+                # Removed or replaced by another worker meanwhile
+                continue
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        # Unique temp name: several workers may write the same record
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+
+_cache = None
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Process-wide cache instance, or None when disabled (ANALYSIS_CACHE_MAX_BYTES=0)."""
+    global _cache
+    if ANALYSIS_CACHE_MAX_BYTES <= 0:
+        return None
+    if _cache is None:
+        _cache = AnalysisCache()
+    return _cache
@@ -7,6 +7,9 @@ import os
 import json
 import tempfile
 import shutil
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Add paths for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -16,25 +19,56 @@ import pandas as pd
 import numpy as np
 
 from src.calibration import compute_pixel_to_cm_scale
-from src.preprocess import read_video_frames
-from src.segmentation import StreamSegmenter
-from src.tracking import StreamTracker
+from src.preprocess import read_video_frames, is_stream_url, TruncatedVideoError, DEFAULT_PREFETCH_DEPTH
 from src.flow_estimation import FlowEstimator
-from src.visualize import Visualizer
+from src.frame_analysis import FrameAnalyzer
+from src.sampling import IDLE_STRIDE
+from src.sharding import plan_shards, analyse_sharded, DEFAULT_WARMUP_FRAMES
+from src.visualize import Visualizer, find_ffmpeg
 from src.utils import generate_clinical_report_plot
 from src.ensemble import EnsembleAggregator
+from src.timing import StageTimer, format_timings
 from cloudinary_service import upload_video, upload_image, upload_raw
+from analysis_cache import AnalysisCache, get_analysis_cache, hash_url
 
 
-def download_video(url: str, local_path: str) -> bool:
-    """Download video from URL to local path."""
+# How a view's video gets to the decoder:
+# "stream" decodes straight from the URL while bytes arrive (falls back to
+# "download" if the server cannot be streamed from); "download" fetches the
+# whole file first.
+INGEST_MODES = ("stream", "download")
+
+# Part of the analysis cache key: bump whenever a pipeline change alters
+# the results, so stale cache entries stop matching
+PIPELINE_VERSION = "3"
+
+# Time shards per view analysed in parallel processes (metrics-only runs,
+# see src.sharding). Each shard re-analyses SHARD_WARMUP_FRAMES frames, so
+# this only pays off with spare cores beyond ANALYSIS_WORKER_CONCURRENCY.
+VIEW_SHARDS = int(os.getenv("ANALYSIS_VIEW_SHARDS", "1"))
+SHARD_WARMUP_FRAMES = int(os.getenv("ANALYSIS_SHARD_WARMUP_FRAMES", str(DEFAULT_WARMUP_FRAMES)))
+
+
+def download_video(url: str, local_path: str, hasher=None) -> bool:
+    """
+    Download video from URL to local path.
+    If a hashlib object is given, it is fed the bytes as they arrive.
+    """
     import requests
     try:
         response = requests.get(url, stream=True)
         response.raise_for_status()
+        expected = int(response.headers.get("Content-Length", 0))
+        received = 0
         with open(local_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
+                received += len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+        if expected and received != expected:
+            print(f"Error downloading video: truncated ({received} of {expected} bytes)")
+            return False
         return True
     except Exception as e:
         print(f"Error downloading video: {e}")
@@ -49,12 +83,8 @@ def convert_to_browser_compatible(input_path: str, output_path: str) -> bool:
     import subprocess
     
     try:
-        # Try to get FFmpeg from imageio-ffmpeg (bundled)
-        try:
-            import imageio_ffmpeg
-            ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
-        except ImportError:
-            ffmpeg_path = 'ffmpeg'  # Fallback to system FFmpeg
+        # FFmpeg from imageio-ffmpeg (bundled), else system FFmpeg
+        ffmpeg_path = find_ffmpeg()
         
         # FFmpeg command to convert to H.264
         # -y: overwrite output
@@ -98,21 +128,47 @@ def convert_to_browser_compatible(input_path: str, output_path: str) -> bool:
         return False
 
 
-def process_single_video(video_path, output_dir, view_name="top", fps_override=None):
+def process_single_video(video_path, output_dir, view_name="top", fps_override=None,
+                         prefetch_depth=DEFAULT_PREFETCH_DEPTH, velocity_backend="farneback",
+                         progress_callback=None, timer=None, render_video=True, idle_stride=IDLE_STRIDE,
+                         decoder="cv2", shards=1, shard_warmup_frames=SHARD_WARMUP_FRAMES):
     """
     Runs the CV pipeline on a single video.
-    Returns: dict with df, metrics, px_to_cm
+    video_path may be an http(s) URL, in which case frames are decoded as
+    they arrive and a truncated stream raises TruncatedVideoError.
+    progress_callback(frames_done, frames_total) is called after every frame
+    (frames_total is 0 if the container does not declare it).
+    timer: StageTimer to record stage times into (a new one if None).
+    render_video: Write the annotated video; False skips the Visualizer
+        entirely (metrics-only mode).
+    idle_stride: While no stream is seen only every idle_stride-th frame (or a
+        frame with enough foreground) is analysed, see src.sampling.AdaptiveSampler.
+        1 analyses every frame.
+    decoder: One of src.preprocess.DECODERS, used when frames are downscaled
+        ("ffmpeg" scales during decode and falls back to OpenCV).
+    shards: Split a local video into this many time shards analysed in
+        parallel processes, each after shard_warmup_frames warm-up frames
+        (metrics only; ignored for URLs and when render_video is set).
+    Returns: dict with df, metrics, px_to_cm, timings (per-stage summary)
+        and, when rendering, annotated_video / annotated_video_browser_ready
     """
-    if not video_path or not os.path.exists(video_path):
+    streaming = bool(video_path) and is_stream_url(video_path)
+    if not video_path or (not streaming and not os.path.exists(video_path)):
         print(f"[{view_name.upper()}] Video not found: {video_path}")
         return None
         
     print(f"[{view_name.upper()}] Starting Analysis: {video_path}")
+    timer = timer if timer is not None else StageTimer()
+    start = timer.now()
     
     # Default calibration (no calibration image needed, use fallback)
     px_to_cm = 0.052  # Default fallback
         
     cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"[{view_name.upper()}] Could not open video: {video_path}")
+        return None
+    total_frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
     fps = cap.get(cv2.CAP_PROP_FPS)
     if fps_override: 
         fps = fps_override
@@ -132,43 +188,247 @@ def process_single_video(video_path, output_dir, view_name="top", fps_override=N
         height = int(height / scale_factor)
         px_to_cm *= scale_factor
         
-    segmenter = StreamSegmenter()
-    tracker = StreamTracker(px_to_cm)
-    estimator = FlowEstimator()
+    # Time shards seek in a local file and only give the metrics
+    plan = None
+    if shards > 1 and not render_video and not streaming:
+        plan = plan_shards(total_frames, shards, shard_warmup_frames)
+    if plan is not None and len(plan) > 1:
+        print(f"[{view_name.upper()}] Analysing {len(plan)} time shards in parallel "
+              f"({shard_warmup_frames} warm-up frames each)")
+        with timer.stage("shards"):
+            estimator, counts = analyse_sharded(video_path, plan, (width, height), fps, px_to_cm,
+                                                velocity_backend, idle_stride, prefetch_depth, timer)
+        if progress_callback:
+            progress_callback(len(estimator), total_frames)
+        if idle_stride > 1:
+            print(f"[{view_name.upper()}] Analysed {counts['analysed']} frames (incl. warm-up), "
+                  f"skipped {counts['skipped']} idle frames")
+    else:
+        analyzer = FrameAnalyzer(px_to_cm, velocity_backend, idle_stride, timer)
+        estimator = FlowEstimator(online=True)
     
-    # Intermediate visualization
-    out_vid_name = f"annotated_{view_name}.mp4"
-    out_vid_path = os.path.join(output_dir, out_vid_name)
-    visualizer = Visualizer(out_vid_path, fps, (width, height))
+        # Intermediate visualization
+        visualizer = None
+        if render_video:
+            out_vid_name = f"annotated_{view_name}.mp4"
+            out_vid_path = os.path.join(output_dir, out_vid_name)
+            # Encoded straight to browser-ready H.264 (falls back to mp4v without FFmpeg)
+            visualizer = Visualizer(out_vid_path, fps, (width, height), encoder="h264")
     
-    frame_gen = read_video_frames(video_path, resize_shape=(width, height))
+        # Decode-ahead on a background thread (0 = decode inline)
+        # FFmpeg scales while decoding, which only pays off when downscaling
+        frame_gen = read_video_frames(video_path, resize_shape=(width, height), prefetch_depth=prefetch_depth,
+                                      decoder=decoder if scale_factor > 1.0 else "cv2",
+                                      require_complete=streaming, timer=timer)
     
-    for frame_idx, frame in frame_gen:
-        mask = segmenter.process_frame(frame)
-        contour = segmenter.get_stream_contour(mask)
-        stats = tracker.process(frame, mask, contour, fps)
+        try:
+            for frame_idx, frame in frame_gen:
+                ctx = analyzer.analyse(frame, fps)
+                stats = ctx.stats
+                mark = timer.now()
         
-        timestamp = frame_idx / fps
-        flow_val = estimator.update(stats['area_cm2'], stats['velocity_cm_s'], timestamp, frame_idx)
+                timestamp = frame_idx / fps
+                flow_val = estimator.update(stats['area_cm2'], stats['velocity_cm_s'], timestamp, frame_idx)
+                mark = timer.lap("flow_estimator", mark)
         
-        visualizer.process_frame(frame, contour, flow_val, stats['velocity_cm_s'], stats['area_cm2'], frame_idx, None)
+                if visualizer:
+                    visualizer.process_frame(frame, ctx.contour, flow_val, stats['velocity_cm_s'], stats['area_cm2'],
+                                             frame_idx, None, stream_mask=ctx.stream_mask())
+                    timer.lap("visualization", mark)
         
-        if frame_idx % 60 == 0:
-            print(f"[{view_name.upper()}] Frame {frame_idx}: {flow_val:.2f} ml/s")
-            
-    visualizer.release()
+                if progress_callback:
+                    progress_callback(frame_idx + 1, total_frames)
+        
+                if frame_idx % 60 == 0:
+                    provisional = estimator.current_metrics()
+                    print(f"[{view_name.upper()}] Frame {frame_idx}/{total_frames}: {flow_val:.2f} ml/s "
+                          f"(Qmax so far {provisional['Qmax']:.2f} ml/s, volume {provisional['Voided_Volume']:.1f} ml)")
+        finally:
+            # Also runs if a stream turns out to be truncated
+            if visualizer:
+                with timer.stage("video_finalize"):
+                    visualizer.release()
+    
+        if analyzer.sampler:
+            print(f"[{view_name.upper()}] {analyzer.sampling_summary()}")
     
     # Get results
-    df, metrics = estimator.get_results()
+    with timer.stage("flow_results"):
+        df, metrics = estimator.get_results()
+    timer.lap("total", start)
     
-    return {'df': df, 'metrics': metrics, 'px_to_cm': px_to_cm, 'annotated_video': out_vid_path}
+    result = {'df': df, 'metrics': metrics, 'px_to_cm': px_to_cm, 'timings': timer.summary()}
+    if render_video:
+        result['annotated_video'] = out_vid_path
+        result['annotated_video_browser_ready'] = visualizer.browser_compatible
+    return result
+
+
+def download_and_process_view(url, temp_dir, view_name, velocity_backend="farneback", ingest="stream",
+                              fps_override=None, hash_content=False, render_video=True, decoder="cv2",
+                              shards=1):
+    """
+    Fetches one view and runs the CV pipeline on it.
+    Used as a worker-process entry point, so only the per-view result
+    (DataFrame, metrics, path of the annotated video) travels back.
+    
+    With ingest="stream" decoding starts while the video is still arriving.
+    If the URL cannot be streamed (e.g. no range request support) or the
+    stream ends early, the view is retried once with a full download.
+    
+    With hash_content the SHA-256 of the video bytes is added to the result
+    as 'content_hash' (for the analysis cache).
+    
+    render_video=False skips the annotated video (metrics-only mode).
+    decoder selects the frame decoder (see src.preprocess.DECODERS).
+    shards > 1 analyses a metrics-only view as parallel time shards, which
+    needs a local file, so the view is always downloaded first.
+    
+    Returns:
+        (downloaded, result) - result is None if the download failed
+    """
+    if ingest not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode: {ingest}")
+    
+    sharded = shards > 1 and not render_video
+    if ingest == "stream" and not sharded:
+        timer = StageTimer()
+        try:
+            result = process_single_video(url, temp_dir, view_name, fps_override=fps_override,
+                                          velocity_backend=velocity_backend, timer=timer,
+                                          render_video=render_video, decoder=decoder)
+            if result is not None:
+                if hash_content:
+                    # The decoder consumed the stream itself; hashing is a plain GET
+                    with timer.stage("content_hash"):
+                        result['content_hash'] = hash_url(url)
+                    result['timings'] = timer.summary()
+                return True, result
+            print(f"[{view_name.upper()}] Could not stream video, downloading instead")
+        except TruncatedVideoError as e:
+            print(f"[{view_name.upper()}] {e}. Retrying with a full download")
+    
+    # Fresh timer: a failed stream attempt should not blur the download run
+    timer = StageTimer()
+    video_path = os.path.join(temp_dir, f"{view_name}_video.mp4")
+    hasher = hashlib.sha256() if hash_content else None
+    with timer.stage("download"):
+        downloaded = download_video(url, video_path, hasher)
+    if not downloaded:
+        return False, None
+    result = process_single_video(video_path, temp_dir, view_name, fps_override=fps_override,
+                                  velocity_backend=velocity_backend, timer=timer,
+                                  render_video=render_video, decoder=decoder, shards=shards)
+    if result is not None and hash_content:
+        result['content_hash'] = hasher.hexdigest()
+    return True, result
+
+
+def process_views(views: dict, temp_dir: str, velocity_backend: str = "farneback", parallel: bool = True,
+                  ingest: str = "stream", fps_override: float = None, hash_views=(),
+                  render_video: bool = True, decoder: str = "cv2", shards: int = 1) -> dict:
+    """
+    Downloads and processes each view, concurrently in separate processes
+    when there is more than one (the pipeline is CPU-bound cv2 code).
+    
+    Args:
+        views: {view_name: url}
+        hash_views: Names of the views whose content hash to compute
+    
+    Returns:
+        {view_name: (downloaded, result)}
+    """
+    # On a single core the extra processes only add spawn overhead
+    if not parallel or len(views) < 2 or (os.cpu_count() or 1) < 2:
+        return {
+            name: download_and_process_view(url, temp_dir, name, velocity_backend, ingest,
+                                            fps_override, name in hash_views, render_video, decoder, shards)
+            for name, url in views.items()
+        }
+    
+    # spawn rather than fork: the API process is multi-threaded and cv2's
+    # thread pool does not survive fork reliably
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(views), mp_context=ctx) as pool:
+        futures = {
+            name: pool.submit(download_and_process_view, url, temp_dir, name, velocity_backend, ingest,
+                              fps_override, name in hash_views, render_video, decoder, shards)
+            for name, url in views.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def known_content_hashes(cache: AnalysisCache, views: dict) -> dict:
+    """
+    {view_name: content hash, or None} for the URLs whose hash is already
+    known (recorded at upload or by an earlier analysis, and still valid
+    per their HTTP validators). No video is downloaded here.
+    """
+    try:
+        return {name: cache.known_content_hash(url) for name, url in views.items()}
+    except Exception as e:
+        print(f"Analysis cache lookup failed: {e}")
+        return {name: None for name in views}
+
+
+def lookup_cached_result(cache: AnalysisCache, views: dict, params: dict, hashes: dict):
+    """
+    Returns a copy of the cached result for these views and parameters, or
+    None. Only views whose content hash is known (see known_content_hashes)
+    can hit.
+    """
+    if not all(hashes.values()):
+        return None
+    try:
+        cached = cache.get(AnalysisCache.make_key(hashes, PIPELINE_VERSION, params))
+    except Exception as e:
+        print(f"Analysis cache lookup failed: {e}")
+        return None
+    if not cached:
+        return None
+    
+    print(">>> Analysis cache hit, reusing stored results")
+    result = dict(cached["result"])
+    # The same content may have been analysed under other URLs
+    metrics = dict(cached["metrics"])
+    metrics['inputs'] = {
+        'top': views.get("top"),
+        'bottom': views.get("bottom"),
+        'volume_manual': params.get("volume")
+    }
+    result["qmax_report_json"] = json.dumps(metrics)
+    return result
+
+
+def store_cached_result(cache: AnalysisCache, views: dict, params: dict, result: dict, metrics: dict,
+                        final_df: pd.DataFrame, view_results: dict):
+    """Stores a successful analysis; skipped if any view is missing its content hash."""
+    hashes = {name: (res or {}).get('content_hash') for name, res in view_results.items()}
+    if not all(hashes.values()):
+        return
+    try:
+        for name, url in views.items():
+            cache.remember_url(url, hashes[name])
+        view_dfs = {name: res['df'] for name, res in view_results.items() if res.get('df') is not None}
+        cache.put(AnalysisCache.make_key(hashes, PIPELINE_VERSION, params), result, metrics, final_df, view_dfs)
+    except Exception as e:
+        # Caching is best effort and never fails the analysis
+        print(f"Analysis cache store failed: {e}")
 
 
 def run_analysis_for_entry(
     top_view_url: str = None,
     bottom_view_url: str = None,
     volume: float = None,
-    entry_id: int = None
+    entry_id: int = None,
+    velocity_backend: str = "farneback",
+    parallel_views: bool = True,
+    ingest: str = "stream",
+    fps_override: float = None,
+    use_cache: bool = True,
+    metrics_only: bool = False,
+    decoder: str = "cv2",
+    shards: int = None
 ) -> dict:
     """
     Run analysis on entry videos and upload results to Cloudinary.
@@ -178,10 +438,26 @@ def run_analysis_for_entry(
         bottom_view_url: URL to bottom/side view video  
         volume: Manual voided volume in ml (optional)
         entry_id: Entry ID for organizing uploads
+        velocity_backend: Optical flow backend (see src.tracking.VELOCITY_BACKENDS)
+        parallel_views: Download and analyse both views in parallel processes
+        ingest: "stream" (decode while downloading) or "download" (see INGEST_MODES)
+        fps_override: Frame rate to assume instead of the container's
+        use_cache: Reuse the stored result of identical videos and parameters
+            (see analysis_cache)
+        metrics_only: Skip the annotated video (rendering, conversion and
+            upload); the CSV, JSON report and clinical plot are still produced
+        decoder: Frame decoder, "cv2" or "ffmpeg" (scale during decode, see
+            src.preprocess.FFmpegFrameReader)
+        shards: Time shards per view for metrics-only runs (default
+            ANALYSIS_VIEW_SHARDS, see src.sharding)
     
     Returns:
-        dict with URLs for all generated files
+        dict with URLs for all generated files, plus 'timings':
+        {'views': {view: per-stage summary}, 'stages': run-level summary}
+        (see src.timing.StageTimer.summary)
     """
+    run_timer = StageTimer()
+    run_start = run_timer.now()
     result = {
         "annotated_video_url": None,
         "clinical_report_url": None,
@@ -195,41 +471,67 @@ def run_analysis_for_entry(
         result["error"] = "No video URLs provided"
         return result
     
+    views = {}
+    if top_view_url:
+        views["top"] = top_view_url
+    if bottom_view_url:
+        views["bottom"] = bottom_view_url
+    
+    shards = VIEW_SHARDS if shards is None else shards
+    
+    # Parameters that change the outcome for the same videos
+    cache_params = {"volume": volume, "fps_override": fps_override, "velocity_backend": velocity_backend}
+    if decoder != "cv2":
+        # Only added when set, so existing cache entries keep matching
+        cache_params["decoder"] = decoder
+    full_cache_params = cache_params
+    if metrics_only:
+        cache_params = dict(cache_params, metrics_only=True)
+        if shards > 1:
+            # Shard boundaries shift the numbers slightly
+            cache_params.update(shards=shards, shard_warmup_frames=SHARD_WARMUP_FRAMES)
+    cache = get_analysis_cache() if use_cache else None
+    known_hashes = {}
+    if cache:
+        with run_timer.stage("cache_lookup"):
+            known_hashes = known_content_hashes(cache, views)
+            cached = lookup_cached_result(cache, views, cache_params, known_hashes)
+            if not cached and metrics_only:
+                # A full analysis of the same videos has the same numbers
+                cached = lookup_cached_result(cache, views, full_cache_params, known_hashes)
+        if cached:
+            run_timer.lap("total", run_start)
+            cached["timings"] = {"views": {}, "stages": run_timer.summary()}
+            return cached
+    
     # Create temp directory for processing
     temp_dir = tempfile.mkdtemp(prefix=f"analysis_{entry_id}_")
     
     try:
-        # Download videos
-        top_video_path = None
-        bottom_video_path = None
-        
-        if top_view_url:
-            top_video_path = os.path.join(temp_dir, "top_video.mp4")
-            if not download_video(top_view_url, top_video_path):
-                top_video_path = None
-                
-        if bottom_view_url:
-            bottom_video_path = os.path.join(temp_dir, "bottom_video.mp4")
-            if not download_video(bottom_view_url, bottom_video_path):
-                bottom_video_path = None
+        # Download and process videos (one process per view)
+        with run_timer.stage("views"):
+            # Hashes recorded at upload spare a second download of the view
+            hash_views = [name for name in views if cache and not known_hashes.get(name)]
+            outcomes = process_views(views, temp_dir, velocity_backend, parallel=parallel_views, ingest=ingest,
+                                     fps_override=fps_override, hash_views=hash_views,
+                                     render_video=not metrics_only, decoder=decoder, shards=shards)
+        for name, (_, res) in outcomes.items():
+            if res is not None and known_hashes.get(name):
+                res['content_hash'] = known_hashes[name]
+        view_timings = {name: res['timings'] for name, (_, res) in outcomes.items() if res and res.get('timings')}
         
-        if not top_video_path and not bottom_video_path:
+        if not any(downloaded for downloaded, _ in outcomes.values()):
             result["error"] = "Failed to download any videos"
             return result
         
-        # Process videos
-        top_result = None
-        if top_video_path:
-            top_result = process_single_video(top_video_path, temp_dir, "top")
-            
-        bottom_result = None
-        if bottom_video_path:
-            bottom_result = process_single_video(bottom_video_path, temp_dir, "bottom")
+        top_result = outcomes.get("top", (False, None))[1]
+        bottom_result = outcomes.get("bottom", (False, None))[1]
         
         # Ensemble aggregation
         print(">>> Running Ensemble Aggregation")
         aggregator = EnsembleAggregator()
-        final_df, final_metrics = aggregator.process(top_result, bottom_result, volume)
+        with run_timer.stage("ensemble"):
+            final_df, final_metrics = aggregator.process(top_result, bottom_result, volume)
         
         # Generate outputs
         csv_path = os.path.join(temp_dir, "flow_timeseries.csv")
@@ -252,48 +554,73 @@ def run_analysis_for_entry(
         
         # Generate clinical report plot
         plot_path = os.path.join(temp_dir, "clinical_report.png")
-        generate_clinical_report_plot(final_df, final_metrics, plot_path)
+        with run_timer.stage("plot"):
+            generate_clinical_report_plot(final_df, final_metrics, plot_path)
         
         # Upload to Cloudinary
         folder = f"dockothon/entries/{entry_id}" if entry_id else "dockothon/analysis"
         
         # Upload annotated video (use top if available, else bottom)
         annotated_video = None
-        if top_result and 'annotated_video' in top_result:
-            annotated_video = top_result['annotated_video']
-        elif bottom_result and 'annotated_video' in bottom_result:
-            annotated_video = bottom_result['annotated_video']
+        browser_ready = False
+        for view_result in (top_result, bottom_result):
+            if view_result and 'annotated_video' in view_result:
+                annotated_video = view_result['annotated_video']
+                browser_ready = view_result.get('annotated_video_browser_ready', False)
+                break
             
-        if annotated_video and os.path.exists(annotated_video):
+        if annotated_video and os.path.exists(annotated_video) and browser_ready:
+            # Already H.264/yuv420p/faststart, no second encode needed
+            with run_timer.stage("upload_video"):
+                upload_result = upload_video(annotated_video, folder=f"{folder}/videos")
+            result["annotated_video_url"] = upload_result.get("url")
+        elif annotated_video and os.path.exists(annotated_video):
             # Convert to browser-compatible format (H.264)
             converted_video = os.path.join(temp_dir, "annotated_browser.mp4")
-            if convert_to_browser_compatible(annotated_video, converted_video):
+            with run_timer.stage("ffmpeg_conversion"):
+                converted = convert_to_browser_compatible(annotated_video, converted_video)
+            if converted:
                 # Upload the converted video
-                upload_result = upload_video(converted_video, folder=f"{folder}/videos")
+                with run_timer.stage("upload_video"):
+                    upload_result = upload_video(converted_video, folder=f"{folder}/videos")
                 result["annotated_video_url"] = upload_result.get("url")
             else:
                 # Fallback: try uploading original (may not play in browser)
                 print("Warning: Uploading original video (may not be browser-compatible)")
-                upload_result = upload_video(annotated_video, folder=f"{folder}/videos")
+                with run_timer.stage("upload_video"):
+                    upload_result = upload_video(annotated_video, folder=f"{folder}/videos")
                 result["annotated_video_url"] = upload_result.get("url")
         
         # Upload clinical report image
         if os.path.exists(plot_path):
-            upload_result = upload_image(plot_path, folder=f"{folder}/reports")
+            with run_timer.stage("upload_report"):
+                upload_result = upload_image(plot_path, folder=f"{folder}/reports")
             result["clinical_report_url"] = upload_result.get("url")
         
         # Upload flow timeseries CSV
         if os.path.exists(csv_path):
-            upload_result = upload_raw(csv_path, folder=f"{folder}/data")
+            with run_timer.stage("upload_timeseries"):
+                upload_result = upload_raw(csv_path, folder=f"{folder}/data")
             result["flow_timeseries_url"] = upload_result.get("url")
         
         # Store JSON directly (as string)
         result["qmax_report_json"] = json.dumps(final_metrics)
         result["success"] = True
         
+        if cache:
+            with run_timer.stage("cache_store"):
+                store_cached_result(cache, views, cache_params, result, final_metrics, final_df,
+                                    {name: res for name, (_, res) in outcomes.items()})
+        
+        run_timer.lap("total", run_start)
+        result["timings"] = {"views": view_timings, "stages": run_timer.summary()}
+        
         print(f"\n=== Analysis Complete ===")
         print(f"Final Qmax: {final_metrics.get('Qmax', 0):.2f} ml/s")
         print(f"Voided Volume: {final_metrics.get('Voided_Volume', 0):.2f} ml")
+        for name, summary in view_timings.items():
+            print("\n" + format_timings(summary, f"[{name.upper()}] Stage timings"))
+        print("\n" + format_timings(result["timings"]["stages"], "[RUN] Stage timings"))
         
     except Exception as e:
         result["error"] = str(e)
@@ -0,0 +1,24 @@
+"""
+Bounded thread pool for the blocking calls of async endpoints (Cloudinary
+SDK, the analysis and report pipelines), so they never run on the
+event loop.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Blocking calls in flight at once per API process; more wait in line
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs func(*args, **kwargs) in the blocking pool and returns its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
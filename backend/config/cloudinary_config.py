@@ -3,6 +3,7 @@ import cloudinary.uploader
 import cloudinary.api
 from dotenv import load_dotenv
 import os
+import hashlib
 
 load_dotenv()
 
@@ -13,6 +14,47 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET")
 )
 
+# Bytes per chunked-upload request (Cloudinary needs at least 5MB per chunk
+# except the last); also the most of an upload held in memory at once
+UPLOAD_CHUNK_SIZE = 6000000  # 6MB chunks
+
+class HashingReader:
+    """
+    Read-only wrapper of a binary file that hashes (SHA-256) and counts the
+    bytes as they are read, and fails once more than max_bytes come through.
+    Seeking is passed through, so uploaders can measure the file first.
+    """
+    def __init__(self, fileobj, max_bytes: int = None, name: str = None):
+        self.fileobj = fileobj
+        self.max_bytes = max_bytes
+        self.name = name
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.fileobj.read(size)
+        self.bytes_read += len(chunk)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise ValueError(f"Upload exceeds {self.max_bytes} bytes")
+        self.hasher.update(chunk)
+        return chunk
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self.fileobj.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.fileobj.tell()
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+    # The uploader closes what it reads from; the caller owns the file
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
 def upload_video_to_cloudinary(file_path: str, folder: str = "patient_videos"):
     """Upload video file to Cloudinary"""
     try:
@@ -21,7 +63,7 @@ def upload_video_to_cloudinary(file_path: str, folder: str = "patient_videos"):
             resource_type="video",  # REMOVED DUPLICATE
             folder=folder,
             overwrite=True,
-            chunk_size=6000000,  # 6MB chunks
+            chunk_size=UPLOAD_CHUNK_SIZE,
             eager=[
                 {"width": 640, "height": 360, "crop": "scale"}
             ]
@@ -63,6 +105,47 @@ def upload_video_file(file_content: bytes, filename: str, folder: str = "patient
             "error": str(e)
         }
 
+def upload_video_stream(fileobj, filename: str, folder: str = "patient_videos", max_bytes: int = None):
+    """
+    Upload video from an open binary file (e.g. an UploadFile's spooled file)
+    in UPLOAD_CHUNK_SIZE chunks, without loading it or copying it to disk.
+
+    The bytes are hashed and counted while they are sent. On success the
+    result also has 'content_hash' (SHA-256) and 'bytes' (as sent).
+    """
+    try:
+        fileobj.seek(0)
+        reader = HashingReader(fileobj, max_bytes=max_bytes, name=filename)
+        upload_result = cloudinary.uploader.upload_large(
+            reader,
+            resource_type="video",
+            folder=folder,
+            overwrite=True,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+            filename=filename,
+            eager=[
+                {"width": 640, "height": 360, "crop": "scale"}
+            ]
+        )
+        stored_bytes = upload_result.get("bytes")
+        if stored_bytes is not None and stored_bytes != reader.bytes_read:
+            delete_from_cloudinary(upload_result["public_id"])
+            raise ValueError(f"Stored {stored_bytes} bytes, sent {reader.bytes_read}")
+        return {
+            "success": True,
+            "url": upload_result["secure_url"],
+            "public_id": upload_result["public_id"],
+            "duration": upload_result.get("duration"),
+            "format": upload_result.get("format"),
+            "bytes": reader.bytes_read,
+            "content_hash": reader.hexdigest()
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
 def delete_from_cloudinary(public_id: str, resource_type: str = "video"):
     """Delete file from Cloudinary"""
     try:
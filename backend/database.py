@@ -1,16 +1,136 @@
 import os
-from sqlalchemy import create_engine
+import ssl
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-# SQLite file path
-DATABASE_URL = "sqlite:///./app.db"  # Relative path
+load_dotenv()
+
+# SQLite file by default; postgresql:// or cockroachdb:// URLs in production
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 # DATABASE_URL = "sqlite:////absolute/path/to/app.db"  # Absolute path if you prefer
 
+# Connection pool (Postgres / CockroachDB)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle before server / load balancer idle timeouts drop the connection
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite: WAL lets readers run while the API or a worker writes; writers
+# wait up to the busy timeout for the lock instead of failing at once.
+# synchronous=NORMAL is durable in WAL mode except for the last commits
+# on power loss.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# libpq (psycopg2) URL parameters that asyncpg's connect() does not accept;
+# asyncpg_connect_args passes on the ones it has an equivalent for
+LIBPQ_ONLY_PARAMS = ("sslmode", "sslrootcert", "sslcert", "sslkey", "connect_timeout", "application_name")
+
+
+def database_url(url=DATABASE_URL, is_async=False):
+    """`url` with the driver the engines use (asyncio drivers if is_async)."""
+    url = make_url(url)
+    if url.drivername == "postgres":
+        # Heroku-style URL
+        url = url.set(drivername="postgresql")
+    if is_async:
+        drivers = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "cockroachdb": "asyncpg"}
+        sync_drivers = ("sqlite", "postgresql", "postgresql+psycopg2", "cockroachdb", "cockroachdb+psycopg2")
+        if url.drivername in sync_drivers:
+            backend = url.get_backend_name()
+            url = url.set(drivername=f"{backend}+{drivers[backend]}")
+        if url.get_driver_name() == "asyncpg":
+            url = url.difference_update_query(LIBPQ_ONLY_PARAMS)
+        return url
+    elif url.drivername == "postgresql":
+        # Driverless: psycopg2 from requirements.txt (SQLAlchemy 2.1 would pick psycopg 3)
+        return url.set(drivername="postgresql+psycopg2")
+    return url
+
+
+def engine_options(url):
+    """create_engine() keyword arguments for `url`'s backend."""
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def asyncpg_connect_args(url):
+    """asyncpg connect() arguments for the libpq parameters of `url` (see database_url)."""
+    query = make_url(url).query
+    args = {}
+    sslmode = query.get("sslmode")
+    if sslmode != "disable" and (query.get("sslrootcert") or query.get("sslcert")):
+        # Certificate files need an SSL context; asyncpg only reads them from a DSN
+        context = ssl.create_default_context(cafile=query.get("sslrootcert"))
+        if sslmode != "verify-full":
+            context.check_hostname = False
+        if sslmode not in ("verify-ca", "verify-full"):
+            context.verify_mode = ssl.CERT_NONE
+        if query.get("sslcert"):
+            context.load_cert_chain(query["sslcert"], query.get("sslkey"))
+        args["ssl"] = context
+    elif sslmode:
+        # asyncpg takes the libpq mode names (disable ... verify-full)
+        args["ssl"] = sslmode
+    if query.get("connect_timeout"):
+        args["timeout"] = float(query["connect_timeout"])
+    if query.get("application_name"):
+        args["server_settings"] = {"application_name": query["application_name"]}
+    return args
+
+
+def configure_sqlite(engine):
+    """Applies the SQLITE_* settings to every new connection of a SQLite engine."""
+    if engine.url.get_backend_name() != "sqlite":
+        return
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.close()
+
+
+def create_db_engine(url=DATABASE_URL):
+    """Engine for `url` configured as above for its backend."""
+    url = database_url(url)
+    options = engine_options(url)
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}  # Needed for SQLite + SQLAlchemy
+    engine = create_engine(url, **options)
+    configure_sqlite(engine)
+    return engine
+
+
+def create_async_db_engine(url=DATABASE_URL):
+    """asyncio engine (aiosqlite / asyncpg) for `url`, configured like create_db_engine."""
+    async_url = database_url(url, is_async=True)
+    options = engine_options(async_url)
+    if async_url.get_driver_name() == "asyncpg":
+        options["connect_args"] = asyncpg_connect_args(url)
+    engine = create_async_engine(async_url, **options)
+    configure_sqlite(engine.sync_engine)
+    return engine
+
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite + SQLAlchemy
-)
+engine = create_db_engine()
 
 # Session and Base
 SessionLocal = sessionmaker(
@@ -19,6 +139,15 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+# asyncio engine of the async routers (entries, analyses, reports). Objects
+# stay loaded after commit: lazy loading is not available in async code
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
@@ -30,6 +159,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 if __name__ == "__main__":
     # Create tables
     Base.metadata.create_all(bind=engine)
@@ -1,37 +1,57 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from database import get_db
+from database import get_db, get_async_db
 from models import User
 from auth import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/signin")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get the current authenticated user from JWT token."""
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def user_id_from_token(token: str) -> int:
+    """Id of the user of a JWT token; raises 401 for an invalid token."""
     payload = decode_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    user_id: str = payload.get("sub")
+    user_id: str = payload.get("sub") if payload is not None else None
     if user_id is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.id == int(user_id)).first()
+        raise credentials_exception()
+    return int(user_id)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Get the current authenticated user from JWT token."""
+    user = db.query(User).filter(User.id == user_id_from_token(token)).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     
     return user
 
 
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """get_current_user for async endpoints, with .doctor and .patient loaded."""
+    user = (await db.execute(
+        select(User)
+        .options(selectinload(User.doctor), selectinload(User.patient))
+        .where(User.id == user_id_from_token(token))
+    )).scalar_one_or_none()
+    if user is None:
+        raise credentials_exception()
+    return user
+
+
 def get_current_doctor(current_user: User = Depends(get_current_user)) -> User:
     """Ensure the current user is a doctor."""
     if not current_user.doctor:
@@ -50,3 +70,13 @@ def get_current_patient(current_user: User = Depends(get_current_user)) -> User:
             detail="Access denied. Patient account required."
         )
     return current_user
+
+
+async def get_current_doctor_async(current_user: User = Depends(get_current_user_async)) -> User:
+    """get_current_doctor for async endpoints."""
+    return get_current_doctor(current_user)
+
+
+async def get_current_patient_async(current_user: User = Depends(get_current_user_async)) -> User:
+    """get_current_patient for async endpoints."""
+    return get_current_patient(current_user)
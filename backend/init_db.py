@@ -1,14 +1,116 @@
-"""Script to initialize the database and create all tables."""
+"""Script to initialize the database and migrate it to the latest schema."""
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import MetaData, Table, Index, ForeignKeyConstraint, create_engine, inspect, text
+
 from database import engine, Base
-from models import User, Doctor, Patient, Entry, Report
+from models import User, Doctor, Patient, Entry, Report, Analysis, AnalysisJob
+
+
+def add_missing_columns(metadata: MetaData = Base.metadata):
+    """
+    Add columns of metadata missing from existing tables (create_all only
+    creates whole tables). New columns must be nullable or have a server default.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if not isinstance(default, str):
+                        default = default.compile(engine).string
+                    ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                print(f"  + {table.name}.{column.name}")
+
+
+# Schema of databases made by create_all() before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def alembic_config():
+    return Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+
+
+def baseline_metadata() -> MetaData:
+    """
+    The models restricted to the tables, columns and indexes of
+    BASELINE_REVISION, read from a scratch database migrated to it. Later
+    migrations add the rest, so they must not exist before the stamp.
+    """
+    scratch = create_engine("sqlite://")
+    config = alembic_config()
+    with scratch.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, BASELINE_REVISION)
+        inspector = inspect(connection)
+        tables = {
+            name: (
+                {col["name"] for col in inspector.get_columns(name)},
+                {index["name"] for index in inspector.get_indexes(name)},
+            )
+            for name in inspector.get_table_names() if name != "alembic_version"
+        }
+    scratch.dispose()
+
+    metadata = MetaData()
+    for name, (columns, indexes) in tables.items():
+        model = Base.metadata.tables[name]
+        copies = []
+        for column in model.columns:
+            if column.name in columns:
+                copy = column._copy()
+                # Indexes are copied below, by name
+                copy.index = copy.unique = None
+                copies.append(copy)
+        table = Table(name, metadata, *copies)
+        for fk in model.foreign_key_constraints:
+            if all(col.name in columns for col in fk.columns):
+                table.append_constraint(ForeignKeyConstraint(
+                    [element.parent.name for element in fk.elements],
+                    [element.target_fullname for element in fk.elements],
+                    name=fk.name, ondelete=fk.ondelete,
+                ))
+        for index in model.indexes:
+            if index.name in indexes:
+                Index(index.name, *[table.c[col.name] for col in index.columns], unique=index.unique)
+    return metadata
 
 
 def init_db():
-    """Create all tables in the database."""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully!")
-    print("\nTables created:")
+    """Create the tables or bring an existing database up to date."""
+    config = alembic_config()
+    inspector = inspect(engine)
+    with engine.connect() as connection:
+        revision = MigrationContext.configure(connection).get_current_revision()
+    # Pre-migrations database (create_all), or one whose stamp never went
+    # through: complete it up to the baseline, then track it
+    untracked = inspector.has_table("users") and revision is None
+    if untracked:
+        baseline = baseline_metadata()
+        baseline.create_all(bind=engine)
+        add_missing_columns(baseline)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        if untracked:
+            print(f"Stamping existing database at revision {BASELINE_REVISION}...")
+            command.stamp(config, BASELINE_REVISION)
+        print("Running migrations...")
+        command.upgrade(config, "head")
+    print("Database is up to date!")
+    print("\nTables:")
     for table in Base.metadata.tables:
         print(f"  - {table}")
 
@@ -0,0 +1,217 @@
+"""
+Persistent analysis job queue.
+
+Jobs live in the `analysis_jobs` table, so the queue survives restarts and
+needs no external broker (SQLite works for local runs). The API only enqueues;
+worker.py claims queued jobs and runs them in a separate process pool, writing
+results back into `Analysis`.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Analysis, AnalysisJob, Entry
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED)
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def get_active_job(db: Session, entry_id: int) -> Optional[AnalysisJob]:
+    """Returns the queued or running job of an entry, if any."""
+    return (
+        db.query(AnalysisJob)
+        .filter(AnalysisJob.entry_id == entry_id, AnalysisJob.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(AnalysisJob.id.desc())
+        .first()
+    )
+
+
+def enqueue_analysis_job(db: Session, entry_id: int, **options) -> AnalysisJob:
+    """
+    Queues an analysis of the entry and returns the job.
+    An entry that already has a queued or running job gets that job back
+    instead of a duplicate.
+
+    Args:
+        options: Extra keyword arguments for run_analysis_for_entry
+            (e.g. velocity_backend), stored as JSON.
+    """
+    job = get_active_job(db, entry_id)
+    if job:
+        return job
+
+    job = add_analysis_job(db, entry_id, **options)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def add_analysis_job(db: Session, entry_id: int, **options) -> AnalysisJob:
+    """
+    Adds a queued job to the session without committing, so it is created
+    in the caller's transaction (e.g. together with a new entry).
+    Does not check for an active job; see enqueue_analysis_job.
+    """
+    job = AnalysisJob(
+        entry_id=entry_id,
+        status=JOB_QUEUED,
+        options=json.dumps(options) if options else None
+    )
+    db.add(job)
+    return job
+
+
+def claim_next_job(db: Session) -> Optional[int]:
+    """
+    Atomically moves the oldest queued job to running and returns its id.
+    The conditional UPDATE makes concurrent dispatchers safe: only one of
+    them sees rowcount 1 for a given job.
+    """
+    while True:
+        candidate = (
+            db.query(AnalysisJob.id)
+            .filter(AnalysisJob.status == JOB_QUEUED)
+            .order_by(AnalysisJob.id)
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        claimed = (
+            db.query(AnalysisJob)
+            .filter(AnalysisJob.id == candidate.id, AnalysisJob.status == JOB_QUEUED)
+            .update({
+                AnalysisJob.status: JOB_RUNNING,
+                AnalysisJob.started_at: datetime.utcnow(),
+                AnalysisJob.heartbeat_at: datetime.utcnow(),
+                AnalysisJob.attempts: AnalysisJob.attempts + 1,
+                AnalysisJob.error: None,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return candidate.id
+
+
+def finish_job(db: Session, job_id: int, status: str, error: str = None):
+    """Records the outcome of a job."""
+    db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update({
+        AnalysisJob.status: status,
+        AnalysisJob.error: error,
+        AnalysisJob.finished_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+
+
+def heartbeat_jobs(db: Session, job_ids):
+    """Renews the heartbeat of the running jobs of a worker."""
+    if not job_ids:
+        return
+    db.query(AnalysisJob).filter(
+        AnalysisJob.id.in_(job_ids), AnalysisJob.status == JOB_RUNNING
+    ).update({AnalysisJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session, stale_after_s: float, max_attempts: int) -> Tuple[int, int]:
+    """
+    Puts running jobs whose heartbeat is older than stale_after_s (their
+    worker died) back in the queue, or fails them once they have been tried
+    max_attempts times. Returns (requeued, failed) counts.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_s)
+    # Jobs claimed before heartbeats existed only have started_at
+    stale = (
+        AnalysisJob.status == JOB_RUNNING,
+        func.coalesce(AnalysisJob.heartbeat_at, AnalysisJob.started_at) < cutoff,
+    )
+    failed = (
+        db.query(AnalysisJob)
+        .filter(*stale, AnalysisJob.attempts >= max_attempts)
+        .update({
+            AnalysisJob.status: JOB_FAILED,
+            AnalysisJob.error: f"Worker lost {max_attempts} time(s)",
+            AnalysisJob.finished_at: datetime.utcnow(),
+        }, synchronize_session=False)
+    )
+    requeued = (
+        db.query(AnalysisJob)
+        .filter(*stale)
+        .update({AnalysisJob.status: JOB_QUEUED}, synchronize_session=False)
+    )
+    db.commit()
+    return requeued, failed
+
+
+def save_analysis_result(db: Session, entry_id: int, result: dict) -> Analysis:
+    """Creates or updates the Analysis of an entry from a run_analysis_for_entry result."""
+    analysis = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    if not analysis:
+        analysis = Analysis(entry_id=entry_id)
+        db.add(analysis)
+
+    analysis.annotated_video_url = result.get("annotated_video_url")
+    analysis.clinical_report_url = result.get("clinical_report_url")
+    analysis.flow_timeseries_url = result.get("flow_timeseries_url")
+    analysis.qmax_report_json = result.get("qmax_report_json")
+    timings = result.get("timings")
+    analysis.timings_json = json.dumps(timings) if timings else None
+    db.commit()
+    db.refresh(analysis)
+    return analysis
+
+
+def execute_job(job_id: int) -> str:
+    """
+    Runs a claimed job to completion and returns its final status.
+    Entry point of the worker pool processes: opens its own session and
+    imports the CV pipeline lazily, so the API process never loads it.
+    """
+    from database import SessionLocal
+    from analysis_runner import run_analysis_for_entry
+
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+        if not job:
+            return JOB_FAILED
+        entry = db.query(Entry).filter(Entry.id == job.entry_id).first()
+        if not entry:
+            finish_job(db, job_id, JOB_FAILED, "Entry not found")
+            return JOB_FAILED
+        if not entry.top_view_url and not entry.bottom_view_url:
+            finish_job(db, job_id, JOB_FAILED, "No video URLs available for analysis")
+            return JOB_FAILED
+
+        options = json.loads(job.options) if job.options else {}
+        print(f"[JOB {job_id}] Analysing entry {entry.id}")
+        result = run_analysis_for_entry(
+            top_view_url=entry.top_view_url,
+            bottom_view_url=entry.bottom_view_url,
+            volume=entry.amount_voided,
+            entry_id=entry.id,
+            **options
+        )
+
+        if not result.get("success"):
+            finish_job(db, job_id, JOB_FAILED, result.get("error", "Analysis failed"))
+            return JOB_FAILED
+
+        save_analysis_result(db, entry.id, result)
+        finish_job(db, job_id, JOB_SUCCEEDED)
+        print(f"[JOB {job_id}] Done")
+        return JOB_SUCCEEDED
+
+    except Exception as e:
+        db.rollback()
+        finish_job(db, job_id, JOB_FAILED, str(e))
+        return JOB_FAILED
+    finally:
+        db.close()
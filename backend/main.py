@@ -59,6 +59,7 @@ app.add_middleware(
     allow_credentials=True,                   # Needed if sending cookies or auth headers
     allow_methods=["*"],                       # Allow all HTTP methods
     allow_headers=["*"],                       # Allow all headers
+    expose_headers=["X-Next-Cursor"],          # Pagination cursor of /entry/my-entries
 )
 # Include routers
 app.include_router(auth_router)
@@ -0,0 +1,60 @@
+"""Alembic environment: migrates the database of database.py to models.py."""
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import DATABASE_URL, Base, create_db_engine
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def get_url() -> str:
+    # -x url=... overrides the app database (benchmarks, copies of app.db)
+    return context.get_x_argument(as_dictionary=True).get("url", DATABASE_URL)
+
+
+def run_migrations_offline():
+    """Emits the SQL instead of running it (alembic upgrade head --sql)."""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_on(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most things; batch mode recreates the table
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # init_db.py passes its own connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_on(connection)
+        return
+    engine = create_db_engine(get_url())
+    with engine.connect() as connection:
+        run_on(connection)
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,185 @@
+"""Initial schema: the tables as init_db.py's create_all() made them.
+
+Existing databases created that way are stamped with this revision by
+init_db.py instead of running it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 15:00:11.557753
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('password', sa.String(length=255), nullable=False),
+    sa.Column('email', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    op.create_table('doctors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('hospital', sa.String(length=200), nullable=False),
+    sa.Column('specialization', sa.String(length=100), nullable=False),
+    sa.Column('qualification', sa.String(length=200), nullable=False),
+    sa.Column('profile_picture', sa.String(length=500), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('license_number', sa.String(length=50), nullable=True),
+    sa.Column('years_of_experience', sa.Integer(), nullable=True),
+    sa.Column('auto_accept', sa.Boolean(), nullable=False),
+    sa.Column('metrics_only', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('license_number'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_doctors_id'), ['id'], unique=False)
+
+    op.create_table('patients',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date_of_birth', sa.DateTime(), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('gender', sa.String(length=20), nullable=True),
+    sa.Column('address', sa.Text(), nullable=True),
+    sa.Column('phone_number', sa.String(length=20), nullable=True),
+    sa.Column('emergency_contact', sa.String(length=100), nullable=True),
+    sa.Column('medical_history', sa.Text(), nullable=True),
+    sa.Column('profile_picture', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_patients_id'), ['id'], unique=False)
+
+    op.create_table('entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('doctor_id', sa.Integer(), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=False),
+    sa.Column('top_view_url', sa.String(length=500), nullable=True),
+    sa.Column('bottom_view_url', sa.String(length=500), nullable=True),
+    sa.Column('amount_voided', sa.Float(), nullable=True),
+    sa.Column('diameter_of_commode', sa.Float(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_entries_id'), ['id'], unique=False)
+
+    op.create_table('analyses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entry_id', sa.Integer(), nullable=False),
+    sa.Column('annotated_video_url', sa.String(length=500), nullable=True),
+    sa.Column('clinical_report_url', sa.String(length=500), nullable=True),
+    sa.Column('flow_timeseries_url', sa.String(length=500), nullable=True),
+    sa.Column('qmax_report_json', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('entry_id')
+    )
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_analyses_id'), ['id'], unique=False)
+
+    op.create_table('analysis_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entry_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('options', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_analysis_jobs_entry_id'), ['entry_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_analysis_jobs_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_analysis_jobs_status'), ['status'], unique=False)
+
+    op.create_table('reports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entry_id', sa.Integer(), nullable=False),
+    sa.Column('report_url', sa.String(length=500), nullable=True),
+    sa.Column('report_type', sa.String(length=50), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('markdown_content', sa.Text(), nullable=True),
+    sa.Column('is_ai_generated', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reports_id'), ['id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_id'))
+
+    op.drop_table('reports')
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analysis_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_analysis_jobs_id'))
+        batch_op.drop_index(batch_op.f('ix_analysis_jobs_entry_id'))
+
+    op.drop_table('analysis_jobs')
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analyses_id'))
+
+    op.drop_table('analyses')
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_entries_id'))
+
+    op.drop_table('entries')
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_patients_id'))
+
+    op.drop_table('patients')
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_doctors_id'))
+
+    op.drop_table('doctors')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
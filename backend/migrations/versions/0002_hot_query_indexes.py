@@ -0,0 +1,40 @@
+"""Indexes for the hot entry / report lookups.
+
+(doctor_id, time, id) and (patient_id, time, id) serve the entry lists
+(filter by owner, newest first, keyset pages); reports are looked up by
+entry_id.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 15:00:25.885393
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.create_index('ix_entries_doctor_id_time', ['doctor_id', 'time', 'id'], unique=False)
+        batch_op.create_index('ix_entries_patient_id_time', ['patient_id', 'time', 'id'], unique=False)
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reports_entry_id'), ['entry_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_entry_id'))
+
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_entries_patient_id_time')
+        batch_op.drop_index('ix_entries_doctor_id_time')
+
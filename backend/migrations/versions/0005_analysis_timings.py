@@ -0,0 +1,28 @@
+"""Per-stage timings of the analysis run, next to its report.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:31:44.714866
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timings_json', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.drop_column('timings_json')
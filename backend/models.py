@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index, false
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -35,6 +35,8 @@ class Doctor(Base):
     license_number = Column(String(50), unique=True, nullable=True)
     years_of_experience = Column(Integer, nullable=True)
     auto_accept = Column(Boolean, default=False, nullable=False)  # Auto-accept patient requests
+    # Analyse without rendering the annotated video (numbers and plot only)
+    metrics_only = Column(Boolean, default=False, nullable=False, server_default=false())
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -86,6 +88,14 @@ class Entry(Base):
     doctor = relationship("Doctor", back_populates="entries")
     reports = relationship("Report", back_populates="entry")
     analysis = relationship("Analysis", back_populates="entry", uselist=False)
+    analysis_jobs = relationship("AnalysisJob", back_populates="entry")
+
+    # Entry lists filter on the doctor or patient and page newest first on
+    # (time, id), which these read in order without sorting
+    __table_args__ = (
+        Index("ix_entries_doctor_id_time", "doctor_id", "time", "id"),
+        Index("ix_entries_patient_id_time", "patient_id", "time", "id"),
+    )
 
 
 class Report(Base):
@@ -93,7 +103,7 @@ class Report(Base):
     __tablename__ = "reports"
 
     id = Column(Integer, primary_key=True, index=True)
-    entry_id = Column(Integer, ForeignKey("entries.id"), nullable=False)
+    entry_id = Column(Integer, ForeignKey("entries.id"), nullable=False, index=True)
     report_url = Column(String(500), nullable=True)  # URL to PDF (optional if markdown only)
     report_type = Column(String(50), nullable=True)  # e.g., 'analysis', 'summary', 'detailed', 'ai_generated'
     title = Column(String(200), nullable=True)
@@ -117,8 +127,55 @@ class Analysis(Base):
     clinical_report_url = Column(String(500), nullable=True)
     flow_timeseries_url = Column(String(500), nullable=True)
     qmax_report_json = Column(Text, nullable=True)  # Store JSON as text
+    timings_json = Column(Text, nullable=True)  # Per-stage timings of the run that produced it (JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     entry = relationship("Entry", back_populates="analysis")
+
+
+class AnalysisJob(Base):
+    """Queued analysis run for an Entry, executed by the worker pool (worker.py)."""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entry_id = Column(Integer, ForeignKey("entries.id"), nullable=False, index=True)
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued, running, succeeded, failed
+    options = Column(Text, nullable=True)  # JSON kwargs for run_analysis_for_entry
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    # Renewed by the worker while the job runs; a running job whose heartbeat stops was orphaned
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    entry = relationship("Entry", back_populates="analysis_jobs")
+
+
+class OutboxMessage(Base):
+    """
+    Side effect of a committed change (email, storage clean-up), written in
+    the same transaction and carried out by the worker (outbox.py).
+    """
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # see outbox.HANDLERS
+    payload = Column(Text, nullable=False)  # JSON kwargs of the handler
+    status = Column(String(20), default="pending", nullable=False)  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    # Not picked up before this time (retry backoff)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # The worker polls for pending messages that are due
+    __table_args__ = (
+        Index("ix_outbox_messages_status_available_at", "status", "available_at"),
+    )
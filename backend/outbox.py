@@ -0,0 +1,161 @@
+"""
+Transactional outbox for the side effects of API requests.
+
+An endpoint records what has to happen after its change (email the doctor,
+delete an orphaned upload) as an `outbox_messages` row in the same
+transaction, so it happens if and only if the change is committed, and
+returns without waiting for SMTP or Cloudinary. worker.py drains the
+outbox: each message is claimed with a conditional UPDATE, handed to its
+handler and retried with exponential backoff until it succeeds or runs out
+of attempts.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from models import OutboxMessage
+
+load_dotenv()
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+# Message kinds
+NEW_ENTRY_EMAIL = "new_entry_email"
+DELETE_UPLOAD = "delete_upload"
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Retry n waits OUTBOX_RETRY_BASE * 2^(n-1) seconds, at most OUTBOX_RETRY_MAX
+OUTBOX_RETRY_BASE_S = float(os.getenv("OUTBOX_RETRY_BASE", "30"))
+OUTBOX_RETRY_MAX_S = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+# Messages still being sent after this long were orphaned by a dead worker
+OUTBOX_STALE_AFTER_S = float(os.getenv("OUTBOX_STALE_AFTER", "600"))
+
+
+def send_new_entry_email(**payload):
+    import email_service
+
+    if not email_service.send_new_entry_notification(**payload) and email_service.EMAIL_ENABLED:
+        raise RuntimeError(f"Could not email {payload['doctor_email']}")
+
+
+def delete_upload(public_id: str, resource_type: str = "video"):
+    import cloudinary.uploader
+    import config.cloudinary_config  # noqa: F401  (configures the SDK)
+
+    result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+    # "not found": already deleted by an earlier attempt
+    if result.get("result") not in ("ok", "not found"):
+        raise RuntimeError(f"Cloudinary destroy of {public_id}: {result}")
+
+
+# kind -> handler(**payload); raising schedules a retry
+HANDLERS = {
+    NEW_ENTRY_EMAIL: send_new_entry_email,
+    DELETE_UPLOAD: delete_upload,
+}
+
+
+def add_outbox_message(db: Session, kind: str, **payload) -> OutboxMessage:
+    """
+    Adds a message to the session without committing: it is sent only if
+    the caller's transaction commits.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown outbox message kind: {kind}")
+    message = OutboxMessage(kind=kind, payload=json.dumps(payload), status=OUTBOX_PENDING)
+    db.add(message)
+    return message
+
+
+def claim_next_message(db: Session) -> Optional[int]:
+    """
+    Atomically moves the oldest due pending message to sending and returns
+    its id (see job_queue.claim_next_job).
+    """
+    while True:
+        candidate = (
+            db.query(OutboxMessage.id)
+            .filter(OutboxMessage.status == OUTBOX_PENDING, OutboxMessage.available_at <= datetime.utcnow())
+            .order_by(OutboxMessage.id)
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        claimed = (
+            db.query(OutboxMessage)
+            .filter(OutboxMessage.id == candidate.id, OutboxMessage.status == OUTBOX_PENDING)
+            .update({
+                OutboxMessage.status: OUTBOX_SENDING,
+                OutboxMessage.started_at: datetime.utcnow(),
+                OutboxMessage.attempts: OutboxMessage.attempts + 1,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return candidate.id
+
+
+def retry_delay_s(attempts: int) -> float:
+    return min(OUTBOX_RETRY_BASE_S * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_S)
+
+
+def process_message(db: Session, message_id: int) -> str:
+    """Runs the handler of a claimed message and records the outcome; returns the new status."""
+    message = db.query(OutboxMessage).filter(OutboxMessage.id == message_id).first()
+    try:
+        HANDLERS[message.kind](**json.loads(message.payload))
+    except Exception as e:
+        message.error = str(e)
+        if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = OUTBOX_FAILED
+            message.finished_at = datetime.utcnow()
+        else:
+            message.status = OUTBOX_PENDING
+            message.available_at = datetime.utcnow() + timedelta(seconds=retry_delay_s(message.attempts))
+    else:
+        message.status = OUTBOX_SENT
+        message.error = None
+        message.finished_at = datetime.utcnow()
+    db.commit()
+    return message.status
+
+
+def drain_outbox(db: Session) -> int:
+    """Processes the due messages one by one until none is left; returns how many were processed."""
+    processed = 0
+    while True:
+        message_id = claim_next_message(db)
+        if message_id is None:
+            return processed
+        status = process_message(db, message_id)
+        print(f"[OUTBOX] Message {message_id} {status}")
+        processed += 1
+
+
+def requeue_stale_messages(db: Session, stale_after_s: float = OUTBOX_STALE_AFTER_S) -> int:
+    """
+    Puts messages stuck in sending (their worker died) back to pending, or
+    fails those out of attempts; returns how many were requeued.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_s)
+    stale = (OutboxMessage.status == OUTBOX_SENDING, OutboxMessage.started_at < cutoff)
+    db.query(OutboxMessage).filter(*stale, OutboxMessage.attempts >= OUTBOX_MAX_ATTEMPTS).update({
+        OutboxMessage.status: OUTBOX_FAILED,
+        OutboxMessage.error: "Worker lost while sending",
+        OutboxMessage.finished_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    count = (
+        db.query(OutboxMessage)
+        .filter(*stale)
+        .update({OutboxMessage.status: OUTBOX_PENDING}, synchronize_session=False)
+    )
+    db.commit()
+    return count
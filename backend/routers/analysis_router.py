@@ -1,25 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+import os
+import time
+import asyncio
+from typing import Optional
 
-from database import get_db
-from models import User, Entry, Analysis
-from schemas import AnalysisCreate, AnalysisResponse
-from dependencies import get_current_doctor, get_current_user
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from models import User, Entry, Analysis, AnalysisJob
+from schemas import AnalysisCreate, AnalysisResponse, AnalysisJobResponse
+from job_queue import enqueue_analysis_job, ACTIVE_JOB_STATUSES, JOB_FAILED
+from dependencies import get_current_doctor_async, get_current_user_async
+
+load_dotenv()
+
+# How long POST /analysis/run waits for its job before answering 504
+ANALYSIS_RUN_TIMEOUT_S = float(os.getenv("ANALYSIS_RUN_TIMEOUT", "600"))
+ANALYSIS_RUN_POLL_S = 1.0
 
 router = APIRouter(prefix="/analysis", tags=["Analysis"])
 
 
 @router.post("/", response_model=AnalysisResponse, status_code=status.HTTP_201_CREATED)
-def create_or_update_analysis(
+async def create_or_update_analysis(
     data: AnalysisCreate,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create or update an analysis for an entry. Only doctors can create analyses."""
     entry_id = int(data.entry_id)
     
     # Verify entry exists and belongs to this doctor
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
@@ -27,7 +41,7 @@ def create_or_update_analysis(
         raise HTTPException(status_code=403, detail="You can only add analysis to your own entries")
     
     # Check if analysis already exists for this entry
-    analysis = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    analysis = (await db.execute(select(Analysis).where(Analysis.entry_id == entry_id))).scalar_one_or_none()
     
     if analysis:
         # Update existing analysis
@@ -50,19 +64,19 @@ def create_or_update_analysis(
         )
         db.add(analysis)
     
-    db.commit()
-    db.refresh(analysis)
+    await db.commit()
+    await db.refresh(analysis)
     return analysis
 
 
 @router.get("/entry/{entry_id}", response_model=AnalysisResponse)
-def get_analysis_for_entry(
+async def get_analysis_for_entry(
     entry_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get analysis for a specific entry."""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
@@ -72,7 +86,7 @@ def get_analysis_for_entry(
     if current_user.doctor and entry.doctor_id != current_user.doctor.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    analysis = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    analysis = (await db.execute(select(Analysis).where(Analysis.entry_id == entry_id))).scalar_one_or_none()
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found for this entry")
     
@@ -80,39 +94,43 @@ def get_analysis_for_entry(
 
 
 @router.delete("/entry/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_analysis(
+async def delete_analysis(
     entry_id: int,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete analysis for an entry. Only the doctor can delete."""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
     if entry.doctor_id != current_user.doctor.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    analysis = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    analysis = (await db.execute(select(Analysis).where(Analysis.entry_id == entry_id))).scalar_one_or_none()
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    db.delete(analysis)
-    db.commit()
+    await db.delete(analysis)
+    await db.commit()
     return None
 
 
 @router.post("/run/{entry_id}", response_model=AnalysisResponse)
-def run_analysis(
+async def run_analysis(
     entry_id: int,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    metrics_only: Optional[bool] = None,
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Manually trigger analysis for an entry. Only the doctor can run analysis."""
-    from analysis_runner import run_analysis_for_entry
-    
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    """
+    Manually trigger analysis for an entry and wait for it. Only the doctor can run analysis.
+    The analysis is queued and run by worker.py like POST /analysis/jobs/{entry_id},
+    never in the API process; prefer that endpoint and poll the job instead of
+    holding the request open.
+    metrics_only skips the annotated video; defaults to the doctor's preference.
+    """
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
@@ -122,39 +140,72 @@ def run_analysis(
     if not entry.top_view_url and not entry.bottom_view_url:
         raise HTTPException(status_code=400, detail="No video URLs available for analysis")
     
-    # Run analysis synchronously for immediate feedback
-    result = run_analysis_for_entry(
-        top_view_url=entry.top_view_url,
-        bottom_view_url=entry.bottom_view_url,
-        volume=entry.amount_voided,
-        entry_id=entry_id
-    )
+    if metrics_only is None:
+        metrics_only = current_user.doctor.metrics_only
+    job = await db.run_sync(enqueue_analysis_job, entry_id, metrics_only=metrics_only)
+    job_id = job.id
+    
+    deadline = time.monotonic() + ANALYSIS_RUN_TIMEOUT_S
+    while job.status in ACTIVE_JOB_STATUSES:
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Analysis is still running, poll GET /analysis/jobs/{job_id}"
+            )
+        await asyncio.sleep(ANALYSIS_RUN_POLL_S)
+        # New transaction, so the worker's commits are visible
+        await db.rollback()
+        job = await db.get(AnalysisJob, job_id, populate_existing=True)
+    
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=job.error or "Analysis failed")
+    
+    return (await db.execute(select(Analysis).where(Analysis.entry_id == entry_id))).scalar_one()
+
+
+@router.post("/jobs/{entry_id}", response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_analysis(
+    entry_id: int,
+    metrics_only: Optional[bool] = None,
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queue an analysis for an entry and return the job immediately.
+    The analysis runs in the worker pool (worker.py) and is stored in Analysis;
+    poll GET /analysis/jobs/{job_id} for its status.
+    metrics_only skips the annotated video; defaults to the doctor's preference.
+    """
+    entry = await db.get(Entry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
     
-    if not result.get("success"):
-        raise HTTPException(status_code=500, detail=result.get("error", "Analysis failed"))
+    if entry.doctor_id != current_user.doctor.id:
+        raise HTTPException(status_code=403, detail="You can only run analysis on your own entries")
     
-    # Check if analysis already exists - update instead of create
-    existing = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    if not entry.top_view_url and not entry.bottom_view_url:
+        raise HTTPException(status_code=400, detail="No video URLs available for analysis")
     
-    if existing:
-        # Update existing analysis
-        existing.annotated_video_url = result.get("annotated_video_url")
-        existing.clinical_report_url = result.get("clinical_report_url")
-        existing.flow_timeseries_url = result.get("flow_timeseries_url")
-        existing.qmax_report_json = result.get("qmax_report_json")
-        db.commit()
-        db.refresh(existing)
-        return existing
-    else:
-        # Create new analysis record
-        analysis = Analysis(
-            entry_id=entry_id,
-            annotated_video_url=result.get("annotated_video_url"),
-            clinical_report_url=result.get("clinical_report_url"),
-            flow_timeseries_url=result.get("flow_timeseries_url"),
-            qmax_report_json=result.get("qmax_report_json")
-        )
-        db.add(analysis)
-        db.commit()
-        db.refresh(analysis)
-        return analysis
+    if metrics_only is None:
+        metrics_only = current_user.doctor.metrics_only
+    return await db.run_sync(enqueue_analysis_job, entry_id, metrics_only=metrics_only)
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the status of an analysis job."""
+    job = await db.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    entry = await db.get(Entry, job.entry_id)
+    if current_user.patient and entry.patient_id != current_user.patient.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if current_user.doctor and entry.doctor_id != current_user.doctor.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return job
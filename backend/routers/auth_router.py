@@ -61,7 +61,8 @@ def signup_doctor(data: DoctorSignup, db: Session = Depends(get_db)):
         age=data.age,
         license_number=data.license_number,
         years_of_experience=data.years_of_experience,
-        auto_accept=data.auto_accept
+        auto_accept=data.auto_accept,
+        metrics_only=data.metrics_only
     )
     db.add(doctor)
     db.commit()
@@ -76,3 +76,17 @@ def toggle_auto_accept(
     db.commit()
     db.refresh(doctor)
     return doctor
+
+
+@router.patch("/me/metrics-only", response_model=DoctorResponse)
+def toggle_metrics_only(
+    metrics_only: bool,
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_db)
+):
+    """Toggle metrics-only analysis (no annotated video) for the doctor's entries."""
+    doctor = current_user.doctor
+    doctor.metrics_only = metrics_only
+    db.commit()
+    db.refresh(doctor)
+    return doctor
@@ -158,50 +158,67 @@
 #     return entry
 
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks,UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Response
+from sqlalchemy import and_, or_, case, exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
 from datetime import datetime
+import base64
 import os
 from typing import Optional
-from database import get_db
-from models import User, Doctor, Patient, Entry, Analysis
+from database import get_async_db
+from models import User, Doctor, Patient, Entry, Analysis, AnalysisJob, Report
 from schemas import EntryCreate, EntryResponse, EntryWithDetails
-from dependencies import get_current_patient, get_current_user
-from email_service import send_new_entry_notification
-from analysis_runner import run_analysis_for_entry
-from config.cloudinary_config import upload_video_file, delete_from_cloudinary
+from dependencies import get_current_patient_async, get_current_user_async
+from blocking import run_blocking
+from job_queue import add_analysis_job, ACTIVE_JOB_STATUSES, JOB_FAILED
+from outbox import add_outbox_message, NEW_ENTRY_EMAIL, DELETE_UPLOAD
+from config.cloudinary_config import upload_video_stream, delete_from_cloudinary
+from analysis_cache import get_analysis_cache
 router = APIRouter(prefix="/entry", tags=["Entries"])
 ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv", ".m4v", ".mpg", ".mpeg"}
 MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB
-def run_auto_analysis(entry_id: int, top_view_url: str, bottom_view_url: str, amount_voided: float):
-    """Background task to run analysis and store results."""
-    from database import SessionLocal
-    
-    result = run_analysis_for_entry(
-        top_view_url=top_view_url,
-        bottom_view_url=bottom_view_url,
-        volume=amount_voided,
-        entry_id=entry_id
-    )
-    
-    if result.get("success"):
-        # Store in database
-        db = SessionLocal()
-        try:
-            analysis = Analysis(
-                entry_id=entry_id,
-                annotated_video_url=result.get("annotated_video_url"),
-                clinical_report_url=result.get("clinical_report_url"),
-                flow_timeseries_url=result.get("flow_timeseries_url"),
-                qmax_report_json=result.get("qmax_report_json")
-            )
-            db.add(analysis)
-            db.commit()
-            print(f"Analysis saved for entry {entry_id}")
-        except Exception as e:
-            print(f"Error saving analysis: {e}")
-        finally:
-            db.close()
+# /entry/my-entries page size
+MY_ENTRIES_DEFAULT_LIMIT = 50
+MY_ENTRIES_MAX_LIMIT = 200
+# analysis_status of an entry: its queued/running job, else "completed" if it
+# has an analysis, else "failed" if its last job failed, else "none"
+ANALYSIS_STATUSES = ("none", "queued", "running", "failed", "completed")
+def remember_upload_hash(upload_result: dict):
+    """
+    Records the content hash computed during the upload in the analysis
+    cache, so a stored analysis of the same bytes is found without
+    downloading the video again.
+    """
+    cache = get_analysis_cache()
+    if cache is None:
+        return
+    try:
+        cache.remember_url(upload_result["url"], upload_result["content_hash"])
+    except Exception as e:
+        print(f"Could not record upload hash: {e}")
+
+
+async def schedule_upload_cleanup(db: AsyncSession, public_ids: list):
+    """
+    Deletes the uploads of an entry that was not created, through the outbox
+    (retried by the worker). Deletes them inline if the outbox cannot be
+    written, e.g. the database is down.
+    """
+    if not public_ids:
+        return
+    await db.rollback()
+    try:
+        for pid in public_ids:
+            add_outbox_message(db, DELETE_UPLOAD, public_id=pid)
+        await db.commit()
+    except Exception as e:
+        print(f"Could not queue upload clean-up: {e}")
+        await db.rollback()
+        for pid in public_ids:
+            await run_blocking(delete_from_cloudinary, pid)
+
+
 def validate_video_file(file: UploadFile):
     """Validate video file before processing"""
     if not file:
@@ -308,14 +325,18 @@ async def create_entry(
     amount_voided: Optional[float] = Form(None),
     diameter_of_commode: Optional[float] = Form(None),
     notes: Optional[str] = Form(None),
-    background_tasks: BackgroundTasks = None,
-    current_user: User = Depends(get_current_patient),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_patient_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new entry with optional video uploads to Cloudinary."""
+    """
+    Create a new entry with optional video uploads to Cloudinary.
+    Uploads run in the blocking pool, so other requests are served while the
+    videos are in flight. The doctor's email and the clean-up of uploads
+    after a failure go through the outbox (sent by worker.py).
+    """
     
     # Verify doctor exists
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    doctor = await db.get(Doctor, doctor_id, options=[selectinload(Doctor.user)])
     if not doctor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -330,17 +351,21 @@ async def create_entry(
         "bottom_view_url": None
     }
     public_ids = []
+    committed = False
     
     try:
         # Upload top view video if provided
         if top_view_video:
             validated_file = validate_video_file(top_view_video)
-            file_content = await validated_file.read()
+            ext = os.path.splitext(validated_file.filename or "")[1].lower()
             
-            upload_result = upload_video_file(
-                file_content,
-                f"top_view_p{patient.id}_d{doctor_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-                folder=f"patients/{patient.id}/entries"
+            # Streamed from the spooled upload in chunks, hashed on the way
+            upload_result = await run_blocking(
+                upload_video_stream,
+                validated_file.file,
+                f"top_view_p{patient.id}_d{doctor_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}{ext}",
+                folder=f"patients/{patient.id}/entries",
+                max_bytes=MAX_VIDEO_SIZE
             )
             
             if not upload_result["success"]:
@@ -351,23 +376,24 @@ async def create_entry(
             
             uploaded_urls["top_view_url"] = upload_result["url"]
             public_ids.append(upload_result["public_id"])
+            await run_blocking(remember_upload_hash, upload_result)
         
         # Upload bottom view video if provided
         if bottom_view_video:
             validated_file = validate_video_file(bottom_view_video)
-            file_content = await validated_file.read()
+            ext = os.path.splitext(validated_file.filename or "")[1].lower()
             
-            upload_result = upload_video_file(
-                file_content,
-                f"bottom_view_p{patient.id}_d{doctor_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-                folder=f"patients/{patient.id}/entries"
+            # Streamed from the spooled upload in chunks, hashed on the way
+            upload_result = await run_blocking(
+                upload_video_stream,
+                validated_file.file,
+                f"bottom_view_p{patient.id}_d{doctor_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}{ext}",
+                folder=f"patients/{patient.id}/entries",
+                max_bytes=MAX_VIDEO_SIZE
             )
             
             if not upload_result["success"]:
-                # Clean up already uploaded top view video if any
-                for pid in public_ids:
-                    delete_from_cloudinary(pid)
-                
+                # The top view video, if any, is cleaned up below
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Failed to upload bottom view video: {upload_result.get('error')}"
@@ -375,12 +401,14 @@ async def create_entry(
             
             uploaded_urls["bottom_view_url"] = upload_result["url"]
             public_ids.append(upload_result["public_id"])
+            await run_blocking(remember_upload_hash, upload_result)
         
         # Create entry
+        entry_time = datetime.utcnow()
         entry = Entry(
             patient_id=patient.id,
             doctor_id=doctor_id,
-            time=datetime.utcnow(),
+            time=entry_time,
             top_view_url=uploaded_urls["top_view_url"],
             bottom_view_url=uploaded_urls["bottom_view_url"],
             amount_voided=amount_voided,
@@ -388,41 +416,42 @@ async def create_entry(
             notes=notes
         )
         db.add(entry)
-        db.commit()
-        db.refresh(entry)
         
-        # Send email notification to doctor (if enabled)
+        # Email notification to doctor (if enabled), sent by the worker once
+        # the entry is committed
         doctor_user = doctor.user
-        send_new_entry_notification(
+        add_outbox_message(
+            db,
+            NEW_ENTRY_EMAIL,
             doctor_email=doctor_user.email,
             doctor_name=doctor_user.username,
             patient_name=current_user.username,
-            entry_time=entry.time.strftime("%Y-%m-%d %H:%M:%S UTC")
+            entry_time=entry_time.strftime("%Y-%m-%d %H:%M:%S UTC")
         )
         
-        # Auto-run analysis if doctor has auto_accept enabled and videos uploaded
+        # Auto-run analysis if doctor has auto_accept enabled and videos uploaded.
+        # Queued for the worker pool (worker.py) in the entry's transaction, so
+        # nothing can fail between saving the entry and queueing its analysis
         if doctor.auto_accept and (uploaded_urls["top_view_url"] or uploaded_urls["bottom_view_url"]):
-            # Run analysis in background
-            background_tasks.add_task(
-                run_analysis_for_entry,
-                entry_id=entry.id,
-                top_view_url=uploaded_urls["top_view_url"],
-                bottom_view_url=uploaded_urls["bottom_view_url"],
-                volume=amount_voided
-            )
+            await db.flush()
+            add_analysis_job(db, entry.id, metrics_only=doctor.metrics_only)
+        
+        await db.commit()
+        committed = True
+        await db.refresh(entry)
         
         return entry
         
     except HTTPException:
         # Clean up any uploaded files on error
-        for pid in public_ids:
-            delete_from_cloudinary(pid)
+        if not committed:
+            await schedule_upload_cleanup(db, public_ids)
         raise
     
     except Exception as e:
-        # Clean up any uploaded files on error
-        for pid in public_ids:
-            delete_from_cloudinary(pid)
+        # Clean up any uploaded files on error (not those of a saved entry)
+        if not committed:
+            await schedule_upload_cleanup(db, public_ids)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create entry: {str(e)}"
@@ -463,38 +492,170 @@ async def create_entry(
     
 #     return result
 
+def encode_entry_cursor(time: datetime, entry_id: int) -> str:
+    """Opaque keyset cursor: the (time, id) of the last entry of a page."""
+    return base64.urlsafe_b64encode(f"{time.isoformat()}|{entry_id}".encode()).decode()
+
+
+def decode_entry_cursor(cursor: str):
+    """Inverse of encode_entry_cursor; raises 400 on a malformed cursor."""
+    try:
+        time, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(time), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def analysis_status_column():
+    """SQL expression of an entry's analysis_status (see ANALYSIS_STATUSES)."""
+    latest_job = (
+        select(AnalysisJob.status)
+        .where(AnalysisJob.entry_id == Entry.id)
+        .order_by(AnalysisJob.id.desc())
+        .limit(1)
+        .correlate(Entry)
+        .scalar_subquery()
+    )
+    has_analysis = exists().where(Analysis.entry_id == Entry.id)
+    return case(
+        (latest_job.in_(ACTIVE_JOB_STATUSES), latest_job),
+        (has_analysis, "completed"),
+        (latest_job == JOB_FAILED, "failed"),
+        else_="none"
+    )
+
+
+def my_entries_filter(current_user: User):
+    """WHERE clause of the current user's entries (their own, or their patients')."""
+    if current_user.patient:
+        return Entry.patient_id == current_user.patient.id
+    if current_user.doctor:
+        return Entry.doctor_id == current_user.doctor.id
+    raise HTTPException(status_code=400, detail="No role assigned")
+
+
+def my_entries_query(
+    current_user: User,
+    limit: int,
+    cursor: Optional[str] = None,
+    patient_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    analysis_status: Optional[str] = None
+):
+    """
+    Statement of one /entry/my-entries page (see get_my_entries): limit + 1
+    rows, the extra one telling whether there is a next page.
+    """
+    if analysis_status is not None and analysis_status not in ANALYSIS_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid analysis_status. Allowed: {', '.join(ANALYSIS_STATUSES)}"
+        )
+
+    PatientUser = aliased(User)
+    DoctorUser = aliased(User)
+    status_column = analysis_status_column().label("analysis_status")
+    # Only the columns the list shows, names joined in the same query
+    query = (
+        select(
+            Entry.id, Entry.patient_id, Entry.doctor_id, Entry.time,
+            Entry.top_view_url, Entry.bottom_view_url, Entry.amount_voided,
+            Entry.diameter_of_commode, Entry.notes, Entry.created_at,
+            PatientUser.username.label("patient_name"),
+            DoctorUser.username.label("doctor_name"),
+            status_column
+        )
+        .outerjoin(Patient, Entry.patient_id == Patient.id)
+        .outerjoin(PatientUser, Patient.user_id == PatientUser.id)
+        .outerjoin(Doctor, Entry.doctor_id == Doctor.id)
+        .outerjoin(DoctorUser, Doctor.user_id == DoctorUser.id)
+    )
+
+    query = query.where(my_entries_filter(current_user))
+
+    if patient_id is not None:
+        query = query.where(Entry.patient_id == patient_id)
+    if date_from is not None:
+        query = query.where(Entry.time >= date_from)
+    if date_to is not None:
+        query = query.where(Entry.time <= date_to)
+    if analysis_status is not None:
+        query = query.where(status_column == analysis_status)
+    if cursor:
+        after_time, after_id = decode_entry_cursor(cursor)
+        query = query.where(or_(
+            Entry.time < after_time,
+            and_(Entry.time == after_time, Entry.id < after_id)
+        ))
+
+    return query.order_by(Entry.time.desc(), Entry.id.desc()).limit(limit + 1)
+
+
+@router.get("/my-entries/stats")
+async def get_my_entries_stats(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Totals over all of the current user's entries, which /entry/my-entries
+    only returns a page at a time: entries, and those with a report.
+    """
+    reviewed = exists().where(Report.entry_id == Entry.id)
+    total, reviewed_count = (await db.execute(
+        select(func.count(Entry.id), func.count(case((reviewed, 1))))
+        .where(my_entries_filter(current_user))
+    )).one()
+    return {"total_entries": total, "reviewed_entries": reviewed_count}
+
+
 @router.get("/my-entries")
-def get_my_entries(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_my_entries(
+    response: Response,
+    limit: int = Query(MY_ENTRIES_DEFAULT_LIMIT, ge=1, le=MY_ENTRIES_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    patient_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    analysis_status: Optional[str] = Query(None, description=", ".join(ANALYSIS_STATUSES)),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get entries for the current user with patient/doctor details."""
-    if current_user.patient:
-        entries = db.query(Entry).filter(Entry.patient_id == current_user.patient.id).all()
-    elif current_user.doctor:
-        entries = db.query(Entry).filter(Entry.doctor_id == current_user.doctor.id).all()
-    else:
-        raise HTTPException(status_code=400, detail="No role assigned")
-    
+    """
+    Get entries for the current user with patient/doctor details, newest
+    first, one page per call.
+
+    Pages are keyed on (time, id): pass the X-Next-Cursor response header
+    of a page as `cursor` to get the next one (no header on the last page).
+    The whole page is one query, whatever its size.
+    """
+    query = my_entries_query(current_user, limit, cursor, patient_id, date_from, date_to, analysis_status)
+    # One extra row tells whether there is a next page
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_entry_cursor(rows[-1].time, rows[-1].id)
+
     # Build response with patient/doctor names
     result = []
-    for entry in entries:
+    for row in rows:
         entry_dict = {
-            "id": entry.id,
-            "patient_id": entry.patient_id,
-            "doctor_id": entry.doctor_id,
-            "time": entry.time.isoformat(),
-            "top_view_url": entry.top_view_url,
-            "bottom_view_url": entry.bottom_view_url,
-            "amount_voided": entry.amount_voided,
-            "diameter_of_commode": entry.diameter_of_commode,
-            "notes": entry.notes,
-            "created_at": entry.created_at.isoformat(),
-            "patient_name": entry.patient.user.username if entry.patient else None,
-            "doctor_name": entry.doctor.user.username if entry.doctor else None,
+            "id": row.id,
+            "patient_id": row.patient_id,
+            "doctor_id": row.doctor_id,
+            "time": row.time.isoformat(),
+            "top_view_url": row.top_view_url,
+            "bottom_view_url": row.bottom_view_url,
+            "amount_voided": row.amount_voided,
+            "diameter_of_commode": row.diameter_of_commode,
+            "notes": row.notes,
+            "created_at": row.created_at.isoformat(),
+            "patient_name": row.patient_name,
+            "doctor_name": row.doctor_name,
+            "analysis_status": row.analysis_status,
         }
         result.append(entry_dict)
-    
+
     return result
 
 # @router.get("/{entry_id}", response_model=EntryWithDetails)
@@ -516,13 +677,13 @@ def get_my_entries(
     
 #     return entry
 @router.get("/{entry_id}", response_model=EntryResponse)
-def get_entry(
+async def get_entry(
     entry_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific entry with full details."""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
@@ -1,27 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 
-from database import get_db
+from database import get_async_db
 from models import User, Doctor, Entry, Report, Analysis, Patient
 from schemas import ReportCreate, ReportResponse
-from dependencies import get_current_doctor, get_current_user
+from dependencies import get_current_doctor_async, get_current_user_async
+from blocking import run_blocking
 
 router = APIRouter(prefix="/report", tags=["Reports"])
 
 
 @router.post("/", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-def create_report(
+async def create_report(
     data: ReportCreate,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new report for an entry. Only doctors can create reports."""
     # Convert entry_id to int
     entry_id = int(data.entry_id)
     
     # Verify entry exists and belongs to this doctor
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -43,20 +46,20 @@ def create_report(
         description=data.description
     )
     db.add(report)
-    db.commit()
-    db.refresh(report)
+    await db.commit()
+    await db.refresh(report)
     
     return report
 
 
 @router.get("/entry/{entry_id}", response_model=list[ReportResponse])
-def get_reports_for_entry(
+async def get_reports_for_entry(
     entry_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all reports for a specific entry."""
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
@@ -66,36 +69,36 @@ def get_reports_for_entry(
     if current_user.doctor and entry.doctor_id != current_user.doctor.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    reports = db.query(Report).filter(Report.entry_id == entry_id).all()
+    reports = (await db.execute(select(Report).where(Report.entry_id == entry_id))).scalars().all()
     return reports
 
 
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_report(
+async def delete_report(
     report_id: int,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a report. Only the doctor who created it can delete."""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
     # Check that the entry belongs to this doctor
-    entry = db.query(Entry).filter(Entry.id == report.entry_id).first()
+    entry = await db.get(Entry, report.entry_id)
     if entry.doctor_id != current_user.doctor.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    db.delete(report)
-    db.commit()
+    await db.delete(report)
+    await db.commit()
     return None
 
 
 @router.post("/generate/{entry_id}", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-def generate_ai_report(
+async def generate_ai_report(
     entry_id: int,
-    current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_doctor_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate an AI-powered medical report for an entry.
@@ -103,7 +106,7 @@ def generate_ai_report(
     The report is saved as PDF to Cloudinary and stored in the database.
     """
     # Verify entry exists and belongs to this doctor
-    entry = db.query(Entry).filter(Entry.id == entry_id).first()
+    entry = await db.get(Entry, entry_id)
     if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -117,7 +120,7 @@ def generate_ai_report(
         )
     
     # Get patient data
-    patient = db.query(Patient).filter(Patient.id == entry.patient_id).first()
+    patient = await db.get(Patient, entry.patient_id, options=[selectinload(Patient.user)])
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -125,7 +128,7 @@ def generate_ai_report(
     doctor = current_user.doctor
     
     # Get analysis data if available
-    analysis = db.query(Analysis).filter(Analysis.entry_id == entry_id).first()
+    analysis = (await db.execute(select(Analysis).where(Analysis.entry_id == entry_id))).scalar_one_or_none()
     
     # Prepare data for report generation
     patient_data = {
@@ -138,7 +141,7 @@ def generate_ai_report(
     }
     
     doctor_data = {
-        "username": doctor.user.username if doctor.user else "Unknown",
+        "username": current_user.username,
         "specialization": doctor.specialization,
         "hospital": doctor.hospital,
         "license_number": doctor.license_number,
@@ -164,7 +167,9 @@ def generate_ai_report(
     try:
         from report_generator import generate_and_upload_report
         
-        result = generate_and_upload_report(
+        # LLM call, PDF rendering and upload: off the event loop
+        result = await run_blocking(
+            generate_and_upload_report,
             patient_data=patient_data,
             doctor_data=doctor_data,
             entry_data=entry_data,
@@ -189,8 +194,8 @@ def generate_ai_report(
             is_ai_generated=True
         )
         db.add(report)
-        db.commit()
-        db.refresh(report)
+        await db.commit()
+        await db.refresh(report)
         
         return report
         
@@ -36,6 +36,7 @@ class DoctorSignup(BaseModel):
     license_number: Optional[str] = None
     years_of_experience: Optional[int] = None
     auto_accept: bool = False
+    metrics_only: bool = False
 
 
 class DoctorUpdate(BaseModel):
@@ -48,6 +49,7 @@ class DoctorUpdate(BaseModel):
     license_number: Optional[str] = None
     years_of_experience: Optional[int] = None
     auto_accept: Optional[bool] = None
+    metrics_only: Optional[bool] = None
 
 
 class DoctorResponse(BaseModel):
@@ -61,6 +63,7 @@ class DoctorResponse(BaseModel):
     license_number: Optional[str] = None
     years_of_experience: Optional[int] = None
     auto_accept: bool
+    metrics_only: bool = False
     user: UserResponse
 
     class Config:
@@ -224,6 +227,7 @@ class AnalysisResponse(BaseModel):
     clinical_report_url: Optional[str] = None
     flow_timeseries_url: Optional[str] = None
     qmax_report_json: Optional[str] = None
+    timings_json: Optional[str] = None  # JSON string, see analysis_runner.run_analysis_for_entry
     created_at: datetime
     updated_at: datetime
 
@@ -231,5 +235,19 @@ class AnalysisResponse(BaseModel):
         from_attributes = True
 
 
+class AnalysisJobResponse(BaseModel):
+    id: int
+    entry_id: int
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 
 
@@ -0,0 +1,160 @@
+"""
+Latency of the entry list and lookup endpoints on a large database, before
+and after the hot-query index migration.
+
+Seeds a scratch SQLite database at the baseline revision (0001) with
+--entries entries spread over doctors and patients, times the endpoints
+through the app, upgrades it to head and times them again.
+
+    python scripts/benchmark_db.py                   # 1M entries
+    python scripts/benchmark_db.py --entries 100000
+"""
+import sys
+import os
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alembic import command
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from auth import create_access_token
+from database import get_async_db, create_async_db_engine
+from init_db import alembic_config, BASELINE_REVISION
+from models import User, Doctor, Patient, Entry, Report, Analysis
+
+BATCH = 50000
+
+def migrate(engine, revision):
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+def seed(engine, entries, doctors, patients):
+    """Bulk-inserts the users, then entries over the last ~3 years with a report and an analysis for every third."""
+    rng = random.Random(1)
+    start = datetime(2023, 1, 1)
+    span_s = 3 * 365 * 24 * 3600
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i + 1, "username": f"user{i}", "password": "x", "email": f"user{i}@example.com"}
+            for i in range(doctors + patients)
+        ])
+        conn.execute(insert(Doctor), [
+            {"id": i + 1, "user_id": i + 1, "hospital": "H", "specialization": "Urology",
+             "qualification": "MD", "auto_accept": False, "metrics_only": False}
+            for i in range(doctors)
+        ])
+        conn.execute(insert(Patient), [
+            {"id": i + 1, "user_id": doctors + i + 1} for i in range(patients)
+        ])
+        for first in range(1, entries + 1, BATCH):
+            ids = range(first, min(first + BATCH, entries + 1))
+            rows = []
+            for entry_id in ids:
+                # Each patient sees one doctor
+                patient_id = rng.randrange(patients) + 1
+                rows.append({
+                    "id": entry_id, "patient_id": patient_id, "doctor_id": patient_id % doctors + 1,
+                    "time": start + timedelta(seconds=rng.randrange(span_s)),
+                    "amount_voided": 250.0, "notes": "seeded",
+                })
+            conn.execute(insert(Entry), rows)
+            conn.execute(insert(Report), [
+                {"entry_id": entry_id, "title": "Report", "is_ai_generated": False}
+                for entry_id in ids if entry_id % 3 == 0
+            ])
+            conn.execute(insert(Analysis), [
+                {"entry_id": entry_id, "qmax_report_json": "{}"}
+                for entry_id in ids if entry_id % 3 == 0
+            ])
+
+def measure(client, url, params, repeats):
+    """Median and worst latency (ms) of a GET after one warm-up call."""
+    response = client.get(url, params=params)
+    assert response.status_code == 200, f"{url}: {response.status_code} {response.text}"
+    samples = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        client.get(url, params=params)
+        samples.append(1000 * (time.perf_counter() - begin))
+    return statistics.median(samples), max(samples), response
+
+def run_cases(client, as_user, doctor_user_id, patient_user_id, entry_id, repeats):
+    as_user(doctor_user_id)
+    first = measure(client, "/entry/my-entries", {}, repeats)
+    cursor = first[2].headers["X-Next-Cursor"]
+    cases = [
+        ("doctor: my-entries, first page", first),
+        ("doctor: my-entries, next page", measure(client, "/entry/my-entries", {"cursor": cursor}, repeats)),
+        ("doctor: entry lookup", measure(client, f"/entry/{entry_id}", {}, repeats)),
+        ("doctor: reports of entry", measure(client, f"/report/entry/{entry_id}", {}, repeats)),
+        ("doctor: analysis of entry", measure(client, f"/analysis/entry/{entry_id}", {}, repeats)),
+    ]
+    as_user(patient_user_id)
+    cases.append(("patient: my-entries, first page", measure(client, "/entry/my-entries", {}, repeats)))
+    return [(label, median, worst) for label, (median, worst, _) in cases]
+
+def main():
+    parser = argparse.ArgumentParser(description="Entry endpoint latency before/after the index migration")
+    parser.add_argument("--entries", type=int, default=1000000, help="Entries to seed")
+    parser.add_argument("--doctors", type=int, default=50, help="Doctors to seed")
+    parser.add_argument("--patients", type=int, default=5000, help="Patients to seed")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls per endpoint")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_db_") as work_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+                               connect_args={"check_same_thread": False})
+        migrate(engine, BASELINE_REVISION)
+        begin = time.perf_counter()
+        seed(engine, args.entries, args.doctors, args.patients)
+        print(f"Seeded {args.entries} entries in {time.perf_counter() - begin:.1f}s")
+
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        async_engine = create_async_db_engine(str(engine.url))
+        AsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+        async def bench_db():
+            async with AsyncSession() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = bench_db
+
+        # A busy doctor, one of their patients and an entry with a report
+        with Session() as db:
+            entry = db.get(Entry, args.entries - args.entries % 3)
+            doctor_user_id = db.get(Doctor, entry.doctor_id).user_id
+            patient_user_id = db.get(Patient, entry.patient_id).user_id
+
+        # One event loop for all requests, shared with the async engine's pool
+        with TestClient(app) as client:
+            def as_user(user_id):
+                client.headers["Authorization"] = f"Bearer {create_access_token({'sub': str(user_id)})}"
+
+            before = run_cases(client, as_user, doctor_user_id, patient_user_id, entry.id, args.repeats)
+            begin = time.perf_counter()
+            migrate(engine, "head")
+            print(f"Migrated to head in {time.perf_counter() - begin:.1f}s\n")
+            after = run_cases(client, as_user, doctor_user_id, patient_user_id, entry.id, args.repeats)
+            client.portal.call(async_engine.dispose)
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+    print(f"{'endpoint':<34}{'before (median / max ms)':>26}{'after':>20}{'speed-up':>10}")
+    for (label, median_before, worst_before), (_, median_after, worst_after) in zip(before, after):
+        print(f"{label:<34}{median_before:>14.1f} / {worst_before:>8.1f}"
+              f"{median_after:>11.1f} / {worst_after:>6.1f}{median_before / median_after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Latency of unrelated requests while a slow video upload is in flight.
+
+POST /entry/ uploads through the Cloudinary SDK, which blocks. Replaced
+here by a fake upload_large that trickles the file out over
+--upload-seconds, it must not hold up the event loop: the entry list and
+lookup requests sent meanwhile should be about as fast as without the
+upload. Runs in-process against the app on a scratch SQLite database.
+
+    python scripts/load_test_async.py
+    python scripts/load_test_async.py --upload-seconds 10 --uploads 3
+"""
+import sys
+import os
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# No analysis cache writes from the upload hashes
+os.environ.setdefault("ANALYSIS_CACHE_MAX_BYTES", "0")
+
+import cloudinary.uploader
+import httpx
+from alembic import command
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from main import app
+from auth import create_access_token
+from database import get_async_db, create_db_engine, create_async_db_engine
+from init_db import alembic_config
+from models import User, Doctor, Patient, Entry
+
+VIDEO_BYTES = 4 * 1024 * 1024
+
+def slow_upload_large(upload_seconds):
+    """upload_large stand-in: reads the file in chunks over upload_seconds, blocking like the SDK."""
+    def upload_large(fileobj, chunk_size=6000000, filename=None, **options):
+        chunks = max(1, VIDEO_BYTES // (256 * 1024))
+        sent = 0
+        for _ in range(chunks):
+            sent += len(fileobj.read(VIDEO_BYTES // chunks))
+            time.sleep(upload_seconds / chunks)
+        sent += len(fileobj.read())
+        return {"public_id": f"test/{filename}", "secure_url": f"https://example.com/{filename}", "bytes": sent}
+    return upload_large
+
+def seed(url, entries):
+    engine = create_db_engine(url)
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": 1, "username": "doctor", "password": "x", "email": "doctor@example.com"},
+            {"id": 2, "username": "patient", "password": "x", "email": "patient@example.com"},
+        ])
+        conn.execute(insert(Doctor), [{"id": 1, "user_id": 1, "hospital": "H", "specialization": "Urology",
+                                       "qualification": "MD", "auto_accept": False, "metrics_only": False}])
+        conn.execute(insert(Patient), [{"id": 1, "user_id": 2}])
+        conn.execute(insert(Entry), [
+            {"patient_id": 1, "doctor_id": 1, "time": start + timedelta(hours=i), "amount_voided": 250.0}
+            for i in range(entries)
+        ])
+    engine.dispose()
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+async def probe(client, until, interval_s):
+    """GETs the doctor's entry list and an entry in turn until until() is true; returns latencies (ms)."""
+    latencies = []
+    while not until():
+        for url in ("/entry/my-entries", "/entry/1"):
+            begin = time.perf_counter()
+            response = await client.get(url, headers=auth(1))
+            assert response.status_code == 200, f"{url}: {response.status_code} {response.text}"
+            latencies.append(1000 * (time.perf_counter() - begin))
+        await asyncio.sleep(interval_s)
+    return latencies
+
+async def upload(client, index):
+    begin = time.perf_counter()
+    response = await client.post(
+        "/entry/",
+        data={"doctor_id": "1", "amount_voided": "250"},
+        files={"top_view_video": (f"upload{index}.mp4", b"\0" * VIDEO_BYTES, "video/mp4")},
+        headers=auth(2),
+    )
+    assert response.status_code == 201, f"upload: {response.status_code} {response.text}"
+    return time.perf_counter() - begin
+
+def summary(label, latencies):
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"{label:<22}{len(latencies):>6} requests  median {statistics.median(latencies):7.1f} ms"
+          f"  p95 {p95:7.1f} ms  max {max(latencies):7.1f} ms")
+    return p95
+
+async def run(args, url):
+    async_engine = create_async_db_engine(url)
+    Session = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def test_db():
+        async with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = test_db
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Without uploads, for the same duration
+            deadline = time.perf_counter() + args.upload_seconds
+            idle = await probe(client, lambda: time.perf_counter() >= deadline, args.interval)
+
+            uploads = [asyncio.create_task(upload(client, i)) for i in range(args.uploads)]
+            busy = await probe(client, lambda: all(task.done() for task in uploads), args.interval)
+            upload_s = [await task for task in uploads]
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+
+    print(f"{args.uploads} upload(s) of {VIDEO_BYTES // (1024 * 1024)} MB, {args.upload_seconds:.0f} s each: "
+          f"done in {max(upload_s):.1f} s")
+    idle_p95 = summary("without upload", idle)
+    busy_p95 = summary("during upload", busy)
+    return idle_p95, busy_p95
+
+def main():
+    parser = argparse.ArgumentParser(description="Unrelated request latency while a slow upload runs")
+    parser.add_argument("--upload-seconds", type=float, default=5, help="Duration of each fake upload")
+    parser.add_argument("--uploads", type=int, default=1, help="Concurrent uploads")
+    parser.add_argument("--interval", type=float, default=0.05, help="Pause between probe requests (s)")
+    parser.add_argument("--entries", type=int, default=2000, help="Entries to seed")
+    parser.add_argument("--max-slowdown", type=float, default=3.0,
+                        help="Fail if the p95 during the upload exceeds this multiple of the idle p95")
+    args = parser.parse_args()
+
+    cloudinary.uploader.upload_large = slow_upload_large(args.upload_seconds)
+    with tempfile.TemporaryDirectory(prefix="load_async_") as work_dir:
+        url = f"sqlite:///{os.path.join(work_dir, 'test.db')}"
+        seed(url, args.entries)
+        idle_p95, busy_p95 = asyncio.run(run(args, url))
+
+    if busy_p95 > args.max_slowdown * idle_p95:
+        print(f"\nRequests during the upload are {busy_p95 / idle_p95:.1f}x slower (p95)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Concurrent mixed read/write load on SQLite: the engine of database.py
+(WAL, busy_timeout, synchronous=NORMAL) against SQLite's defaults
+(rollback journal), which is what database.py used to create.
+
+Several processes (API workers and analysis workers share the database
+file) each run threads looping over the app's own queries: the
+/entry/my-entries page, an entry lookup, entry creation with its analysis
+job, and the worker's claim / save result / finish cycle.
+
+    python scripts/load_test_db.py
+    python scripts/load_test_db.py --processes 4 --threads 8 --duration 20
+"""
+import sys
+import os
+import argparse
+import multiprocessing
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alembic import command
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine
+from job_queue import claim_next_job, enqueue_analysis_job, finish_job, save_analysis_result, JOB_SUCCEEDED
+from models import User, Doctor, Patient, Entry, AnalysisJob
+from routers.entry_router import my_entries_query
+from init_db import alembic_config
+
+ENGINES = {
+    # database.py before it read its settings from the environment
+    "sqlite defaults": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+    "database.py": create_db_engine,
+}
+
+def seed(engine, entries, doctors, patients):
+    rng = random.Random(1)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i + 1, "username": f"user{i}", "password": "x", "email": f"user{i}@example.com"}
+            for i in range(doctors + patients)
+        ])
+        conn.execute(insert(Doctor), [
+            {"id": i + 1, "user_id": i + 1, "hospital": "H", "specialization": "Urology",
+             "qualification": "MD", "auto_accept": False, "metrics_only": False}
+            for i in range(doctors)
+        ])
+        conn.execute(insert(Patient), [{"id": i + 1, "user_id": doctors + i + 1} for i in range(patients)])
+        conn.execute(insert(Entry), [
+            {"patient_id": p, "doctor_id": p % doctors + 1, "amount_voided": 250.0,
+             "time": start + timedelta(minutes=rng.randrange(500000))}
+            for p in (rng.randrange(patients) + 1 for _ in range(entries))
+        ])
+
+def list_entries(db, rng, args):
+    user = db.get(User, rng.randrange(args.doctors) + 1)
+    db.execute(my_entries_query(user, limit=50)).all()
+
+def lookup_entry(db, rng, args):
+    db.get(Entry, rng.randrange(args.entries) + 1)
+
+def create_entry(db, rng, args):
+    patient_id = rng.randrange(args.patients) + 1
+    entry = Entry(patient_id=patient_id, doctor_id=patient_id % args.doctors + 1,
+                  time=datetime.utcnow(), amount_voided=250.0)
+    db.add(entry)
+    db.commit()
+    enqueue_analysis_job(db, entry.id)
+
+def run_job(db, rng, args):
+    job_id = claim_next_job(db)
+    if job_id is None:
+        return
+    save_analysis_result(db, db.get(AnalysisJob, job_id).entry_id, {"qmax_report_json": "{}"})
+    finish_job(db, job_id, JOB_SUCCEEDED)
+
+def worker_process(engine_name, url, args, seed_value, results):
+    """Runs args.threads looping threads for args.duration seconds; puts (op latencies, errors)."""
+    engine = ENGINES[engine_name](url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    reads = (list_entries, lookup_entry)
+    writes = (create_entry, run_job)
+    latencies = {op.__name__: [] for op in reads + writes}
+    errors = []
+    deadline = time.perf_counter() + args.duration
+
+    def loop(thread_seed):
+        rng = random.Random(thread_seed)
+        while time.perf_counter() < deadline:
+            op = rng.choice(writes if rng.random() < args.write_ratio else reads)
+            db = Session()
+            begin = time.perf_counter()
+            try:
+                op(db, rng, args)
+                latencies[op.__name__].append(time.perf_counter() - begin)
+            except OperationalError as e:
+                db.rollback()
+                errors.append(str(e.orig))
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=loop, args=(seed_value * 100 + i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    results.put((latencies, errors))
+
+def run(engine_name, work_dir, args):
+    url = f"sqlite:///{os.path.join(work_dir, engine_name.replace(' ', '_').replace('.', '_'))}.db"
+    engine = ENGINES[engine_name](url)
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    seed(engine, args.entries, args.doctors, args.patients)
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker_process, args=(engine_name, url, args, i, results))
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies, errors = {}, []
+    for process_latencies, process_errors in collected:
+        for op, samples in process_latencies.items():
+            latencies.setdefault(op, []).extend(samples)
+        errors.extend(process_errors)
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite engine settings under concurrent reads and writes")
+    parser.add_argument("--processes", type=int, default=3, help="Processes sharing the database")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per process")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per configuration")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="Share of write operations")
+    parser.add_argument("--entries", type=int, default=20000, help="Entries to seed")
+    parser.add_argument("--doctors", type=int, default=20, help="Doctors to seed")
+    parser.add_argument("--patients", type=int, default=1000, help="Patients to seed")
+    args = parser.parse_args()
+
+    summary = {}
+    with tempfile.TemporaryDirectory(prefix="load_db_") as work_dir:
+        for engine_name in ENGINES:
+            latencies, errors = run(engine_name, work_dir, args)
+            ops = sum(len(samples) for samples in latencies.values())
+            summary[engine_name] = ops / args.duration
+            print(f"\n{engine_name}: {ops / args.duration:.1f} ops/s, {len(errors)} errors"
+                  + (f" (e.g. {errors[0]})" if errors else ""))
+            for op, samples in latencies.items():
+                if samples:
+                    p95 = statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+                    print(f"  {op:<14}{len(samples):>7} ops  median {1000 * statistics.median(samples):7.1f} ms"
+                          f"  p95 {1000 * p95:7.1f} ms")
+
+    baseline, configured = summary.values()
+    print(f"\nThroughput: {configured / baseline:.2f}x")
+
+if __name__ == "__main__":
+    main()
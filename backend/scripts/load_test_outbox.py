@@ -0,0 +1,149 @@
+"""
+Entry creation latency with the doctor's email on the outbox, and the
+outbox drain that sends it.
+
+SMTP is replaced by a fake server whose connection + STARTTLS + login take
+--smtp-seconds; every --fail-every-th send fails. A
+failed upload exercises the clean-up message. POST /entry/ must not wait
+for any of it; drain_outbox (as worker.py runs it) must then deliver every
+message, retries included.
+
+    python scripts/load_test_outbox.py
+    python scripts/load_test_outbox.py --entries 100 --smtp-seconds 2
+"""
+import sys
+import os
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.update({
+    "EMAIL_ENABLED": "true", "SMTP_USER": "sender@example.com", "SMTP_PASSWORD": "x",
+    "OUTBOX_RETRY_BASE": "0.2", "ANALYSIS_CACHE_MAX_BYTES": "0",
+})
+
+import cloudinary.uploader
+import httpx
+import smtplib
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from database import get_async_db, create_db_engine, create_async_db_engine
+from models import OutboxMessage
+from outbox import drain_outbox, OUTBOX_SENT, DELETE_UPLOAD
+from scripts.load_test_async import seed, auth
+
+def fake_smtp(connect_seconds, fail_every, delivered):
+    """smtplib.SMTP stand-in: slow handshake, every fail_every-th send fails."""
+    sends = []
+
+    class FakeSMTP:
+        def __init__(self, host, port):
+            time.sleep(connect_seconds / 2)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def starttls(self):
+            time.sleep(connect_seconds / 4)
+
+        def login(self, user, password):
+            time.sleep(connect_seconds / 4)
+
+        def sendmail(self, sender, to, message):
+            sends.append(to)
+            if fail_every and len(sends) % fail_every == 0:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            delivered.append(to)
+
+    return FakeSMTP
+
+def failing_bottom_upload(fileobj, filename=None, **options):
+    """upload_large stand-in: top views upload, bottom views fail."""
+    if filename.startswith("bottom_view"):
+        raise ConnectionError("Upload interrupted")
+    data = fileobj.read()
+    return {"public_id": f"test/{filename}", "secure_url": f"https://example.com/{filename}", "bytes": len(data)}
+
+async def create_entries(url, count):
+    """POSTs count entries without videos plus one with a failing bottom upload; returns latencies (ms)."""
+    async_engine = create_async_db_engine(url)
+    Session = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def test_db():
+        async with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = test_db
+    latencies = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for i in range(count):
+                begin = time.perf_counter()
+                response = await client.post("/entry/", data={"doctor_id": "1", "notes": str(i)}, headers=auth(2))
+                latencies.append(1000 * (time.perf_counter() - begin))
+                assert response.status_code == 201, f"{response.status_code} {response.text}"
+
+            response = await client.post(
+                "/entry/", data={"doctor_id": "1"}, headers=auth(2),
+                files={"top_view_video": ("top.mp4", b"\0" * 1024, "video/mp4"),
+                       "bottom_view_video": ("bottom.mp4", b"\0" * 1024, "video/mp4")},
+            )
+            assert response.status_code == 500, f"{response.status_code} {response.text}"
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Entry creation latency with outbox side effects")
+    parser.add_argument("--entries", type=int, default=40, help="Entries to create")
+    parser.add_argument("--smtp-seconds", type=float, default=1.0, help="Fake SMTP connect + STARTTLS + login time")
+    parser.add_argument("--fail-every", type=int, default=5, help="Every n-th send fails (0: never)")
+    args = parser.parse_args()
+
+    delivered, destroyed = [], []
+    smtplib.SMTP = fake_smtp(args.smtp_seconds, args.fail_every, delivered)
+    cloudinary.uploader.upload_large = failing_bottom_upload
+    cloudinary.uploader.destroy = lambda public_id, **options: destroyed.append(public_id) or {"result": "ok"}
+
+    with tempfile.TemporaryDirectory(prefix="load_outbox_") as work_dir:
+        url = f"sqlite:///{os.path.join(work_dir, 'test.db')}"
+        seed(url, 1)
+        latencies = asyncio.run(create_entries(url, args.entries))
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"POST /entry/: {len(latencies)} entries, median {statistics.median(latencies):.1f} ms, "
+              f"p95 {p95:.1f} ms (SMTP handshake {1000 * args.smtp_seconds:.0f} ms)")
+
+        engine = create_db_engine(url)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            begin = time.perf_counter()
+            # Retries come due after their backoff
+            while db.query(OutboxMessage).filter(OutboxMessage.status != OUTBOX_SENT).count():
+                drain_outbox(db)
+                time.sleep(0.1)
+            drained_s = time.perf_counter() - begin
+            messages = db.query(OutboxMessage).all()
+        engine.dispose()
+
+    retried = sum(1 for m in messages if m.attempts > 1)
+    cleanups = sum(1 for m in messages if m.kind == DELETE_UPLOAD)
+    print(f"Outbox: {len(messages)} messages sent in {drained_s:.1f} s, {retried} after a retry; "
+          f"{len(delivered)} emails delivered, {len(destroyed)} upload(s) deleted")
+    if len(delivered) != args.entries or cleanups != 1 or len(destroyed) != 1 or "top_view" not in destroyed[0]:
+        print("Outbox did not deliver every message exactly once")
+        sys.exit(1)
+    if p95 >= 1000 * args.smtp_seconds:
+        print("Entry creation still waits for SMTP")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
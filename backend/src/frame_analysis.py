@@ -0,0 +1,115 @@
+import cv2
+from .segmentation import StreamSegmenter
+from .tracking import StreamTracker
+from .sampling import AdaptiveSampler, IDLE_STATS, IDLE_STRIDE
+from .timing import NULL_TIMER
+from .buffers import BufferPool
+
+class FrameContext:
+    """
+    Everything the stages derive from one frame, computed once and shared:
+    grayscale, clean mask, stream contour, its bounding box and centroid,
+    and the tracker stats.
+
+    The arrays live in buffers reused from frame to frame, so they are only
+    valid until the next FrameAnalyzer.analyse() call (copy what must be
+    kept). The grayscale alternates between two buffers: the previous
+    frame's gray, held as optical flow reference by the tracker or the
+    sampler, survives the next frame's conversion.
+    """
+    def __init__(self):
+        self.buffers = BufferPool()
+        self._gray_slot = 0
+        self.frame = None
+        self.gray = None
+        # Clean kinematic mask (None for skipped idle frames)
+        self.mask = None
+        self.contour = None
+        # (x, y, w, h) of the stream in frame coordinates
+        self.bbox = None
+        self.centroid = None
+        self.stats = IDLE_STATS
+        self._stream_mask = None
+
+    def load(self, frame):
+        """Starts a new frame: converts it to grayscale and clears the results."""
+        self._gray_slot ^= 1
+        gray = self.buffers.get(f"gray{self._gray_slot}", frame.shape[:2])
+        self.frame = frame
+        self.gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        self.mask = None
+        self.contour = None
+        self.bbox = None
+        self.centroid = None
+        self.stats = IDLE_STATS
+        self._stream_mask = None
+
+    def mask_buffer(self):
+        """Frame-sized buffer select_stream() writes the clean mask into."""
+        return self.buffers.get("mask", self.frame.shape[:2])
+
+    def stream_mask(self):
+        """The stream contour rasterised (filled), drawn at most once per frame."""
+        if self._stream_mask is None:
+            self._stream_mask = self.buffers.zeros("stream_mask", self.frame.shape[:2])
+            if self.contour is not None:
+                cv2.drawContours(self._stream_mask, [self.contour], -1, 255, -1)
+        return self._stream_mask
+
+class FrameAnalyzer:
+    """
+    Per-frame stream analysis shared by the pipelines: background
+    subtraction, adaptive idle sampling, stream selection and velocity.
+
+    Frames must be passed in order; all state (background model, ROI lock,
+    sampler, previous frame for optical flow) carries over between calls.
+    """
+    def __init__(self, px_to_cm, velocity_backend="farneback", idle_stride=IDLE_STRIDE, timer=None):
+        self.timer = timer or NULL_TIMER
+        self.segmenter = StreamSegmenter(timer=self.timer)
+        self.tracker = StreamTracker(px_to_cm, velocity_backend)
+        # Cheap idle frames until a stream shows up (idle_stride=1 analyses all)
+        self.sampler = AdaptiveSampler(idle_stride) if idle_stride > 1 else None
+        self.context = FrameContext()
+
+    def analyse(self, frame, fps):
+        """
+        Analyses one frame and returns its FrameContext (reused: valid until
+        the next call). context.stats are as from StreamTracker.process
+        (IDLE_STATS for skipped idle frames).
+        """
+        timer = self.timer
+        segmenter, tracker, sampler = self.segmenter, self.tracker, self.sampler
+        ctx = self.context
+
+        fgmask, x_offset = segmenter.foreground(frame)
+        mark = timer.now()
+        # One grayscale per frame, for the sampler and the tracker
+        ctx.load(frame)
+        mark = timer.lap("grayscale", mark)
+        if sampler is not None and not sampler.should_analyse(frame, fgmask, ctx.gray):
+            # Idle frame: no stream, recorded as zero flow at its exact timestamp
+            timer.lap("sampling", mark)
+            return ctx
+
+        if sampler is not None:
+            timer.lap("sampling", mark)
+            if sampler.reference is not None:
+                tracker.set_reference(sampler.reference)
+        ctx.mask = segmenter.select_stream(fgmask, x_offset, frame.shape, out=ctx.mask_buffer())
+        # The stream was chosen during selection, no second contour search
+        ctx.contour = segmenter.stream_contour
+        ctx.bbox = segmenter.stream_bbox
+        mark = timer.now()
+        ctx.stats = tracker.process(frame, ctx.mask, ctx.contour, fps, gray=ctx.gray)
+        ctx.centroid = ctx.stats['centroid']
+        timer.lap("optical_flow", mark)
+        if sampler is not None:
+            sampler.observe(ctx.contour is not None or segmenter.locked_x_center is not None)
+        return ctx
+
+    def sampling_summary(self):
+        """One-line summary of the idle sampling, or None when it is off."""
+        if self.sampler is None:
+            return None
+        return f"Analysed {self.sampler.analysed} frames, skipped {self.sampler.skipped} idle frames"
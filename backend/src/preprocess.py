@@ -1,39 +1,434 @@
+import threading
+import queue
+import subprocess
+import tempfile
 import cv2
 import numpy as np
+from .timing import NULL_TIMER
 
-def read_video_frames(video_path, max_frames=None, resize_shape=None):
+# Default number of ring-buffer slots used by the prefetching reader.
+# 0 disables prefetching and decodes on the caller's thread.
+DEFAULT_PREFETCH_DEPTH = 8
+# One slot being filled while the caller holds another
+MIN_PREFETCH_DEPTH = 2
+
+# "cv2": cv2.VideoCapture at full size, then cv2.resize
+# "ffmpeg": FFmpeg subprocess scaling during decode (see FFmpegFrameReader);
+#           falls back to "cv2" if FFmpeg cannot decode the video
+DECODERS = ("cv2", "ffmpeg")
+
+# Fraction of the container's declared frames that may be missing before
+# a video is considered truncated (frame counts of some containers are estimates)
+TRUNCATION_TOLERANCE = 0.02
+
+class TruncatedVideoError(ValueError):
+    """Raised when a video ends well before the frame count its container declares."""
+    pass
+
+def find_ffmpeg():
+    """Returns the FFmpeg executable (bundled imageio-ffmpeg if installed, else system)."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return 'ffmpeg'
+
+def is_stream_url(video_path):
+    return str(video_path).startswith(("http://", "https://"))
+
+def check_complete(video_path, frames_read, frames_expected):
+    """
+    Raises TruncatedVideoError if fewer frames were decoded than declared.
+    A declared count of 0 (unknown) is never treated as truncated.
+    """
+    if frames_expected <= 0:
+        return
+    missing = frames_expected - frames_read
+    if missing > max(2, int(frames_expected * TRUNCATION_TOLERANCE)):
+        raise TruncatedVideoError(
+            f"Video ended after {frames_read} of {frames_expected} frames: {video_path}"
+        )
+
+def open_capture(video_path, start_frame=0):
+    """Opens a cv2.VideoCapture positioned at start_frame (frame-accurate seek)."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    if start_frame and not cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame):
+        cap.release()
+        raise ValueError(f"Could not seek to frame {start_frame}: {video_path}")
+    return cap
+
+def read_video_frames(video_path, max_frames=None, resize_shape=None, prefetch_depth=0, require_complete=False,
+                      timer=None, decoder="cv2", start_frame=0):
     """
     Generator that yields video frames.
     
     Args:
-        video_path: Path to video file.
+        video_path: Path or http(s) URL of the video. URLs are decoded while
+            the bytes arrive (the server must support range requests).
         max_frames: Max frames to read.
         resize_shape: (width, height) to resize frames to.
+        prefetch_depth: If > 0, decode ahead on a background thread into a
+            ring buffer of this many frames (see PrefetchFrameReader);
+            raised to MIN_PREFETCH_DEPTH if smaller.
+        require_complete: Raise TruncatedVideoError if the video ends before
+            the frame count declared by its container.
+        timer: Optional StageTimer receiving per-frame "decode" and "resize" times.
+        decoder: One of DECODERS. "ffmpeg" only applies with a resize_shape
+            (it decodes straight to that size) and ignores prefetch_depth,
+            since FFmpeg already decodes ahead in its own process.
+        start_frame: First frame to read (seeks; not supported on URLs).
+            Frame ids stay absolute, max_frames counts from here. Always
+            decoded with OpenCV, whose seek is frame-accurate.
     
     Yields:
         (frame_id, frame_bgr)
     """
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError(f"Could not open video: {video_path}")
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder '{decoder}'. Available: {', '.join(DECODERS)}")
+    if decoder == "ffmpeg" and resize_shape and not start_frame:
+        reader = FFmpegFrameReader(video_path, resize_shape, max_frames=max_frames,
+                                   require_complete=require_complete, timer=timer)
+        if reader.start():
+            yield from reader
+            return
+        print(f"FFmpeg could not decode {video_path} ({reader.error}), using OpenCV")
     
-    frame_idx = 0
+    if prefetch_depth and prefetch_depth > 0:
+        reader = PrefetchFrameReader(video_path, resize_shape=resize_shape,
+                                     depth=max(prefetch_depth, MIN_PREFETCH_DEPTH),
+                                     max_frames=max_frames,
+                                     require_complete=require_complete, timer=timer,
+                                     start_frame=start_frame)
+        yield from reader
+        return
+    
+    cap = open_capture(video_path, start_frame)
+    frames_expected = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    timer = timer or NULL_TIMER
+    
+    frame_idx = start_frame
     while True:
+        mark = timer.now()
         ret, frame = cap.read()
         if not ret:
+            cap.release()
+            if require_complete:
+                check_complete(video_path, frame_idx, frames_expected)
             break
+        mark = timer.lap("decode", mark)
         
         if resize_shape:
             frame = cv2.resize(frame, resize_shape)
+            timer.lap("resize", mark)
             
         yield frame_idx, frame
         
         frame_idx += 1
-        if max_frames and frame_idx >= max_frames:
+        if max_frames and frame_idx - start_frame >= max_frames:
             break
             
     cap.release()
 
+class PrefetchFrameReader:
+    """
+    Decode-ahead frame source.
+    
+    A background thread decodes (and resizes) frames into a bounded ring of
+    preallocated numpy buffers while the caller runs segmentation/flow on
+    the previous ones. OpenCV releases the GIL while decoding, so the two
+    overlap.
+    
+    Frames are yielded as the ring slot itself (no per-frame copy). A slot
+    is handed back to the decoder when the next frame is requested, so the
+    caller must not keep a reference to a yielded frame past the next
+    iteration (copy it if it has to outlive the loop body).
+    
+    Backpressure: the decoder blocks once all `depth` slots are filled and
+    resumes as the caller consumes them.
+    """
+    def __init__(self, video_path, resize_shape=None, depth=DEFAULT_PREFETCH_DEPTH, max_frames=None,
+                 require_complete=False, timer=None, start_frame=0):
+        if depth < MIN_PREFETCH_DEPTH:
+            raise ValueError(f"Prefetch depth must be at least {MIN_PREFETCH_DEPTH}")
+        self.video_path = video_path
+        self.resize_shape = resize_shape
+        self.depth = depth
+        self.max_frames = max_frames
+        self.require_complete = require_complete
+        self.start_frame = start_frame
+        # Decode/resize times are recorded from the decoder thread
+        self.timer = timer or NULL_TIMER
+        
+        self.cap = open_capture(video_path, start_frame)
+        self.frames_expected = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        
+        # Ring slots are allocated lazily from the first decoded frame, since
+        # container metadata is not always reliable about the frame size.
+        self.slots = None
+        self._free = queue.Queue(maxsize=depth)
+        self._ready = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _allocate(self, first_frame):
+        if self.resize_shape:
+            w, h = self.resize_shape
+            shape = (h, w) + first_frame.shape[2:]
+        else:
+            shape = first_frame.shape
+        self.slots = [np.empty(shape, dtype=first_frame.dtype) for _ in range(self.depth)]
+        for i in range(self.depth):
+            self._free.put_nowait(i)
+
+    def _acquire_slot(self):
+        # Poll so that close() can interrupt a decoder blocked on backpressure
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _decode_loop(self):
+        scratch = None
+        frame_idx = self.start_frame
+        timer = self.timer
+        try:
+            while not self._stop.is_set():
+                if self.max_frames and frame_idx - self.start_frame >= self.max_frames:
+                    break
+                
+                if self.slots is None:
+                    mark = timer.now()
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        if self.require_complete:
+                            check_complete(self.video_path, frame_idx, self.frames_expected)
+                        break
+                    timer.lap("decode", mark)
+                    self._allocate(frame)
+                    slot = self._acquire_slot()
+                    if slot is None:
+                        break
+                    if self.resize_shape:
+                        scratch = frame
+                        with timer.stage("resize"):
+                            cv2.resize(frame, self.resize_shape, dst=self.slots[slot])
+                    else:
+                        self.slots[slot][...] = frame
+                else:
+                    slot = self._acquire_slot()
+                    if slot is None:
+                        break
+                    mark = timer.now()
+                    if self.resize_shape:
+                        # Decode into a reused full-size buffer, resize into the slot
+                        ret, scratch = self.cap.read(scratch)
+                        if ret:
+                            mark = timer.lap("decode", mark)
+                            cv2.resize(scratch, self.resize_shape, dst=self.slots[slot])
+                            timer.lap("resize", mark)
+                    else:
+                        ret, _ = self.cap.read(self.slots[slot])
+                        if ret:
+                            timer.lap("decode", mark)
+                    if not ret:
+                        self._free.put_nowait(slot)
+                        if self.require_complete:
+                            check_complete(self.video_path, frame_idx, self.frames_expected)
+                        break
+                
+                self._ready.put((frame_idx, slot))
+                frame_idx += 1
+        except Exception as e:
+            self._ready.put(e)
+            return
+        finally:
+            self.cap.release()
+        self._ready.put(None)
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._decode_loop, name="frame-prefetch", daemon=True)
+        self._thread.start()
+        
+        try:
+            while True:
+                item = self._ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                frame_idx, slot = item
+                yield frame_idx, self.slots[slot]
+                # Caller is done with this frame; hand the slot back to the decoder
+                self._free.put_nowait(slot)
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            # Unblock a decoder waiting on a full ready queue
+            while self._thread.is_alive():
+                try:
+                    self._ready.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+            self._thread = None
+
+class FFmpegFrameReader:
+    """
+    Frame source that lets FFmpeg scale while decoding.
+    
+    An FFmpeg subprocess decodes the video, scales it to resize_shape and
+    writes raw BGR frames to a pipe, which are read into a reused buffer.
+    Full-size frames never reach Python, and decoding overlaps with the
+    caller's work because it runs in another process.
+    
+    Frames are passed through unchanged (no frame rate conversion), so the
+    frame indices match the cv2 path. As with PrefetchFrameReader, a yielded
+    frame is only valid until the next one is requested.
+    
+    Scaling uses nearest-neighbour sampling. At 3x and 6x reductions (1080p
+    and 4K to 640 wide) that picks the pixels cv2.resize's INTER_LINEAR
+    samples; at other ratios the frames differ from the cv2 path, and
+    segmentation reacts to the changed per-pixel noise.
+    
+    Usage:
+        reader = FFmpegFrameReader(path, (640, 360))
+        if reader.start():
+            for frame_idx, frame in reader:
+                ...
+    """
+    def __init__(self, video_path, resize_shape, max_frames=None, require_complete=False, timer=None,
+                 ffmpeg=None):
+        self.video_path = video_path
+        self.width, self.height = resize_shape
+        self.max_frames = max_frames
+        self.require_complete = require_complete
+        self.timer = timer or NULL_TIMER
+        self.ffmpeg = ffmpeg or find_ffmpeg()
+        self.frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._view = memoryview(self.frame).cast('B')
+        self.proc = None
+        self._stderr = None
+        self._first_ready = False
+        self.error = None
+
+    def _command(self):
+        return [
+            self.ffmpeg, '-v', 'error', '-nostdin',
+            '-i', str(self.video_path),
+            '-an', '-sn', '-dn',
+            # Passthrough: one output frame per decoded frame, like cv2
+            '-vsync', 'passthrough',
+            '-vf', f'scale={self.width}:{self.height}:flags=neighbor',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-'
+        ]
+
+    def start(self):
+        """
+        Starts FFmpeg and decodes the first frame. Returns False (see
+        `error`) if FFmpeg is missing or produced no frame.
+        """
+        # stderr goes to a file: a full stderr pipe would stall FFmpeg
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self.proc = subprocess.Popen(self._command(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=self._stderr)
+        except OSError as e:
+            self.error = str(e)
+            self.close()
+            return False
+        self._grow_pipe()
+        
+        mark = self.timer.now()
+        if not self._read_frame():
+            self.error = self._close_and_collect() or "no frames decoded"
+            return False
+        self.timer.lap("decode", mark)
+        self._first_ready = True
+        return True
+
+    def _grow_pipe(self):
+        # Lets FFmpeg decode a frame ahead instead of blocking on a 64 KB pipe (Linux only)
+        try:
+            import fcntl
+            F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+            fcntl.fcntl(self.proc.stdout.fileno(), F_SETPIPE_SZ, min(self.frame.nbytes, 1024 * 1024))
+        except (ImportError, OSError):
+            pass
+
+    def _read_frame(self):
+        """Reads one frame into self.frame; False at the end of the stream."""
+        view, size, got = self._view, self.frame.nbytes, 0
+        stdout = self.proc.stdout
+        while got < size:
+            n = stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def _close_and_collect(self):
+        """Waits for FFmpeg to exit; returns its error output if it failed."""
+        error = None
+        if self.proc is not None:
+            self.proc.stdout.close()
+            returncode = self.proc.wait()
+            if returncode != 0 and self._stderr is not None:
+                self._stderr.seek(0)
+                output = self._stderr.read().decode(errors='replace').strip()
+                error = " | ".join(output.splitlines()[-3:]) or f"exit code {returncode}"
+        self.close()
+        return error
+
+    def __iter__(self):
+        if not self._first_ready:
+            raise RuntimeError("FFmpegFrameReader.start() must succeed before iterating")
+        timer = self.timer
+        frame_idx = 0
+        try:
+            yield frame_idx, self.frame
+            frame_idx += 1
+            while True:
+                if self.max_frames and frame_idx >= self.max_frames:
+                    return
+                mark = timer.now()
+                if not self._read_frame():
+                    break
+                timer.lap("decode", mark)
+                yield frame_idx, self.frame
+                frame_idx += 1
+            
+            # End of stream: a failed decode or a truncated source ends it early
+            self._close_and_collect()
+            if self.require_complete:
+                check_complete(self.video_path, frame_idx, self._frames_expected())
+        finally:
+            self.close()
+
+    def _frames_expected(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        finally:
+            cap.release()
+
+    def close(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.stdout.close()
+            self.proc.wait()
+            self.proc = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
 def extract_roi(frame, roi_rect=None):
     """
     Extracts ROI from frame.
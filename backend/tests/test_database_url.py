@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Never open the app database
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import asyncpg
+
+from database import create_async_db_engine, database_url
+
+
+class ConnectCalled(Exception):
+    pass
+
+
+def test_async_url_drops_libpq_params():
+    url = database_url("postgresql://u:p@db.example.com/app?sslmode=require&application_name=api", is_async=True)
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {}
+    # The sync driver is libpq and keeps them
+    assert database_url("postgresql://u:p@db.example.com/app?sslmode=require").query["sslmode"] == "require"
+
+
+def test_async_engine_passes_sslmode_as_ssl(monkeypatch):
+    """An async engine for a URL with sslmode=require connects with asyncpg's ssl argument."""
+    calls = []
+
+    async def fake_connect(*args, **kwargs):
+        calls.append(kwargs)
+        raise ConnectCalled()
+
+    monkeypatch.setattr(asyncpg, "connect", fake_connect)
+    engine = create_async_db_engine("postgresql://u:p@db.example.com:5432/app?sslmode=require")
+
+    async def connect():
+        try:
+            async with engine.connect():
+                pass
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(ConnectCalled):
+        asyncio.run(connect())
+    assert calls[0]["ssl"] == "require"
+    assert "sslmode" not in calls[0]
+    assert calls[0]["host"] == "db.example.com"
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Never open the app database
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth import create_access_token
+from database import Base, get_async_db
+from models import User, Doctor, Patient, Entry, Analysis, AnalysisJob, Report
+from routers.entry_router import router
+
+DOCTOR_USER_ID = 1
+
+def seed_rows(entries, patients=5):
+    """
+    One doctor, `patients` patients and `entries` entries, a third analysed,
+    a third with a job and a quarter with a report.
+    """
+    start = datetime(2025, 1, 1)
+    users = [{"id": DOCTOR_USER_ID, "username": "doctor", "password": "x", "email": "doctor@example.com"}]
+    users += [{"id": i + 2, "username": f"patient{i}", "password": "x", "email": f"patient{i}@example.com"}
+              for i in range(patients)]
+    return [
+        (User, users),
+        (Doctor, [{"id": 1, "user_id": DOCTOR_USER_ID, "hospital": "H", "specialization": "Urology",
+                   "qualification": "MD", "auto_accept": False, "metrics_only": False}]),
+        (Patient, [{"id": i + 1, "user_id": i + 2} for i in range(patients)]),
+        (Entry, [{"id": i + 1, "patient_id": i % patients + 1, "doctor_id": 1,
+                  "time": start + timedelta(hours=i), "amount_voided": 250.0}
+                 for i in range(entries)]),
+        (Analysis, [{"entry_id": i + 1} for i in range(0, entries, 3)]),
+        (AnalysisJob, [{"entry_id": i + 1, "status": "queued", "attempts": 0} for i in range(1, entries, 3)]),
+        (Report, [{"entry_id": i + 1, "title": "Review"} for i in range(0, entries, 4)]),
+    ]
+
+async def count_page_queries(entries, params, path="/entry/my-entries"):
+    """Seeds an in-memory database, GETs one /entry/my-entries page (or `path`); returns (statements, page)."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for model, rows in seed_rows(entries):
+            await conn.execute(insert(model), rows)
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def test_db():
+        async with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = test_db
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(DOCTOR_USER_ID)})}"}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(path, params=params, headers=headers)
+    finally:
+        await engine.dispose()
+    assert response.status_code == 200, response.text
+    return statements, response.json()
+
+@pytest.mark.parametrize("params", [
+    {"limit": 200},
+    {"limit": 50, "analysis_status": "completed"},
+    {"limit": 50, "patient_id": 2, "date_from": "2025-01-01T00:00:00"},
+])
+def test_page_queries_do_not_grow_with_entries(params):
+    small, small_page = asyncio.run(count_page_queries(10, params))
+    large, large_page = asyncio.run(count_page_queries(400, params))
+    
+    assert len(large_page) > len(small_page) > 0
+    assert len(large) == len(small)
+    # Authentication aside, the page is a single statement
+    assert sum("FROM entries" in statement for statement in large) == 1
+
+def test_analysis_status_comes_from_the_page_query():
+    _, page = asyncio.run(count_page_queries(9, {"limit": 200}))
+    
+    statuses = {entry["id"]: entry["analysis_status"] for entry in page}
+    assert statuses[1] == "completed" and statuses[2] == "queued" and statuses[3] == "none"
+    assert page[0]["doctor_name"] == "doctor" and page[0]["patient_name"].startswith("patient")
+
+def test_stats_count_all_entries_not_one_page():
+    statements, stats = asyncio.run(count_page_queries(30, {}, "/entry/my-entries/stats"))
+    
+    assert stats == {"total_entries": 30, "reviewed_entries": 8}
+    assert sum("FROM entries" in statement for statement in statements) == 1
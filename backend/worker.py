@@ -0,0 +1,155 @@
+"""
+Analysis worker: claims queued jobs from the analysis_jobs table and runs
+them in a pool of separate processes, keeping CV work out of the API workers.
+A thread drains the outbox (emails, upload clean-up) alongside.
+
+Usage:
+    python worker.py                  # run forever
+    python worker.py --concurrency 2  # at most 2 analyses at once
+    python worker.py --burst          # drain the queue and the outbox, then exit
+"""
+import os
+import time
+import argparse
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from job_queue import claim_next_job, execute_job, finish_job, heartbeat_jobs, requeue_stale_jobs, JOB_FAILED
+from outbox import drain_outbox, requeue_stale_messages
+
+load_dotenv()
+
+# Each analysis may itself use one process per view, so by default leave
+# room for that on the machine
+WORKER_CONCURRENCY = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", str(max(1, (os.cpu_count() or 1) // 2))))
+WORKER_POLL_INTERVAL_S = float(os.getenv("ANALYSIS_WORKER_POLL_INTERVAL", "1.0"))
+# Running jobs whose heartbeat is older than this were orphaned by a dead worker
+JOB_STALE_AFTER_S = float(os.getenv("ANALYSIS_JOB_STALE_AFTER", "120"))
+# How often the dispatcher renews its jobs' heartbeat and looks for orphaned jobs
+JOB_HEARTBEAT_INTERVAL_S = float(os.getenv("ANALYSIS_JOB_HEARTBEAT_INTERVAL", "15"))
+# Runs of a job whose worker keeps dying (e.g. killed for memory) before it fails
+JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+OUTBOX_POLL_INTERVAL_S = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+
+
+def run_outbox(stop: threading.Event, poll_interval: float = OUTBOX_POLL_INTERVAL_S):
+    """Outbox loop: requeues stale messages and sends the due ones every poll_interval until stop is set."""
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            try:
+                # Every poll, so a crashed worker's messages are not left until a restart
+                requeued = requeue_stale_messages(db)
+                if requeued:
+                    print(f"[OUTBOX] Requeued {requeued} stale message(s)")
+                drain_outbox(db)
+            except Exception as e:
+                # e.g. database unavailable: try again on the next poll
+                db.rollback()
+                print(f"[OUTBOX] Drain failed: {e}")
+            stop.wait(poll_interval)
+    finally:
+        db.close()
+
+
+def run_worker(concurrency: int = WORKER_CONCURRENCY, poll_interval: float = WORKER_POLL_INTERVAL_S,
+               burst: bool = False):
+    """
+    Dispatch loop. Claims jobs while fewer than `concurrency` are running and
+    hands each to the process pool. Every JOB_HEARTBEAT_INTERVAL_S it renews
+    the heartbeat of its running jobs and requeues those of dead workers.
+
+    Args:
+        concurrency: Maximum number of analyses running at once.
+        poll_interval: Seconds to wait when the queue is empty.
+        burst: Exit once the queue is empty and all jobs have finished.
+    """
+    db = SessionLocal()
+    stop_outbox = threading.Event()
+    outbox_thread = threading.Thread(target=run_outbox, args=(stop_outbox,), name="outbox", daemon=True)
+    outbox_thread.start()
+    try:
+        print(f"[WORKER] Started with concurrency {concurrency}")
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=ctx)
+        running = {}
+        next_heartbeat = 0.0
+        try:
+            while True:
+                try:
+                    if time.monotonic() >= next_heartbeat:
+                        # Our jobs first, so they are never taken for orphans
+                        heartbeat_jobs(db, list(running.values()))
+                        requeued, failed = requeue_stale_jobs(db, JOB_STALE_AFTER_S, JOB_MAX_ATTEMPTS)
+                        if requeued or failed:
+                            print(f"[WORKER] Stale jobs: {requeued} requeued, {failed} failed")
+                        next_heartbeat = time.monotonic() + JOB_HEARTBEAT_INTERVAL_S
+
+                    # A job leaves `running` only once its outcome is stored, so
+                    # a failed finish_job is retried on the next iteration
+                    broken = False
+                    for future in [f for f in running if f.done()]:
+                        job_id = running[future]
+                        try:
+                            print(f"[WORKER] Job {job_id} {future.result()}")
+                        except Exception as e:
+                            # The pool process itself died; the job never recorded an outcome
+                            print(f"[WORKER] Job {job_id} crashed: {e}")
+                            finish_job(db, job_id, JOB_FAILED, f"Worker crashed: {e}")
+                            broken = broken or isinstance(e, BrokenProcessPool)
+                        del running[future]
+
+                    if broken:
+                        # A dead process poisons the whole executor; start a fresh one
+                        for future, job_id in list(running.items()):
+                            finish_job(db, job_id, JOB_FAILED, "Worker crashed")
+                            del running[future]
+                        pool.shutdown(wait=False)
+                        pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=ctx)
+
+                    claimed = False
+                    while len(running) < concurrency:
+                        job_id = claim_next_job(db)
+                        if job_id is None:
+                            break
+                        running[pool.submit(execute_job, job_id)] = job_id
+                        claimed = True
+                except Exception as e:
+                    # e.g. database unavailable: try again after the poll interval
+                    db.rollback()
+                    print(f"[WORKER] Dispatch failed: {e}")
+                    time.sleep(poll_interval)
+                    continue
+
+                if burst and not running and not claimed:
+                    break
+                if not claimed:
+                    time.sleep(poll_interval)
+        finally:
+            pool.shutdown(wait=True)
+    finally:
+        stop_outbox.set()
+        outbox_thread.join()
+        if burst:
+            # Whatever became due while the outbox thread was stopping
+            drain_outbox(db)
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis job worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Analyses run at once")
+    parser.add_argument("--poll-interval", type=float, default=WORKER_POLL_INTERVAL_S, help="Idle poll interval (s)")
+    parser.add_argument("--burst", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    run_worker(args.concurrency, args.poll_interval, args.burst)
+
+
+if __name__ == "__main__":
+    main()
@@ -410,9 +410,14 @@
 import { useState, useEffect } from 'react';
 import { entryAPI, reportAPI, doctorAPI, analysisAPI } from '../../services/api';
 
+const ANALYSIS_POLL_MS = 2000;
+
 const DoctorDashboard = () => {
   const [profile, setProfile] = useState(null);
   const [entries, setEntries] = useState([]);
+  const [entriesCursor, setEntriesCursor] = useState(null);
+  const [entriesStats, setEntriesStats] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedEntry, setSelectedEntry] = useState(null);
   const [reports, setReports] = useState([]);
   const [analysis, setAnalysis] = useState(null);
@@ -437,12 +442,15 @@ const DoctorDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [profileRes, entriesRes] = await Promise.all([
+      const [profileRes, entriesRes, statsRes] = await Promise.all([
         doctorAPI.getProfile(),
-        entryAPI.getMyEntries()
+        entryAPI.getMyEntries(),
+        entryAPI.getMyEntriesStats()
       ]);
       setProfile(profileRes.data);
       setEntries(entriesRes.data);
+      setEntriesCursor(entriesRes.headers['x-next-cursor'] || null);
+      setEntriesStats(statsRes.data);
     } catch {
       setError('Failed to load data');
     } finally {
@@ -450,6 +458,19 @@ const DoctorDashboard = () => {
     }
   };
 
+  const loadMoreEntries = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await entryAPI.getMyEntries({ cursor: entriesCursor });
+      setEntries((prev) => [...prev, ...response.data]);
+      setEntriesCursor(response.headers['x-next-cursor'] || null);
+    } catch {
+      setError('Failed to load more entries');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSelectEntry = async (entry) => {
     setSelectedEntry(entry);
     setAnalysis(null);
@@ -486,7 +507,17 @@ const DoctorDashboard = () => {
     setError('');
     
     try {
-      const response = await analysisAPI.runAnalysis(selectedEntry.id);
+      let { data: job } = await analysisAPI.enqueue(selectedEntry.id);
+      // The worker runs the analysis; wait for the job to settle
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, ANALYSIS_POLL_MS));
+        ({ data: job } = await analysisAPI.getJob(job.id));
+      }
+      if (job.status === 'failed') {
+        setError(job.error || 'Analysis failed');
+        return;
+      }
+      const response = await analysisAPI.getForEntry(job.entry_id);
       setAnalysis(response.data);
       setSuccess('Analysis completed successfully!');
       setTimeout(() => setSuccess(''), 3000);
@@ -725,7 +756,7 @@ const DoctorDashboard = () => {
               <div className="p-6 border-b border-gray-100">
                 <div className="flex justify-between items-center">
                   <h2 className="text-xl font-bold text-gray-900">
-                    Patient Entries <span className="text-gray-500">({entries.length})</span>
+                    Patient Entries <span className="text-gray-500">({entriesStats?.total_entries ?? entries.length})</span>
                   </h2>
                   <div className="text-sm text-gray-500">
                     Select an entry to view details
@@ -773,6 +804,15 @@ const DoctorDashboard = () => {
                         )}
                       </div>
                     ))}
+                    {entriesCursor && (
+                      <button
+                        onClick={loadMoreEntries}
+                        disabled={loadingMore}
+                        className="w-full py-2 text-sm font-medium text-gray-600 border border-gray-200 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </button>
+                    )}
                   </div>
                 )}
               </div>
@@ -5,6 +5,9 @@ import { patientAPI, entryAPI, reportAPI, chatAPI } from '../../services/api';
 const PatientDashboard = () => {
   const [profile, setProfile] = useState(null);
   const [entries, setEntries] = useState([]);
+  const [entriesCursor, setEntriesCursor] = useState(null);
+  const [entriesStats, setEntriesStats] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedEntry, setSelectedEntry] = useState(null);
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -24,12 +27,15 @@ const PatientDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [profileRes, entriesRes] = await Promise.all([
+      const [profileRes, entriesRes, statsRes] = await Promise.all([
         patientAPI.getProfile(),
-        entryAPI.getMyEntries()
+        entryAPI.getMyEntries(),
+        entryAPI.getMyEntriesStats()
       ]);
       setProfile(profileRes.data);
       setEntries(entriesRes.data);
+      setEntriesCursor(entriesRes.headers['x-next-cursor'] || null);
+      setEntriesStats(statsRes.data);
     } catch {
       setError('Failed to load data');
     } finally {
@@ -37,6 +43,19 @@ const PatientDashboard = () => {
     }
   };
 
+  const loadMoreEntries = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await entryAPI.getMyEntries({ cursor: entriesCursor });
+      setEntries((prev) => [...prev, ...response.data]);
+      setEntriesCursor(response.headers['x-next-cursor'] || null);
+    } catch {
+      setError('Failed to load more entries');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSelectEntry = async (entry) => {
     setSelectedEntry(entry);
     try {
@@ -250,12 +269,12 @@ const PatientDashboard = () => {
               <div className="p-6">
                 <div className="grid grid-cols-2 gap-4">
                   <div className="text-center p-4 bg-gray-50 rounded-xl">
-                    <div className="text-2xl font-bold text-gray-900 mb-1">{entries.length}</div>
+                    <div className="text-2xl font-bold text-gray-900 mb-1">{entriesStats?.total_entries ?? entries.length}</div>
                     <div className="text-sm text-gray-600">Total Entries</div>
                   </div>
                   <div className="text-center p-4 bg-gray-50 rounded-xl">
                     <div className="text-2xl font-bold text-gray-900 mb-1">
-                      {entries.filter(e => reports.some(r => r.entry_id === e.id)).length}
+                      {entriesStats?.reviewed_entries ?? 'N/A'}
                     </div>
                     <div className="text-sm text-gray-600">Reviewed</div>
                   </div>
@@ -271,7 +290,7 @@ const PatientDashboard = () => {
               <div className="p-6 border-b border-gray-100">
                 <div className="flex justify-between items-center">
                   <h2 className="text-xl font-bold text-gray-900">
-                    My Entries <span className="text-gray-500">({entries.length})</span>
+                    My Entries <span className="text-gray-500">({entriesStats?.total_entries ?? entries.length})</span>
                   </h2>
                   <div className="text-sm text-gray-500">
                     Select an entry to view details
@@ -325,6 +344,15 @@ const PatientDashboard = () => {
                         )}
                       </div>
                     ))}
+                    {entriesCursor && (
+                      <button
+                        onClick={loadMoreEntries}
+                        disabled={loadingMore}
+                        className="w-full py-2 text-sm font-medium text-gray-600 border border-gray-200 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </button>
+                    )}
                   </div>
                 )}
               </div>
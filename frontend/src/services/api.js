@@ -55,7 +55,10 @@ export const entryAPI = {
     }
     return api.post('/entry/', data);
   },
-  getMyEntries: () => api.get('/entry/my-entries'),
+  // One page, newest first; pass the previous page's x-next-cursor header as cursor
+  getMyEntries: (params = {}) => api.get('/entry/my-entries', { params }),
+  // Totals over all entries, not just the loaded pages
+  getMyEntriesStats: () => api.get('/entry/my-entries/stats'),
   getEntry: (id) => api.get(`/entry/${id}`),
 };
 
@@ -73,6 +76,9 @@ export const analysisAPI = {
   getForEntry: (entryId) => api.get(`/analysis/entry/${entryId}`),
   delete: (entryId) => api.delete(`/analysis/entry/${entryId}`),
   runAnalysis: (entryId) => api.post(`/analysis/run/${entryId}`),
+  // Queues the analysis (run by the worker) and returns the job
+  enqueue: (entryId) => api.post(`/analysis/jobs/${entryId}`),
+  getJob: (jobId) => api.get(`/analysis/jobs/${jobId}`),
 };
 
 // Chat API
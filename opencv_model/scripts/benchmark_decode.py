@@ -0,0 +1,89 @@
+import sys
+import os
+import argparse
+import time
+import tempfile
+import contextlib
+import io
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.generate_test_video import generate_video
+from scripts.run_analysis import process_single_video
+from src.preprocess import read_video_frames, DECODERS
+
+# Analysis width of the pipelines
+TARGET_WIDTH = 640
+
+def time_decode(video_path, resize_shape, decoder, prefetch_depth):
+    """Decodes the whole video at resize_shape and returns (frames, seconds)."""
+    start = time.perf_counter()
+    frames = 0
+    for _ in read_video_frames(video_path, resize_shape=resize_shape, prefetch_depth=prefetch_depth,
+                               decoder=decoder):
+        frames += 1
+    return frames, time.perf_counter() - start
+
+def time_pipeline(video_path, calibration_path, output_dir, decoder):
+    """Runs process_single_video once and returns (frames, seconds, Qmax)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_single_video(video_path, calibration_path, output_dir, "top",
+                                      render_video=False, decoder=decoder)
+    elapsed = time.perf_counter() - start
+    frames = len(result['df']) if result and result['df'] is not None else 0
+    return frames, elapsed, result['metrics'].get('Qmax', 0.0) if result else 0.0
+
+def best_of(repeats, fn, *args):
+    runs = [fn(*args) for _ in range(repeats)]
+    return min(runs, key=lambda r: r[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode-then-resize (cv2) vs scale-during-decode (FFmpeg)")
+    parser.add_argument("--video", help="Video to benchmark (default: generate synthetic ones)")
+    parser.add_argument("--sizes", default="1920x1080,3840x2160", help="Synthetic video sizes, comma separated")
+    parser.add_argument("--duration", type=int, default=5, help="Synthetic video duration (s)")
+    parser.add_argument("--calibration-image", default="data/top.png", help="Path to calibration image")
+    parser.add_argument("--prefetch-depth", type=int, default=8, help="Prefetch depth of the cv2 path")
+    parser.add_argument("--pipeline", action="store_true", help="Also time the full pipeline (metrics only)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_decode_") as work_dir:
+        videos = []
+        if args.video:
+            import cv2
+            cap = cv2.VideoCapture(args.video)
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            cap.release()
+            videos.append((args.video, size))
+        else:
+            for spec in args.sizes.split(","):
+                w, h = (int(v) for v in spec.lower().split("x"))
+                path = os.path.join(work_dir, f"synthetic_{w}x{h}.mp4")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_video(path, duration=args.duration, width=w, height=h, seed=1)
+                videos.append((path, (w, h)))
+
+        for path, (w, h) in videos:
+            resize_shape = (TARGET_WIDTH, int(h / (w / TARGET_WIDTH)))
+            print(f"\n{w}x{h} -> {resize_shape[0]}x{resize_shape[1]}")
+            decode_fps = {}
+            for decoder in DECODERS:
+                frames, elapsed = best_of(args.repeats, time_decode, path, resize_shape, decoder,
+                                          args.prefetch_depth)
+                decode_fps[decoder] = frames / elapsed
+                print(f"{'decode ' + decoder:>18}: {frames} frames in {elapsed:.2f}s -> {decode_fps[decoder]:.1f} fps")
+            print(f"{'speedup':>18}: {decode_fps['ffmpeg'] / decode_fps['cv2']:.2f}x")
+
+            if args.pipeline:
+                qmax = {}
+                for decoder in DECODERS:
+                    frames, elapsed, qmax[decoder] = best_of(args.repeats, time_pipeline, path,
+                                                             args.calibration_image, work_dir, decoder)
+                    print(f"{'pipeline ' + decoder:>18}: {frames} frames in {elapsed:.2f}s -> "
+                          f"{frames / elapsed:.1f} fps, Qmax {qmax[decoder]:.3f} ml/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import sys
+import os
+import argparse
+import time
+import tempfile
+import contextlib
+import io
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.generate_test_video import generate_video
+from scripts.run_analysis import process_single_video
+from src.preprocess import DEFAULT_PREFETCH_DEPTH
+
+def time_pipeline(video_path, calibration_path, output_dir, prefetch_depth):
+    """
+    Runs process_single_video once and returns (frames, seconds).
+    Pipeline logging is swallowed so it does not skew the timing.
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_single_video(video_path, calibration_path, output_dir, "top",
+                                      prefetch_depth=prefetch_depth)
+    elapsed = time.perf_counter() - start
+    frames = len(result['df']) if result and result['df'] is not None else 0
+    return frames, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end fps with and without decode-ahead prefetching")
+    parser.add_argument("--video", help="Video to benchmark (default: generate a synthetic one)")
+    parser.add_argument("--width", type=int, default=1280, help="Synthetic video width")
+    parser.add_argument("--height", type=int, default=720, help="Synthetic video height")
+    parser.add_argument("--duration", type=int, default=10, help="Synthetic video duration (s)")
+    parser.add_argument("--calibration-image", default="data/top.png", help="Path to calibration image")
+    parser.add_argument("--depth", type=int, default=DEFAULT_PREFETCH_DEPTH, help="Prefetch depth to compare against")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_prefetch_") as work_dir:
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(work_dir, "synthetic.mp4")
+            generate_video(video_path, duration=args.duration, width=args.width, height=args.height)
+
+        results = {}
+        for depth in (0, args.depth):
+            best = None
+            for _ in range(args.repeats):
+                frames, elapsed = time_pipeline(video_path, args.calibration_image, work_dir, depth)
+                if best is None or elapsed < best[1]:
+                    best = (frames, elapsed)
+            results[depth] = best
+            label = "inline decode" if depth == 0 else f"prefetch depth={depth}"
+            print(f"{label:>22}: {best[0]} frames in {best[1]:.2f}s -> {best[0] / best[1]:.1f} fps")
+
+        base_fps = results[0][0] / results[0][1]
+        pref_fps = results[args.depth][0] / results[args.depth][1]
+        print(f"Speedup: {pref_fps / base_fps:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import sys
+import os
+import argparse
+import time
+import tempfile
+import contextlib
+import io
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.generate_test_video import generate_video
+from scripts.run_analysis import process_single_video
+
+# Metrics compared against the sequential run: relative for rates / volume,
+# absolute seconds for times
+RELATIVE_METRICS = ("Qmax", "Voided_Volume", "Average_Flow_Rate")
+TIME_METRICS = ("Time_to_Qmax", "Flow_Time", "Voiding_Time", "Hesitancy")
+
+def run(video_path, calibration_path, output_dir, **kwargs):
+    """Runs process_single_video (metrics only) and returns (result, seconds)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_single_video(video_path, calibration_path, output_dir, "top",
+                                      render_video=False, **kwargs)
+    return result, time.perf_counter() - start
+
+def accuracy(metrics, reference, rel_tolerance, time_tolerance_s):
+    """
+    Returns ({metric: deviation}, failed metric names). Deviations are
+    relative for RELATIVE_METRICS and in seconds for TIME_METRICS.
+    """
+    deviations, failed = {}, []
+    for key in RELATIVE_METRICS:
+        ref = reference.get(key, 0.0)
+        deviations[key] = (metrics.get(key, 0.0) - ref) / ref if ref else metrics.get(key, 0.0)
+        if abs(deviations[key]) > rel_tolerance:
+            failed.append(key)
+    for key in TIME_METRICS:
+        deviations[key] = metrics.get(key, 0.0) - reference.get(key, 0.0)
+        if abs(deviations[key]) > time_tolerance_s:
+            failed.append(key)
+    return deviations, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-sharded vs sequential analysis: speed and accuracy")
+    parser.add_argument("--video", help="Video to benchmark (default: a synthetic thin stream)")
+    parser.add_argument("--duration", type=int, default=60, help="Synthetic stream duration (s)")
+    parser.add_argument("--calibration-image", default="data/top.png", help="Path to calibration image")
+    parser.add_argument("--shards", default="2,4", help="Shard counts, comma separated")
+    parser.add_argument("--warmups", default="150,500", help="Warm-up lengths (frames), comma separated")
+    parser.add_argument("--rel-tolerance", type=float, default=0.05,
+                        help="Allowed relative deviation of Qmax, volume and average flow")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="Allowed deviation of time metrics (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_shards_") as work_dir:
+        video = args.video
+        if not video:
+            video = os.path.join(work_dir, "synthetic_stream.mp4")
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_video(video, duration=args.duration, seed=1, lead_in=5, tail=5, style="stream")
+
+        reference, seq_s = run(video, args.calibration_image, work_dir)
+        frames = len(reference['df'])
+        print(f"{'sequential':>18}: {frames} frames in {seq_s:.1f}s, Qmax {reference['metrics']['Qmax']:.2f} ml/s, "
+              f"volume {reference['metrics']['Voided_Volume']:.1f} ml")
+
+        failures = []
+        for shards in (int(s) for s in args.shards.split(",")):
+            for warmup in (int(w) for w in args.warmups.split(",")):
+                label = f"{shards} shards / {warmup}"
+                result, elapsed = run(video, args.calibration_image, work_dir, shards=shards,
+                                      shard_warmup_frames=warmup)
+                if len(result['df']) != frames:
+                    failures.append(f"{label}: {len(result['df'])} rows, expected {frames}")
+                deviations, failed = accuracy(result['metrics'], reference['metrics'],
+                                              args.rel_tolerance, args.time_tolerance)
+                worst = ", ".join(f"{k} {100 * deviations[k]:+.1f}%" for k in RELATIVE_METRICS)
+                flag = f"  OUT OF TOLERANCE: {', '.join(failed)}" if failed else ""
+                print(f"{label:>18}: {elapsed:.1f}s ({seq_s / elapsed:.2f}x), "
+                      f"{worst}, Time_to_Qmax {deviations['Time_to_Qmax']:+.2f}s{flag}")
+                if failed:
+                    failures.append(f"{label}: {', '.join(failed)}")
+
+    if failures:
+        print("\nSharded results deviate from the sequential run:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import sys
+import os
+import argparse
+import time
+import json
+import platform
+import contextlib
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from scripts.generate_test_video import generate_video
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# Matrices selectable with --preset (individual axes can be overridden)
+PRESETS = {
+    "quick": {"resolutions": ["480p", "720p"], "durations": [10], "views": [1]},
+    "standard": {"resolutions": ["480p", "720p", "1080p"], "durations": [10, 60], "views": [1, 2]},
+    "full": {"resolutions": ["480p", "720p", "1080p", "4k"], "durations": [10, 60, 600], "views": [1, 2]},
+}
+
+# Seeds of the synthetic top / side videos
+VIEW_SEEDS = {"top": 1, "side": 2}
+
+DEFAULT_THRESHOLD = 0.15
+
+def case_id(resolution, duration, views):
+    return f"{resolution}_{duration}s_{views}view"
+
+def synthetic_video(video_dir, resolution, duration, view):
+    """Generates (once) and returns the path of a reproducible synthetic video."""
+    w, h = RESOLUTIONS[resolution]
+    path = os.path.join(video_dir, f"synthetic_{resolution}_{duration}s_{view}.mp4")
+    if not os.path.exists(path):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_video(path, duration=duration, width=w, height=h, seed=VIEW_SEEDS[view])
+    return path
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def run_case(video_paths, calibration_path, output_dir, velocity_backend):
+    """
+    Runs process_single_video per view plus EnsembleAggregator.
+    Executed in a fresh process per case so peak RSS is per case.
+    """
+    from scripts.run_analysis import process_single_video
+    from src.ensemble import EnsembleAggregator
+
+    results = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for view, path in video_paths.items():
+            results[view] = process_single_video(path, calibration_path, output_dir, view,
+                                                 velocity_backend=velocity_backend)
+        ensemble_start = time.perf_counter()
+        _, metrics = EnsembleAggregator().process(results.get("top"), results.get("side"), None)
+        ensemble_s = time.perf_counter() - ensemble_start
+    wall_s = time.perf_counter() - start
+
+    frames = sum(len(r['df']) for r in results.values() if r and r['df'] is not None)
+    return {
+        'frames': frames,
+        'wall_s': wall_s,
+        'fps': frames / wall_s if wall_s > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'ensemble_s': ensemble_s,
+        'stages': {view: r['timings'] for view, r in results.items() if r},
+        'Qmax': float(metrics.get('Qmax', 0.0)),
+    }
+
+def run_isolated(*args):
+    # spawn: a clean interpreter per case, nothing inherited that inflates RSS
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_case, *args).result()
+
+def compare(results, baseline, threshold):
+    """
+    Prints fps against the baseline and returns the ids of cases whose
+    throughput dropped by more than `threshold` (fraction).
+    """
+    regressions = []
+    print(f"\n{'case':<24}{'fps':>9}{'baseline':>10}{'change':>9}{'rss MB':>9}")
+    for cid, r in results.items():
+        base = baseline.get(cid)
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else "-"
+        if base is None:
+            print(f"{cid:<24}{r['fps']:>9.1f}{'-':>10}{'-':>9}{rss:>9}")
+            continue
+        change = r['fps'] / base['fps'] - 1.0 if base['fps'] else 0.0
+        flag = "  REGRESSION" if change < -threshold else ""
+        print(f"{cid:<24}{r['fps']:>9.1f}{base['fps']:>10.1f}{100 * change:>+8.1f}%{rss:>9}{flag}")
+        if flag:
+            regressions.append(cid)
+    return regressions
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline throughput benchmark over synthetic videos")
+    parser.add_argument("--preset", default="quick", choices=list(PRESETS), help="Benchmark matrix")
+    parser.add_argument("--resolutions", help=f"Override, comma separated ({','.join(RESOLUTIONS)})")
+    parser.add_argument("--durations", help="Override, comma separated seconds")
+    parser.add_argument("--views", help="Override, comma separated view counts (1 = top, 2 = top+side)")
+    parser.add_argument("--video-dir", default="data/benchmark_videos", help="Where synthetic videos are cached")
+    parser.add_argument("--calibration-image", default="data/top.png", help="Path to calibration image")
+    parser.add_argument("--velocity-backend", default="farneback", help="Optical flow backend")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per case (fastest is kept)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new --baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed fps drop vs baseline before failing (fraction)")
+    args = parser.parse_args()
+
+    matrix = dict(PRESETS[args.preset])
+    if args.resolutions:
+        matrix["resolutions"] = [r.strip().lower() for r in args.resolutions.split(",")]
+    if args.durations:
+        matrix["durations"] = [int(d) for d in args.durations.split(",")]
+    if args.views:
+        matrix["views"] = [int(v) for v in args.views.split(",")]
+    unknown = [r for r in matrix["resolutions"] if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"Unknown resolution(s): {', '.join(unknown)}")
+
+    os.makedirs(args.video_dir, exist_ok=True)
+    output_dir = os.path.join(args.video_dir, "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    for resolution in matrix["resolutions"]:
+        for duration in matrix["durations"]:
+            for n_views in matrix["views"]:
+                cid = case_id(resolution, duration, n_views)
+                views = ["top", "side"][:n_views]
+                paths = {v: synthetic_video(args.video_dir, resolution, duration, v) for v in views}
+
+                best = None
+                for _ in range(args.repeats):
+                    r = run_isolated(paths, args.calibration_image, output_dir, args.velocity_backend)
+                    if best is None or r['fps'] > best['fps']:
+                        best = r
+                best.update({'resolution': resolution, 'duration_s': duration, 'views': n_views})
+                results[cid] = best
+                print(f"{cid:<24} {best['frames']} frames in {best['wall_s']:.1f}s -> {best['fps']:.1f} fps")
+
+    report = {'environment': environment_info(), 'velocity_backend': args.velocity_backend, 'cases': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('cpu_count') != os.cpu_count():
+            print("Warning: baseline was recorded on a machine with a different CPU count")
+        regressions = compare(results, baseline.get('cases', {}), args.threshold)
+    elif args.save_baseline:
+        if not args.baseline:
+            parser.error("--save-baseline needs --baseline PATH")
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"\nThroughput regressed more than {100 * args.threshold:.0f}% in: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
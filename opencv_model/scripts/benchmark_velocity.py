@@ -0,0 +1,108 @@
+import sys
+import os
+import argparse
+import time
+import tempfile
+import contextlib
+import io
+import json
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.generate_test_video import generate_video
+from scripts.run_analysis import process_single_video
+from src.tracking import VELOCITY_BACKENDS, VelocityEstimator, create_velocity_estimator
+from src.ensemble import EnsembleAggregator
+
+REFERENCE_BACKEND = "farneback"
+
+class TimedVelocity(VelocityEstimator):
+    """Wraps a backend and accumulates the time spent in estimate()."""
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+        self.calls = 0
+        self.seconds = 0.0
+
+    def estimate(self, prev_gray, curr_gray, mask, px_to_cm, fps):
+        start = time.perf_counter()
+        vel = self.inner.estimate(prev_gray, curr_gray, mask, px_to_cm, fps)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        return vel
+
+def run_backend(video_path, calibration_path, output_dir, backend):
+    """
+    Runs the single-view pipeline plus ensemble with one velocity backend.
+    Returns a dict of timings and clinical metrics.
+    """
+    timed = TimedVelocity(create_velocity_estimator(backend))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_single_video(video_path, calibration_path, output_dir, "top", velocity_backend=timed)
+        _, metrics = EnsembleAggregator().process(result, None, None)
+    elapsed = time.perf_counter() - start
+
+    frames = len(result['df'])
+    return {
+        'backend': backend,
+        'frames': frames,
+        'ms_per_frame': 1000.0 * elapsed / frames,
+        'velocity_ms_per_call': 1000.0 * timed.seconds / timed.calls if timed.calls else 0.0,
+        'Qmax': float(metrics.get('Qmax', 0.0)),
+        'Voided_Volume': float(metrics.get('Voided_Volume', 0.0)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed/accuracy comparison of velocity backends")
+    parser.add_argument("--video", action="append", help="Video(s) to benchmark (default: generate synthetic ones)")
+    parser.add_argument("--sizes", default="640x480,1280x720", help="Synthetic video sizes, comma separated WxH")
+    parser.add_argument("--duration", type=int, default=10, help="Synthetic video duration (s)")
+    parser.add_argument("--calibration-image", default="data/top.png", help="Path to calibration image")
+    parser.add_argument("--backends", default=",".join(VELOCITY_BACKENDS), help="Backends to compare")
+    parser.add_argument("--qmax-tolerance", type=float, default=4.0, help="Acceptable |dQmax| vs reference (ml/s)")
+    parser.add_argument("--volume-tolerance", type=float, default=10.0, help="Acceptable |dVoided_Volume| vs reference (%%)")
+    parser.add_argument("--json", help="Optional path to write the raw results")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if REFERENCE_BACKEND not in backends:
+        backends.insert(0, REFERENCE_BACKEND)
+
+    all_results = []
+    with tempfile.TemporaryDirectory(prefix="bench_velocity_") as work_dir:
+        videos = args.video or []
+        if not videos:
+            for size in args.sizes.split(","):
+                w, h = (int(v) for v in size.lower().split("x"))
+                path = os.path.join(work_dir, f"synthetic_{w}x{h}.mp4")
+                generate_video(path, duration=args.duration, width=w, height=h)
+                videos.append(path)
+
+        for video_path in videos:
+            print(f"\n=== {os.path.basename(video_path)} ===")
+            rows = [run_backend(video_path, args.calibration_image, work_dir, b) for b in backends]
+            ref = next(r for r in rows if r['backend'] == REFERENCE_BACKEND)
+
+            print(f"{'backend':<14}{'ms/frame':>10}{'vel ms':>9}{'Qmax':>9}{'dQmax':>9}{'Volume':>10}{'dVol%':>8}  ok")
+            for r in rows:
+                r['video'] = video_path
+                r['dQmax'] = r['Qmax'] - ref['Qmax']
+                r['dVolume_pct'] = 100.0 * (r['Voided_Volume'] - ref['Voided_Volume']) / ref['Voided_Volume'] if ref['Voided_Volume'] else 0.0
+                r['acceptable'] = abs(r['dQmax']) <= args.qmax_tolerance and abs(r['dVolume_pct']) <= args.volume_tolerance
+                print(f"{r['backend']:<14}{r['ms_per_frame']:>10.1f}{r['velocity_ms_per_call']:>9.2f}"
+                      f"{r['Qmax']:>9.2f}{r['dQmax']:>+9.2f}{r['Voided_Volume']:>10.1f}{r['dVolume_pct']:>+8.1f}  "
+                      f"{'yes' if r['acceptable'] else 'no'}")
+
+            acceptable = [r for r in rows if r['acceptable']]
+            fastest = min(acceptable, key=lambda r: r['ms_per_frame'])
+            print(f"Fastest acceptable backend: {fastest['backend']}")
+            all_results.extend(rows)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -3,26 +3,62 @@ import numpy as np
 import argparse
 import os
 
-def generate_video(output_path, duration=5, fps=30, width=640, height=480):
+STYLES = ("disc", "stream")
+
+def generate_video(output_path, duration=5, fps=30, width=640, height=480, seed=None, lead_in=0, tail=0,
+                   style="disc"):
+    """
+    duration: seconds with a stream; lead_in / tail: seconds of background
+    only before and after it (hesitancy and trailing footage).
+    style: "disc" (a textured circle that grows and shrinks) or "stream"
+    (a thin swaying vertical stream whose width follows the flow curve,
+    which the segmenter tracks the way it tracks a real one).
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style '{style}'. Available: {', '.join(STYLES)}")
     print(f"Generating synthetic video at {output_path}...")
+    # Fixed seed -> identical video (used by the benchmark suite)
+    if seed is not None:
+        np.random.seed(seed)
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
     
     total_frames = duration * fps
     center = (width // 2, height // 2)
     
-    for i in range(total_frames):
+    lead_frames = int(lead_in * fps)
+    tail_frames = int(tail * fps)
+    
+    # "stream" style: sizes relative to a 640 px wide frame
+    unit = width / 640.0
+    stream_texture = np.random.randint(150, 255, (height, int(16 * unit) + 1, 3), dtype=np.uint8)
+    
+    for n in range(lead_frames + total_frames + tail_frames):
         frame = np.zeros((height, width, 3), dtype=np.uint8)
         
         # Background noise (slight)
         noise = np.random.randint(0, 10, (height, width, 3), dtype=np.uint8)
         frame = cv2.add(frame, noise)
         
+        i = n - lead_frames
+        if not 0 <= i < total_frames:
+            out.write(frame)
+            continue
+        
         # Simulate stream: A circle in the center that grows and shrinks
         # Flow curve: Parabolic (starts 0, peaks, ends 0)
         norm_time = i / total_frames
         flow_intensity = 4 * norm_time * (1 - norm_time) # 0 -> 1 -> 0
         
+        if style == "stream":
+            # Texture falls 5 px/frame, so optical flow sees a steady velocity
+            stream_w = int(unit * (3 + 6 * flow_intensity))
+            x0 = center[0] + int(unit * 10 * np.sin(i / 40.0))
+            y0, y1 = center[1] - height // 8, center[1] + height // 8
+            frame[y0:y1, x0:x0 + stream_w] = np.roll(stream_texture, i * 5, axis=0)[y0:y1, :stream_w]
+            out.write(frame)
+            continue
+        
         radius = int(20 + 50 * flow_intensity) # Radius varies 20 to 70 px
         
         if radius > 0:
@@ -94,7 +130,10 @@ def generate_video(output_path, duration=5, fps=30, width=640, height=480):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--output", required=True)
+    parser.add_argument("--lead-in", type=float, default=0, help="Seconds without stream before it starts")
+    parser.add_argument("--tail", type=float, default=0, help="Seconds without stream after it ends")
+    parser.add_argument("--style", default="disc", choices=STYLES, help="Synthetic stream shape")
     args = parser.parse_args()
     
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
-    generate_video(args.output)
+    generate_video(args.output, lead_in=args.lead_in, tail=args.tail, style=args.style)
@@ -10,28 +10,48 @@ import numpy as np
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.calibration import compute_pixel_to_cm_scale
-from src.preprocess import read_video_frames
-from src.segmentation import StreamSegmenter
-from src.tracking import StreamTracker
+from src.preprocess import read_video_frames, DECODERS, DEFAULT_PREFETCH_DEPTH, MIN_PREFETCH_DEPTH
+from src.tracking import VELOCITY_BACKENDS
 from src.flow_estimation import FlowEstimator
-from src.visualize import Visualizer
+from src.frame_analysis import FrameAnalyzer
+from src.sampling import IDLE_STRIDE
+from src.sharding import plan_shards, analyse_sharded, DEFAULT_WARMUP_FRAMES
+from src.visualize import Visualizer, VISUALIZER_ENCODERS
 from src.utils import generate_clinical_report_plot
 from src.ensemble import EnsembleAggregator
+from src.timing import StageTimer, format_timings
 
-def process_single_video(video_path, calibration_path, output_dir, view_name="top", fps_override=None):
+def process_single_video(video_path, calibration_path, output_dir, view_name="top", fps_override=None,
+                         prefetch_depth=DEFAULT_PREFETCH_DEPTH, velocity_backend="farneback", video_encoder="mp4v",
+                         timer=None, render_video=True, idle_stride=IDLE_STRIDE,
+                         decoder="cv2", shards=1, shard_warmup_frames=DEFAULT_WARMUP_FRAMES, shard_boundaries_s=None):
     """
     Runs the CV pipeline on a single video.
-    Returns: df (flow history), metrics, visualization_path
+    timer: StageTimer to record stage times into (a new one if None).
+    render_video: Write annotated_<view>.mp4; False skips the Visualizer (metrics only).
+    idle_stride: While no stream is seen only every idle_stride-th frame (or a frame
+        with enough foreground) is analysed; see src.sampling.AdaptiveSampler. 1 analyses all.
+    decoder: One of src.preprocess.DECODERS, used when frames are downscaled
+        (see scripts/benchmark_decode.py for speed and metric differences).
+    shards: Split the video into this many time shards analysed in parallel
+        processes (metrics only, ignored when render_video is set).
+    shard_warmup_frames: Frames each shard analyses before its own range so the
+        background model and ROI lock settle; see src.sharding.
+    shard_boundaries_s: Explicit shard start times (s) instead of `shards`.
+    Returns: df (flow history), metrics, visualization_path, timings (per-stage summary)
     """
     if not video_path or not os.path.exists(video_path):
         print(f"[{view_name.upper()}] Video not found or not provided: {video_path}")
         return None, None
         
     print(f"[{view_name.upper()}] Starting Analysis: {video_path}")
+    timer = timer if timer is not None else StageTimer()
+    start = timer.now()
     
     # Calibration
     try:
-        px_to_cm = compute_pixel_to_cm_scale(calibration_path)
+        with timer.stage("calibration"):
+            px_to_cm = compute_pixel_to_cm_scale(calibration_path)
     except Exception as e:
         print(f"[{view_name.upper()}] Calibration error: {e}. Using fallback.")
         px_to_cm = 0.052 # Default fallback
@@ -46,6 +66,7 @@ def process_single_video(video_path, calibration_path, output_dir, view_name="to
     if fps_override: fps = fps_override
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
     
     if fps <= 0: fps = 30
@@ -59,39 +80,82 @@ def process_single_video(video_path, calibration_path, output_dir, view_name="to
         height = int(height / scale_factor)
         px_to_cm *= scale_factor
         
-    segmenter = StreamSegmenter()
-    tracker = StreamTracker(px_to_cm)
-    estimator = FlowEstimator()
+    # Time shards only give the metrics; the annotated video is one sequential pass
+    plan = None
+    if shards > 1 or shard_boundaries_s:
+        if render_video:
+            print(f"[{view_name.upper()}] Sharding needs metrics-only mode, analysing sequentially")
+        else:
+            boundaries = [round(b * fps) for b in shard_boundaries_s] if shard_boundaries_s else None
+            plan = plan_shards(total_frames, shards, shard_warmup_frames, boundaries)
     
-    # Intermediate visualization
-    out_vid_name = f"annotated_{view_name}.mp4"
-    out_vid_path = os.path.join(output_dir, out_vid_name)
-    visualizer = Visualizer(out_vid_path, fps, (width, height))
+    if plan is not None and len(plan) > 1:
+        print(f"[{view_name.upper()}] Analysing {len(plan)} time shards in parallel "
+              f"({shard_warmup_frames} warm-up frames each)")
+        with timer.stage("shards"):
+            estimator, counts = analyse_sharded(video_path, plan, (width, height), fps, px_to_cm,
+                                                velocity_backend, idle_stride, prefetch_depth, timer)
+        if idle_stride > 1:
+            print(f"[{view_name.upper()}] Analysed {counts['analysed']} frames (incl. warm-up), "
+                  f"skipped {counts['skipped']} idle frames")
+    else:
+        analyzer = FrameAnalyzer(px_to_cm, velocity_backend, idle_stride, timer)
+        estimator = FlowEstimator(online=True)
     
-    frame_gen = read_video_frames(video_path, resize_shape=(width, height))
+        # Intermediate visualization
+        visualizer = None
+        if render_video:
+            out_vid_name = f"annotated_{view_name}.mp4"
+            out_vid_path = os.path.join(output_dir, out_vid_name)
+            visualizer = Visualizer(out_vid_path, fps, (width, height), encoder=video_encoder)
     
-    for frame_idx, frame in frame_gen:
-        mask = segmenter.process_frame(frame)
-        contour = segmenter.get_stream_contour(mask)
-        stats = tracker.process(frame, mask, contour, fps)
+        # Decode-ahead on a background thread (0 = decode inline)
+        # FFmpeg scales while decoding, which only pays off when downscaling
+        frame_gen = read_video_frames(video_path, resize_shape=(width, height), prefetch_depth=prefetch_depth,
+                                      decoder=decoder if scale_factor > 1.0 else "cv2",
+                                      timer=timer)
+    
+        for frame_idx, frame in frame_gen:
+            ctx = analyzer.analyse(frame, fps)
+            stats = ctx.stats
+            mark = timer.now()
         
-        timestamp = frame_idx / fps
-        flow_val = estimator.update(stats['area_cm2'], stats['velocity_cm_s'], timestamp, frame_idx)
+            timestamp = frame_idx / fps
+            flow_val = estimator.update(stats['area_cm2'], stats['velocity_cm_s'], timestamp, frame_idx)
+            mark = timer.lap("flow_estimator", mark)
         
-        # Viz (using partial results if available, usually get_results returns whole history so efficient enough for small vids)
-        # For speed we passed df to visualizer, but let's pass None to skip heavy plot updates every frame
-        # or pass a lightweight struct. The Visualizer.process_frame needs df only for the graph.
-        visualizer.process_frame(frame, contour, flow_val, stats['velocity_cm_s'], stats['area_cm2'], frame_idx, None)
+            # Viz (using partial results if available, usually get_results returns whole history so efficient enough for small vids)
+            # For speed we passed df to visualizer, but let's pass None to skip heavy plot updates every frame
+            # or pass a lightweight struct. The Visualizer.process_frame needs df only for the graph.
+            if visualizer:
+                visualizer.process_frame(frame, ctx.contour, flow_val, stats['velocity_cm_s'], stats['area_cm2'],
+                                         frame_idx, None, stream_mask=ctx.stream_mask())
+                timer.lap("visualization", mark)
         
-        if frame_idx % 60 == 0:
-            print(f"[{view_name.upper()}] Frame {frame_idx}: {flow_val:.2f} ml/s")
+            if frame_idx % 60 == 0:
+                provisional = estimator.current_metrics()
+                print(f"[{view_name.upper()}] Frame {frame_idx}: {flow_val:.2f} ml/s "
+                      f"(Qmax so far {provisional['Qmax']:.2f} ml/s, volume {provisional['Voided_Volume']:.1f} ml)")
             
-    visualizer.release()
+        if visualizer:
+            with timer.stage("video_finalize"):
+                visualizer.release()
+        if analyzer.sampler:
+            print(f"[{view_name.upper()}] {analyzer.sampling_summary()}")
     
     # Initial Results (Raw/Smoothed internally)
-    df, metrics = estimator.get_results()
+    with timer.stage("flow_results"):
+        df, metrics = estimator.get_results()
+    timer.lap("total", start)
     
-    return {'df': df, 'metrics': metrics, 'px_to_cm': px_to_cm}
+    return {'df': df, 'metrics': metrics, 'px_to_cm': px_to_cm, 'timings': timer.summary()}
+
+def prefetch_depth_arg(value):
+    """argparse type of --prefetch-depth: 0, or at least MIN_PREFETCH_DEPTH."""
+    depth = int(value)
+    if depth != 0 and depth < MIN_PREFETCH_DEPTH:
+        raise argparse.ArgumentTypeError(f"must be 0 (disabled) or at least {MIN_PREFETCH_DEPTH}, got {depth}")
+    return depth
 
 def main():
     parser = argparse.ArgumentParser(description="Uroflow Ensemble Analysis")
@@ -105,8 +169,29 @@ def main():
     parser.add_argument("--output-dir", required=True, help="Directory to save outputs")
     parser.add_argument("--volume", type=float, help="Manual total voided volume (ml)")
     parser.add_argument("--fps-override", type=float, help="Override fps")
+    parser.add_argument("--prefetch-depth", type=prefetch_depth_arg, default=DEFAULT_PREFETCH_DEPTH,
+                        help="Frames decoded ahead on a background thread (0 disables)")
+    parser.add_argument("--velocity-backend", default="farneback", choices=list(VELOCITY_BACKENDS),
+                        help="Optical flow backend used for stream velocity")
+    parser.add_argument("--video-encoder", default="mp4v", choices=list(VISUALIZER_ENCODERS),
+                        help="Annotated video encoder (h264 = browser-ready, needs FFmpeg)")
+    parser.add_argument("--decoder", default="cv2", choices=list(DECODERS),
+                        help="Frame decoder (ffmpeg scales during decode, falls back to cv2)")
+    parser.add_argument("--idle-stride", type=int, default=IDLE_STRIDE,
+                        help="Analyse every Nth frame while no stream is present (1 analyses every frame)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Analyse each video as N time shards in parallel processes (needs --metrics-only)")
+    parser.add_argument("--shard-warmup", type=int, default=DEFAULT_WARMUP_FRAMES,
+                        help="Frames analysed before each shard so the background model settles")
+    parser.add_argument("--shard-boundaries",
+                        help="Explicit shard start times in seconds, comma separated (instead of --shards)")
+    parser.add_argument("--metrics-only", action="store_true",
+                        help="Skip the annotated video; only write the CSV, JSON report and plot")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print per-stage timings (always saved to timings.json)")
     
     args = parser.parse_args()
+    shard_boundaries = [float(t) for t in args.shard_boundaries.split(",")] if args.shard_boundaries else None
     
     if not os.path.exists(args.output_dir):
         os.makedirs(args.output_dir)
@@ -122,20 +207,30 @@ def main():
     # 1. Process Top
     top_result = None
     if top_vid:
-        top_result = process_single_video(top_vid, args.calibration_image, args.output_dir, "top", args.fps_override)
+        top_result = process_single_video(top_vid, args.calibration_image, args.output_dir, "top", args.fps_override,
+                                          prefetch_depth=args.prefetch_depth, velocity_backend=args.velocity_backend,
+                                          video_encoder=args.video_encoder, render_video=not args.metrics_only,
+                                          idle_stride=args.idle_stride, decoder=args.decoder, shards=args.shards,
+                                          shard_warmup_frames=args.shard_warmup, shard_boundaries_s=shard_boundaries)
         
     # 2. Process Side
     side_result = None
     if side_vid:
         # Assuming we use the same validation image or we need a side calibration image?
         # The prompt implies one calibration image or shared logic. We use same for now.
-        side_result = process_single_video(side_vid, args.calibration_image, args.output_dir, "side", args.fps_override)
+        side_result = process_single_video(side_vid, args.calibration_image, args.output_dir, "side", args.fps_override,
+                                           prefetch_depth=args.prefetch_depth, velocity_backend=args.velocity_backend,
+                                           video_encoder=args.video_encoder, render_video=not args.metrics_only,
+                                           idle_stride=args.idle_stride, decoder=args.decoder, shards=args.shards,
+                                           shard_warmup_frames=args.shard_warmup, shard_boundaries_s=shard_boundaries)
         
     # 3. Ensemble
     print(">>> Running Ensemble Aggregation")
+    run_timer = StageTimer()
     aggregator = EnsembleAggregator()
     
-    final_df, final_metrics = aggregator.process(top_result, side_result, args.volume)
+    with run_timer.stage("ensemble"):
+        final_df, final_metrics = aggregator.process(top_result, side_result, args.volume)
     
     # 4. Final Outputs
     final_csv_path = os.path.join(args.output_dir, "flow_timeseries.csv")
@@ -160,7 +255,20 @@ def main():
         
     # Plot
     plot_path = os.path.join(args.output_dir, "clinical_report.png")
-    generate_clinical_report_plot(final_df, final_metrics, plot_path)
+    with run_timer.stage("plot"):
+        generate_clinical_report_plot(final_df, final_metrics, plot_path)
+    
+    # Per-stage timings
+    timings = {'views': {}, 'stages': run_timer.summary()}
+    for name, res in (("top", top_result), ("side", side_result)):
+        if isinstance(res, dict) and res.get('timings'):
+            timings['views'][name] = res['timings']
+    with open(os.path.join(args.output_dir, "timings.json"), 'w') as f:
+        json.dump(timings, f, indent=4)
+    if args.timings:
+        for name, summary in timings['views'].items():
+            print("\n" + format_timings(summary, f"[{name.upper()}] Stage timings"))
+        print("\n" + format_timings(timings['stages'], "[RUN] Stage timings"))
     
     print("\n=== Analysis Complete ===")
     print(f"Final Qmax: {final_metrics['Qmax']:.2f} ml/s")
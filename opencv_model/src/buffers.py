@@ -0,0 +1,24 @@
+import numpy as np
+
+class BufferPool:
+    """
+    Named work arrays reused from frame to frame.
+
+    get() hands out the same array for a name as long as the requested
+    shape and dtype do not change (e.g. the locked crop window moves), so
+    steady-state frames allocate nothing. The contents are whatever the
+    previous frame left: callers overwrite them fully or use zeros().
+    """
+    def __init__(self):
+        self._arrays = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        array = self._arrays.get(name)
+        if array is None or array.shape != tuple(shape) or array.dtype != dtype:
+            array = self._arrays[name] = np.empty(shape, dtype=dtype)
+        return array
+
+    def zeros(self, name, shape, dtype=np.uint8):
+        array = self.get(name, shape, dtype)
+        array.fill(0)
+        return array
@@ -1,9 +1,166 @@
 import numpy as np
 import pandas as pd
 
-class FlowEstimator:
+# Per-frame history columns and their dtypes
+HISTORY_COLUMNS = (
+    ('timestamp_s', np.float64),
+    ('frame_id', np.int64),
+    ('contour_area_cm2', np.float64),
+    ('velocity_cm_s', np.float64),
+    ('flow_ml_s', np.float64),
+)
+
+# Columns filled by the online smoother (lagging the raw history)
+ONLINE_COLUMNS = (
+    ('flow_smooth', np.float64),
+    ('accumulated_volume_ml', np.float64),
+)
+
+FLOW_CLIP_ML_S = 100.0
+SMOOTHING_WINDOW = 90 # approx 3 seconds at 30fps
+
+class _RunningMetrics:
+    """Clinical metrics accumulated over the frames smoothed so far."""
     def __init__(self):
-        self.flow_history = []
+        self.volume = 0.0
+        self.flow_time = 0.0
+        self.start_idx = None
+        self.end_idx = None
+        self.qmax = -np.inf
+        self.qmax_idx = None
+
+    def copy(self):
+        other = _RunningMetrics()
+        other.__dict__.update(self.__dict__)
+        return other
+
+class FlowEstimator:
+    def __init__(self, initial_capacity=1024, online=False, flow_threshold_ml_s=1.0):
+        """
+        Args:
+            initial_capacity: Frames preallocated in the history columns.
+            online: Smooth and accumulate the clinical metrics as frames arrive
+                (O(1) per update) instead of in one pandas pass at the end.
+                Metrics can then be read at any time with current_metrics().
+            flow_threshold_ml_s: Flow start/end threshold used by the online
+                metrics (get_results with another threshold recomputes).
+        """
+        # Columnar history: one preallocated numpy array per field, grown by
+        # doubling, so update() does not allocate a record per frame.
+        self._capacity = initial_capacity
+        self._size = 0
+        columns = HISTORY_COLUMNS + (ONLINE_COLUMNS if online else ())
+        self._columns = {name: np.empty(initial_capacity, dtype=dtype) for name, dtype in columns}
+        
+        # Online smoothing state
+        # The centred window of frame j spans [j - window//2, j + lag], so
+        # frame j is smoothed once frame j + lag has arrived. Its mean is the
+        # trailing sum of the last `window` clipped flows, kept in a ring.
+        self.online = online
+        self.flow_threshold_ml_s = flow_threshold_ml_s
+        self.window_size = SMOOTHING_WINDOW
+        self.lag = self.window_size - 1 - self.window_size // 2
+        self._ring = np.zeros(self.window_size)
+        self._ring_sum = 0.0
+        self._smoothed = 0 # frames whose smoothed value is final
+        self._running = _RunningMetrics()
+        
+    def __len__(self):
+        return self._size
+        
+    def _grow(self):
+        self._capacity *= 2
+        for name, col in self._columns.items():
+            grown = np.empty(self._capacity, dtype=col.dtype)
+            grown[:self._size] = col[:self._size]
+            self._columns[name] = grown
+            
+    def history(self):
+        """
+        Returns {column: array view} of the recorded frames (no copy).
+        The views stay valid after further updates.
+        """
+        return {name: col[:self._size] for name, col in self._columns.items()}
+        
+    def _advance(self, running, j, flow_smooth):
+        """Adds smoothed frame j to the running integral and metrics."""
+        cols = self._columns
+        dt = cols['timestamp_s'][j] - cols['timestamp_s'][j - 1] if j > 0 else 0.0
+        running.volume += flow_smooth * dt
+        cols['flow_smooth'][j] = flow_smooth
+        cols['accumulated_volume_ml'][j] = running.volume
+        
+        if flow_smooth > self.flow_threshold_ml_s:
+            if running.start_idx is None:
+                running.start_idx = j
+            running.end_idx = j
+            running.flow_time += dt
+        # Strict '>' keeps the first maximum, like idxmax
+        if flow_smooth > running.qmax:
+            running.qmax = flow_smooth
+            running.qmax_idx = j
+            
+    def _update_online(self, flow_ml_s):
+        i = self._size - 1
+        w = self.window_size
+        clipped = min(flow_ml_s, FLOW_CLIP_ML_S)
+        slot = i % w
+        self._ring_sum += clipped - self._ring[slot]
+        self._ring[slot] = clipped
+        if slot == w - 1:
+            # Re-sum once per lap so add/subtract rounding cannot drift
+            self._ring_sum = float(self._ring.sum())
+            
+        j = i - self.lag
+        if j >= 0:
+            self._advance(self._running, j, self._ring_sum / min(i + 1, w))
+            self._smoothed = j + 1
+            
+    def _drain(self):
+        """
+        Smooths the last `lag` frames with their truncated windows.
+        Works on a copy of the running metrics, so updates can continue afterwards.
+        """
+        running = self._running.copy()
+        clipped = np.minimum(self._columns['flow_ml_s'][:self._size], FLOW_CLIP_ML_S)
+        half = self.window_size // 2
+        for j in range(self._smoothed, self._size):
+            self._advance(running, j, float(clipped[max(0, j - half):].mean()))
+        return running
+        
+    def _metrics_from(self, running):
+        metrics = {
+            "Qmax": 0.0,
+            "Time_to_Qmax": 0.0,
+            "Voided_Volume": 0.0,
+            "Flow_Time": 0.0,
+            "Voiding_Time": 0.0,
+            "Hesitancy": 0.0,
+            "Average_Flow_Rate": 0.0
+        }
+        if running.start_idx is None:
+            return metrics
+        
+        times = self._columns['timestamp_s']
+        start_time = times[running.start_idx]
+        metrics["Hesitancy"] = start_time
+        metrics["Voiding_Time"] = times[running.end_idx] - start_time
+        metrics["Flow_Time"] = running.flow_time
+        metrics["Qmax"] = running.qmax
+        metrics["Time_to_Qmax"] = times[running.qmax_idx] - start_time
+        metrics["Voided_Volume"] = running.volume
+        if running.flow_time > 0:
+            metrics["Average_Flow_Rate"] = running.volume / running.flow_time
+        return metrics
+        
+    def current_metrics(self):
+        """
+        Provisional clinical metrics over the frames smoothed so far
+        (all but the last `lag` frames). Online mode only.
+        """
+        if not self.online:
+            raise RuntimeError("current_metrics() requires FlowEstimator(online=True)")
+        return self._metrics_from(self._running)
         
     def update(self, area_cm2, velocity_cm_s, timestamp_s, frame_id):
         """
@@ -19,18 +176,36 @@ class FlowEstimator:
         # unless noise. We take absolute or clamp to 0.
         flow_ml_s = max(0.0, flow_ml_s)
         
-        record = {
-            'timestamp_s': timestamp_s,
-            'frame_id': frame_id,
-            'contour_area_cm2': area_cm2,
-            'velocity_cm_s': velocity_cm_s,
-            'flow_ml_s': flow_ml_s
-        }
-        self.flow_history.append(record)
+        if self._size == self._capacity:
+            self._grow()
+        i = self._size
+        cols = self._columns
+        cols['timestamp_s'][i] = timestamp_s
+        cols['frame_id'][i] = frame_id
+        cols['contour_area_cm2'][i] = area_cm2
+        cols['velocity_cm_s'][i] = velocity_cm_s
+        cols['flow_ml_s'][i] = flow_ml_s
+        self._size += 1
+        if self.online:
+            self._update_online(flow_ml_s)
         return flow_ml_s
         
     def get_results(self, flow_threshold_ml_s=1.0):
-        df = pd.DataFrame(self.flow_history)
+        # Online mode already holds the smoothed series and metrics; only the
+        # last `lag` frames remain. Short recordings (no smoothing) and other
+        # thresholds go through the full pass below.
+        if self.online and self._size > self.window_size and flow_threshold_ml_s == self.flow_threshold_ml_s:
+            running = self._drain()
+            history = self.history()
+            history['flow_ml_s'] = np.minimum(history['flow_ml_s'], FLOW_CLIP_ML_S)
+            return pd.DataFrame(history, copy=False), self._metrics_from(running)
+        
+        # Columns are wrapped without copying; below only whole columns are
+        # reassigned, so the history buffers themselves are never modified.
+        history = self.history()
+        for name, _ in ONLINE_COLUMNS:
+            history.pop(name, None)
+        df = pd.DataFrame(history, copy=False)
         if df.empty:
             return None, {}
             
@@ -39,9 +214,9 @@ class FlowEstimator:
         # Assuming ~30 fps, we want window ~60.
         # However, we'll use a dynamic window based on data length.
         
-        df['flow_ml_s'] = df['flow_ml_s'].clip(upper=100.0)
+        df['flow_ml_s'] = df['flow_ml_s'].clip(upper=FLOW_CLIP_ML_S)
         
-        window_size = 90 # approx 3 seconds at 30fps
+        window_size = SMOOTHING_WINDOW
         if len(df) > window_size:
             df['flow_smooth'] = df['flow_ml_s'].rolling(window=window_size, min_periods=window_size//2, center=True).mean()
         else:
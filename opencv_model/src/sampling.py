@@ -0,0 +1,94 @@
+import cv2
+
+# Frames fully analysed while idle: every IDLE_STRIDE-th (1 analyses every frame)
+IDLE_STRIDE = 4
+
+# Tracker stats recorded for skipped frames
+IDLE_STATS = {'area_px': 0, 'area_cm2': 0.0, 'velocity_cm_s': 0.0, 'centroid': None}
+
+class AdaptiveSampler:
+    """
+    Decides per frame whether the full pipeline (morphology, stream
+    selection, optical flow) has to run after background subtraction.
+
+    Background subtraction itself runs on every frame: MOG2's model depends
+    on each frame it sees, and skipping it would delay stream detection.
+    Its foreground mask doubles as the motion probe.
+
+    Idle (no stream seen): a frame is analysed when its foreground has at
+    least `min_foreground_px` pixels (the smallest stream contour) or it is
+    the `idle_stride`-th frame since the last analysed one.
+
+    Active: once the caller reports a stream (observe(True)) every frame is
+    analysed, until none has been reported for `hold_frames` frames.
+
+    Skipped frames carry no stream, so the caller records them as zero flow
+    (IDLE_STATS) at their own timestamp; the timeline is never resampled.
+
+    Usage:
+        fgmask, x_offset = segmenter.foreground(frame)
+        if sampler.should_analyse(frame, fgmask):
+            if sampler.reference is not None:
+                tracker.set_reference(sampler.reference)
+            mask = segmenter.select_stream(fgmask, x_offset, frame.shape)
+            ...
+            sampler.observe(stream_present)
+    """
+    def __init__(self, idle_stride=IDLE_STRIDE, hold_frames=15, min_foreground_px=50):
+        if idle_stride < 1:
+            raise ValueError("idle_stride must be at least 1")
+        self.idle_stride = idle_stride
+        self.hold_frames = hold_frames
+        self.min_foreground_px = min_foreground_px
+
+        self.active = False
+        self.hold = 0
+        self.since_analysed = 0
+        # Grayscale copy of the previous frame while it was skipped (decoders
+        # may reuse frame buffers, so the frame itself cannot be kept)
+        self._prev_gray = None
+        # Set by should_analyse: the optical flow reference for an analysed
+        # frame that follows a skipped one, else None
+        self.reference = None
+        # Counters for logging / benchmarks
+        self.analysed = 0
+        self.skipped = 0
+
+    def should_analyse(self, frame, fgmask, gray=None):
+        """
+        Returns True if the frame needs the full pipeline.
+        `gray` is the frame's grayscale if the caller already has it; it is
+        kept (not copied) as the next frame's reference, so it must stay
+        unchanged until the next call.
+        """
+        if self.active:
+            analyse = True
+            self.reference = None
+            self._prev_gray = None
+        else:
+            analyse = (self.since_analysed + 1 >= self.idle_stride or
+                       cv2.countNonZero(fgmask) >= self.min_foreground_px)
+            # The tracker's own reference is stale if the previous frame was skipped
+            self.reference = self._prev_gray if analyse else None
+            if analyse:
+                self._prev_gray = None
+            else:
+                self._prev_gray = gray if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if analyse:
+            self.analysed += 1
+            self.since_analysed = 0
+        else:
+            self.skipped += 1
+            self.since_analysed += 1
+        return analyse
+
+    def observe(self, stream_present):
+        """Reports whether the analysed frame showed (or held a lock on) a stream."""
+        if stream_present:
+            self.active = True
+            self.hold = self.hold_frames
+        elif self.active:
+            self.hold -= 1
+            if self.hold <= 0:
+                self.active = False
@@ -1,5 +1,7 @@
 import cv2
 import numpy as np
+from .timing import NULL_TIMER
+from .buffers import BufferPool
 
 class StreamSegmenter:
     """
@@ -8,8 +10,11 @@ class StreamSegmenter:
     Target: Segment pixels that are BOTH 'Foreground' AND 'Moving Fast'.
     This effectively isolates the fluid stream from body parts (stomach) which move slowly.
     """
-    def __init__(self, history=500, varThreshold=10, min_velocity_px=2.0):
+    def __init__(self, history=500, varThreshold=10, min_velocity_px=2.0,
+                 roi_crop=True, roi_margin=32, full_refresh_interval=10, timer=None):
         # Very sensitive MOG2
+        self.history = history
+        self.varThreshold = varThreshold
         self.fgbg = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=varThreshold, detectShadows=False)
         
         # Kernels
@@ -25,72 +30,136 @@ class StreamSegmenter:
         self.roi_width = 120 # Narrower ROI (was 150)
         self.missed_frames = 0
         self.max_missed = 10 
+        
+        # Candidate / stream size gates: pixels of a component, contour area of the stream
+        self.min_candidate_px = 30
+        self.min_stream_area = 50
+        # Contour and (x, y, w, h) box of the stream chosen by the last
+        # select_stream(), in frame coordinates (None if none)
+        self.stream_contour = None
+        self.stream_bbox = None
+        
+        # Locked-mode cropping
+        # Once locked, MOG2 + morphology only run on a window of
+        # (ROI band + roi_margin) instead of the full frame. The crop has its own
+        # background model; the full-frame model is still fed every
+        # `full_refresh_interval` frames so it is warm when the lock is lost.
+        self.roi_crop = roi_crop
+        self.roi_margin = roi_margin
+        self.full_refresh_interval = full_refresh_interval
+        self.crop_fgbg = None
+        self.crop_window = None # (x0, x1) in frame coordinates
+        self.frames_since_refresh = 0
+        # Band edges must stay this far from the crop edges for the 40x40
+        # opening to see the same neighbourhood as on the full frame
+        self.crop_guard = self.kernel_thick.shape[1] // 2
+        
+        # Optional StageTimer: per-frame "mog2", "morphology", "contour_selection"
+        self.timer = timer or NULL_TIMER
+        # Foreground and morphology work arrays. The foreground() mask lives
+        # here too: it is valid until the next foreground() call
+        self.buffers = BufferPool()
 
     def process_frame(self, frame):
         """
         Segment finding stream using ROI Locking & Width Gating.
         """
-        h_frame, w_frame = frame.shape[:2]
-        
-        # 1. Background Subtraction
-        fgmask = self.fgbg.apply(frame)
-        _, fgmask = cv2.threshold(fgmask, 200, 255, cv2.THRESH_BINARY)
-        
-        # 2. ROI Filtering
-        if self.locked_x_center is not None:
-            roi_mask = np.zeros_like(fgmask)
-            # Adaptive Width? Let's stick to fixed narrow for stability
-            w_roi = self.roi_width
-            x1 = max(0, self.locked_x_center - w_roi // 2)
-            x2 = min(w_frame, self.locked_x_center + w_roi // 2)
-            roi_mask[:, x1:x2] = 255
-            fgmask = cv2.bitwise_and(fgmask, roi_mask)
+        fgmask, x_offset = self.foreground(frame)
+        return self.select_stream(fgmask, x_offset, frame.shape)
+
+    def foreground(self, frame):
+        """
+        Background subtraction and ROI filtering (steps 1-2 of process_frame).
+        Returns (thresholded foreground mask, x offset of the mask in the frame).
+        """
+        w_frame = frame.shape[1]
+        mark = self.timer.now()
+        
+        if self.roi_crop and self.locked_x_center is not None:
+            # 1+2. Background Subtraction on the locked band only
+            fgmask, x_offset = self._locked_foreground(frame)
+        else:
+            self.crop_fgbg = None
+            self.crop_window = None
+            x_offset = 0
+            
+            # 1. Background Subtraction
+            fgmask = self.fgbg.apply(frame, self.buffers.get("foreground", frame.shape[:2]))
+            cv2.threshold(fgmask, 200, 255, cv2.THRESH_BINARY, dst=fgmask)
             
+            # 2. ROI Filtering
+            if self.locked_x_center is not None:
+                # Adaptive Width? Let's stick to fixed narrow for stability
+                w_roi = self.roi_width
+                x1 = max(0, self.locked_x_center - w_roi // 2)
+                x2 = min(w_frame, self.locked_x_center + w_roi // 2)
+                fgmask[:, :x1] = 0
+                fgmask[:, x2:] = 0
+            
+        self.timer.lap("mog2", mark)
+        return fgmask, x_offset
+
+    def select_stream(self, fgmask, x_offset, frame_shape, out=None):
+        """
+        Morphology, geometric selection and lock update (steps 3-5 of
+        process_frame) on a foreground() result. Returns the clean mask,
+        written into `out` (a frame-sized uint8 array) if given.
+        """
+        h_frame, w_frame = frame_shape[:2]
+        mark = self.timer.now()
+        buffers = self.buffers
+        
         # 3. Hand Removal (Width Gating)
         # Identify "Thick" objects (Hand) by Opening with large kernel
-        thick_objects = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel_thick)
+        thick_objects = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel_thick,
+                                         dst=buffers.get("thick", fgmask.shape))
         # Subtract Thick objects from Mask
         # This leaves only Thin objects (Stream)
-        fgmask = cv2.bitwise_and(fgmask, cv2.bitwise_not(thick_objects))
+        cv2.bitwise_not(thick_objects, dst=thick_objects)
+        thin = cv2.bitwise_and(fgmask, thick_objects, dst=buffers.get("thin", fgmask.shape))
             
         # 4. Cleanup & Connect (Vertical Dilation)
-        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel_clean)
+        opened = cv2.morphologyEx(thin, cv2.MORPH_OPEN, self.kernel_clean, dst=thick_objects)
         # Strong vertical close to fix gaps made by subtraction or noise
-        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_CLOSE, self.kernel_vertical)
+        fgmask = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, self.kernel_vertical, dst=thin)
+        mark = self.timer.lap("morphology", mark)
         
         # 5. Geometric Selection & Lock Update
-        contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        clean_mask = np.zeros_like(fgmask)
-        
-        best_c = None
-        max_score = 0
-        
-        for c in contours:
-            area = cv2.contourArea(c)
-            if area < 30: continue
-            
-            x, y, w, h = cv2.boundingRect(c)
-            
-            # Aspect Ratio
-            length = max(w, h)
-            thickness = min(w, h)
-            if thickness == 0: continue
-            ar = length / thickness
-            
-            # Threshold (Stream is thin/long)
+        # One labelling pass over the foreground's bounding box; candidates
+        # are filtered on its stats table rather than contour by contour
+        if out is None:
+            clean_mask = np.zeros((h_frame, w_frame), dtype=np.uint8)
+        else:
+            clean_mask = out
+            clean_mask.fill(0)
+        self.stream_contour = None
+        self.stream_bbox = None
+        best = None
+        fx, fy, fw, fh = cv2.boundingRect(fgmask)
+        if fw and fh:
+            fg = fgmask[fy:fy + fh, fx:fx + fw]
+            n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(fg, connectivity=8, ltype=cv2.CV_16U)
+            # Row 0 is the background
+            widths = stats[1:, cv2.CC_STAT_WIDTH]
+            heights = stats[1:, cv2.CC_STAT_HEIGHT]
+            # Aspect Ratio (Stream is thin/long)
+            ar = np.maximum(widths, heights) / np.minimum(widths, heights)
             threshold = 1.2 if self.locked_x_center is not None else 2.0
+            accepted = np.flatnonzero((stats[1:, cv2.CC_STAT_AREA] >= self.min_candidate_px) & (ar > threshold)) + 1
             
-            if ar > threshold:
-                cv2.drawContours(clean_mask, [c], -1, 255, -1)
-                
-                if area > max_score:
-                    max_score = area
-                    best_c = c
+            if accepted.size:
+                # Frame coordinates of the labelled box
+                x0 = x_offset + fx
+                clean_mask[fy:fy + fh, x0:x0 + fw] = self._label_mask(fg, labels, n_labels, accepted)
+                best = accepted[np.argmax(stats[accepted, cv2.CC_STAT_AREA])]
+                self.stream_contour = self._component_contour(labels, best, stats[best], (x0, fy))
+                if self.stream_contour is not None:
+                    bx, by, bw, bh = (int(v) for v in stats[best, :cv2.CC_STAT_AREA])
+                    self.stream_bbox = (x0 + bx, fy + by, bw, bh)
                     
         # Update Lock
-        if best_c is not None:
-            bx, by, bw, bh = cv2.boundingRect(best_c)
-            cx = bx + bw // 2
+        if best is not None:
+            cx = int(x0 + stats[best, cv2.CC_STAT_LEFT] + stats[best, cv2.CC_STAT_WIDTH] // 2)
             
             if self.locked_x_center is None:
                 self.locked_x_center = cx
@@ -101,12 +170,92 @@ class StreamSegmenter:
             self.missed_frames += 1
             if self.missed_frames > self.max_missed:
                 self.locked_x_center = None 
-                
+        
+        self.timer.lap("contour_selection", mark)
         return clean_mask
 
+    @staticmethod
+    def _label_mask(fgmask, labels, n_labels, accepted):
+        """255 where `labels` is one of the `accepted` labels, else 0."""
+        if accepted.size == n_labels - 1:
+            return fgmask
+        lut = np.zeros(256 if n_labels <= 256 else n_labels, dtype=np.uint8)
+        lut[accepted] = 255
+        if n_labels <= 256:
+            return cv2.LUT(labels.astype(np.uint8), lut)
+        return np.take(lut, labels)
+
+    def _component_contour(self, labels, label, stat, origin):
+        """
+        Outer contour of one labelled component, in frame coordinates
+        (`origin` = frame position of the labels image), or None if its
+        contour area is below min_stream_area.
+        """
+        x, y = stat[cv2.CC_STAT_LEFT], stat[cv2.CC_STAT_TOP]
+        w, h = stat[cv2.CC_STAT_WIDTH], stat[cv2.CC_STAT_HEIGHT]
+        component = (labels[y:y + h, x:x + w] == label).view(np.uint8)
+        contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                       offset=(int(origin[0] + x), int(origin[1] + y)))
+        contour = max(contours, key=cv2.contourArea)
+        return contour if cv2.contourArea(contour) >= self.min_stream_area else None
+
+    def _locked_foreground(self, frame):
+        """
+        Runs background subtraction on the crop window around the locked band.
+        Returns (thresholded band mask, x offset of the crop in the frame).
+        """
+        w_frame = frame.shape[1]
+        w_roi = self.roi_width
+        x1 = max(0, self.locked_x_center - w_roi // 2)
+        x2 = min(w_frame, self.locked_x_center + w_roi // 2)
+        
+        # Re-anchor the crop when the band drifts too close to its edge
+        # (edges that coincide with the frame border are fine)
+        if self.crop_window is not None:
+            cx0, cx1 = self.crop_window
+            drifted = (cx0 > 0 and x1 - cx0 < self.crop_guard) or \
+                      (cx1 < w_frame and cx1 - x2 < self.crop_guard)
+            if drifted:
+                self.crop_fgbg = None
+        
+        if self.crop_fgbg is None:
+            cx0 = max(0, x1 - self.roi_margin)
+            cx1 = min(w_frame, x2 + self.roi_margin)
+            # Morphology is markedly faster on SIMD-friendly widths
+            extra = min(w_frame, -(-(cx1 - cx0) // 32) * 32) - (cx1 - cx0)
+            grow_right = min(extra, w_frame - cx1)
+            cx1 += grow_right
+            cx0 -= extra - grow_right
+            self.crop_window = (cx0, cx1)
+            self.crop_fgbg = cv2.createBackgroundSubtractorMOG2(history=self.history, varThreshold=self.varThreshold, detectShadows=False)
+            # Seed the new model with the full-frame background so the first
+            # cropped frames are not all foreground
+            bg = self.fgbg.getBackgroundImage()
+            if bg is not None:
+                self.crop_fgbg.apply(np.ascontiguousarray(bg[:, cx0:cx1]), learningRate=1.0)
+        
+        # Keep the full-frame model warm for when the lock is lost
+        self.frames_since_refresh += 1
+        if self.frames_since_refresh >= self.full_refresh_interval:
+            self.fgbg.apply(frame, self.buffers.get("foreground", frame.shape[:2]))
+            self.frames_since_refresh = 0
+        
+        cx0, cx1 = self.crop_window
+        # MOG2 needs a contiguous crop
+        crop = self.buffers.get("crop", (frame.shape[0], cx1 - cx0) + frame.shape[2:], frame.dtype)
+        np.copyto(crop, frame[:, cx0:cx1])
+        fgmask = self.crop_fgbg.apply(crop, self.buffers.get("crop_foreground", crop.shape[:2]))
+        cv2.threshold(fgmask, 200, 255, cv2.THRESH_BINARY, dst=fgmask)
+        
+        # ROI Filtering within the crop
+        fgmask[:, :x1 - cx0] = 0
+        fgmask[:, x2 - cx0:] = 0
+        return fgmask, cx0
+
     def get_stream_contour(self, mask):
         """
         Finds the largest contour in the kinematic mask.
+        select_stream() already sets stream_contour for the mask it returns.
         """
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         if not contours:
@@ -115,7 +264,7 @@ class StreamSegmenter:
         # Assume largest moving object is the stream
         c = max(contours, key=cv2.contourArea)
         
-        if cv2.contourArea(c) < 50: 
+        if cv2.contourArea(c) < self.min_stream_area: 
             return None
             
         return c
@@ -0,0 +1,126 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .preprocess import read_video_frames
+from .frame_analysis import FrameAnalyzer
+from .flow_estimation import FlowEstimator
+from .sampling import IDLE_STRIDE
+from .timing import StageTimer
+
+# Frames each shard analyses (and discards) before its own range, so the
+# background model, the ROI lock and the idle sampler have settled by its
+# first recorded frame. MOG2 forgets over its `history` (500 frames in
+# StreamSegmenter); shorter warm-ups leave per-frame areas off for the whole
+# shard (see scripts/benchmark_sharding.py)
+DEFAULT_WARMUP_FRAMES = 500
+
+def plan_shards(total_frames, shards, warmup_frames, boundaries=None):
+    """
+    Splits frames [0, total_frames) into time shards.
+
+    Args:
+        total_frames: Frame count of the video (container metadata).
+        shards: Number of equal shards. Capped so that no shard is shorter
+            than its warm-up, which would cost more than it saves.
+        warmup_frames: Frames analysed before each shard's start (except the first).
+        boundaries: Explicit shard start frames (after 0) instead of `shards`.
+
+    Returns:
+        [(warm_start, start, end)]: a shard analyses frames from warm_start
+        and records [start, end). The last end is None (read to the end of
+        the video, container frame counts are not always exact).
+    """
+    if warmup_frames < 0:
+        raise ValueError("warmup_frames must not be negative")
+    if boundaries is not None:
+        starts = sorted({int(b) for b in boundaries if 0 < int(b) < total_frames})
+    else:
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        shards = min(shards, max(1, total_frames // max(warmup_frames, 1)))
+        starts = [round(i * total_frames / shards) for i in range(1, shards)]
+
+    starts = [0] + starts
+    ends = starts[1:] + [None]
+    return [(max(0, start - warmup_frames), start, end) for start, end in zip(starts, ends)]
+
+def analyse_shard(video_path, warm_start, start, end, resize_shape, fps, px_to_cm,
+                  velocity_backend="farneback", idle_stride=IDLE_STRIDE, prefetch_depth=0):
+    """
+    Analyses one shard with a fresh FrameAnalyzer (runs in a worker process).
+
+    Returns per recorded frame the tracker output ('frame_id', 'area_cm2',
+    'velocity_cm_s' arrays), the shard's StageTimer samples and its idle
+    sampling counters.
+    """
+    timer = StageTimer()
+    analyzer = FrameAnalyzer(px_to_cm, velocity_backend, idle_stride, timer)
+    max_frames = end - warm_start if end is not None else None
+
+    frame_ids, areas, velocities = [], [], []
+    mark = timer.now()
+    for frame_idx, frame in read_video_frames(video_path, max_frames=max_frames, resize_shape=resize_shape,
+                                              prefetch_depth=prefetch_depth, timer=timer,
+                                              start_frame=warm_start):
+        if frame_idx == start and start > warm_start:
+            mark = timer.lap("shard_warmup", mark)
+        stats = analyzer.analyse(frame, fps).stats
+        if frame_idx >= start:
+            frame_ids.append(frame_idx)
+            areas.append(stats['area_cm2'])
+            velocities.append(stats['velocity_cm_s'])
+
+    sampler = analyzer.sampler
+    return {
+        'frame_id': np.asarray(frame_ids, dtype=np.int64),
+        'area_cm2': np.asarray(areas, dtype=np.float64),
+        'velocity_cm_s': np.asarray(velocities, dtype=np.float64),
+        'samples': timer.samples,
+        'analysed': sampler.analysed if sampler else len(frame_ids),
+        'skipped': sampler.skipped if sampler else 0,
+    }
+
+def stitch_shards(parts, fps, estimator=None):
+    """
+    Feeds shard results, in order, into one FlowEstimator so its history
+    has the same rows (frame ids, timestamps) as a sequential run.
+    Raises ValueError if the shards do not cover a contiguous frame range.
+    """
+    estimator = estimator if estimator is not None else FlowEstimator(online=True)
+    expected = 0
+    for i, part in enumerate(parts):
+        frame_ids = part['frame_id']
+        if len(frame_ids) and (frame_ids[0] != expected or frame_ids[-1] != expected + len(frame_ids) - 1):
+            raise ValueError(f"Shard {i} starts at frame {frame_ids[0]}, expected {expected}")
+        expected += len(frame_ids)
+        for frame_id, area, velocity in zip(frame_ids.tolist(), part['area_cm2'].tolist(),
+                                            part['velocity_cm_s'].tolist()):
+            estimator.update(area, velocity, frame_id / fps, frame_id)
+    return estimator
+
+def analyse_sharded(video_path, plan, resize_shape, fps, px_to_cm, velocity_backend="farneback",
+                    idle_stride=IDLE_STRIDE, prefetch_depth=0, timer=None, max_workers=None):
+    """
+    Runs the shards of plan_shards() in parallel processes and stitches them.
+
+    Shard timings are merged into `timer`, so per-stage totals are summed
+    over all processes (CPU time, not wall time).
+    Returns (FlowEstimator, {'analysed', 'skipped'} frame counts).
+    """
+    args = [(video_path, warm_start, start, end, resize_shape, fps, px_to_cm,
+             velocity_backend, idle_stride, prefetch_depth) for warm_start, start, end in plan]
+    max_workers = max_workers or min(len(plan), os.cpu_count() or 1)
+    # spawn: workers must not inherit the parent's decoder / thread state
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+        parts = list(pool.map(analyse_shard, *zip(*args)))
+
+    if timer is not None:
+        for part in parts:
+            for name, values in part['samples'].items():
+                for seconds in values:
+                    timer.add(name, seconds)
+    counts = {'analysed': sum(p['analysed'] for p in parts), 'skipped': sum(p['skipped'] for p in parts)}
+    return stitch_shards(parts, fps), counts
@@ -0,0 +1,110 @@
+import time
+import numpy as np
+
+class _Stage:
+    """Context manager recording one duration per use into a sample list."""
+    __slots__ = ('samples', 'start')
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self.start)
+        return False
+
+class StageTimer:
+    """
+    Collects wall-clock durations per named pipeline stage.
+
+    Per-frame stages record one sample per frame, one-off stages (download,
+    ensemble, uploads, ...) a single sample; summary() reduces each stage to
+    count / total / p50 / p95 / max.
+
+    Usage:
+        with timer.stage("optical_flow"):
+            ...
+        # or, for consecutive sections of one function:
+        mark = timer.now()
+        ...
+        mark = timer.lap("mog2", mark)
+    """
+    def __init__(self):
+        self.samples = {}
+        self._stages = {}
+
+    def stage(self, name):
+        ctx = self._stages.get(name)
+        if ctx is None:
+            ctx = self._stages[name] = _Stage(self.samples.setdefault(name, []))
+        return ctx
+
+    def now(self):
+        return time.perf_counter()
+
+    def lap(self, name, since):
+        """Records the time elapsed since `since` (a now() value) and returns the current time."""
+        t = time.perf_counter()
+        self.samples.setdefault(name, []).append(t - since)
+        return t
+
+    def add(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def summary(self):
+        """
+        Returns {stage: {count, total_s, p50_ms, p95_ms, max_ms}} in the
+        order the stages were first recorded.
+        """
+        result = {}
+        for name, values in self.samples.items():
+            if not values:
+                continue
+            arr = np.asarray(values)
+            result[name] = {
+                'count': int(arr.size),
+                'total_s': float(arr.sum()),
+                'p50_ms': float(np.percentile(arr, 50) * 1000.0),
+                'p95_ms': float(np.percentile(arr, 95) * 1000.0),
+                'max_ms': float(arr.max() * 1000.0),
+            }
+        return result
+
+class NullTimer(StageTimer):
+    """Drop-in StageTimer that records nothing (default when timing is off)."""
+    class _NullStage:
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+
+    _null_stage = _NullStage()
+
+    def stage(self, name):
+        return self._null_stage
+
+    def now(self):
+        return 0.0
+
+    def lap(self, name, since):
+        return 0.0
+
+    def add(self, name, seconds):
+        pass
+
+NULL_TIMER = NullTimer()
+
+def format_timings(summary, title=None):
+    """Renders a summary() dict as a fixed-width table."""
+    lines = []
+    if title:
+        lines.append(title)
+    lines.append(f"{'stage':<20}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, s in summary.items():
+        lines.append(f"{name:<20}{s['count']:>7}{s['total_s']:>10.2f}{s['p50_ms']:>10.2f}"
+                     f"{s['p95_ms']:>10.2f}{s['max_ms']:>10.2f}")
+    return "\n".join(lines)
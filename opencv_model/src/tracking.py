@@ -9,21 +9,35 @@ def get_centroid(contour):
         return (cx, cy)
     return None
 
-def estimate_velocity_optical_flow(prev_gray, curr_gray, mask, px_to_cm, fps):
+# Farneback parameters: pyr_scale, levels, winsize, iterations, poly_n, poly_sigma, flags
+FARNEBACK_PARAMS = (0.5, 3, 15, 3, 5, 1.2, 0)
+
+# Padding around the mask's bounding box when flow is computed on a crop.
+# Covers the averaging window and polynomial neighbourhood at the coarsest
+# pyramid level, scaled back to full resolution: (15 // 2 + 5) * 2^(3 - 1).
+FLOW_ROI_PAD = (FARNEBACK_PARAMS[2] // 2 + FARNEBACK_PARAMS[4]) * 2 ** (FARNEBACK_PARAMS[1] - 1)
+
+# Max per-frame relative deviation of the cropped velocity from the
+# full-frame one, while the stream is visible in both frames
+FLOW_ROI_TOLERANCE = 0.10
+
+def crop_to_mask(prev_gray, curr_gray, mask, pad):
     """
-    Estimates average velocity in cm/s using Farneback Optical Flow within the mask.
+    Crops both frames and the mask to the mask's bounding box grown by pad pixels.
     """
-    if mask is None or cv2.countNonZero(mask) == 0:
-        return 0.0
-        
-    # Calculate Optical Flow
-    flow = cv2.calcOpticalFlowFarneback(prev_gray, curr_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
-    
-    # Mask the flow to only the stream area
-    flow_masked = cv2.bitwise_and(flow, flow, mask=mask)
-    
-    # Get magnitude and angle
-    mag, ang = cv2.cartToPolar(flow_masked[..., 0], flow_masked[..., 1])
+    h_frame, w_frame = mask.shape[:2]
+    x, y, w, h = cv2.boundingRect(mask)
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(w_frame, x + w + pad), min(h_frame, y + h + pad)
+    return prev_gray[y0:y1, x0:x1], curr_gray[y0:y1, x0:x1], mask[y0:y1, x0:x1]
+
+def mean_flow_velocity(flow, mask, px_to_cm, fps):
+    """
+    Average dense flow magnitude over the mask, converted to cm/s.
+    """
+    # Get magnitude and angle (only the stream pixels are read below,
+    # so the flow needs no masking first)
+    mag, ang = cv2.cartToPolar(flow[..., 0], flow[..., 1])
     
     # Average magnitude in pixels/frame
     # We only care about non-zero pixels (the stream)
@@ -41,20 +55,152 @@ def estimate_velocity_optical_flow(prev_gray, curr_gray, mask, px_to_cm, fps):
     
     return velocity_cm_s
 
+def estimate_velocity_optical_flow(prev_gray, curr_gray, mask, px_to_cm, fps, roi_pad=None):
+    """
+    Estimates average velocity in cm/s using Farneback Optical Flow within the mask.
+    
+    If roi_pad is given, flow is only computed on the mask's bounding box
+    grown by roi_pad pixels. This agrees with the full-frame result to
+    within FLOW_ROI_TOLERANCE (frames where the stream only just appeared
+    have no meaningful flow either way).
+    """
+    if mask is None or cv2.countNonZero(mask) == 0:
+        return 0.0
+    
+    if roi_pad is not None:
+        prev_gray, curr_gray, mask = crop_to_mask(prev_gray, curr_gray, mask, roi_pad)
+        
+    # Calculate Optical Flow
+    flow = cv2.calcOpticalFlowFarneback(prev_gray, curr_gray, None, *FARNEBACK_PARAMS)
+    
+    return mean_flow_velocity(flow, mask, px_to_cm, fps)
+
+class VelocityEstimator:
+    """
+    Strategy interface for stream velocity backends.
+    Subclasses implement estimate(), returning the mean stream velocity in cm/s
+    between two grayscale frames, measured inside the mask.
+    """
+    name = None
+    
+    def estimate(self, prev_gray, curr_gray, mask, px_to_cm, fps):
+        raise NotImplementedError
+
+class FarnebackVelocity(VelocityEstimator):
+    """Dense Farneback flow (reference backend)."""
+    name = "farneback"
+    
+    def __init__(self, roi_pad=FLOW_ROI_PAD):
+        # None computes flow over the full frame
+        self.roi_pad = roi_pad
+        
+    def estimate(self, prev_gray, curr_gray, mask, px_to_cm, fps):
+        return estimate_velocity_optical_flow(prev_gray, curr_gray, mask, px_to_cm, fps, roi_pad=self.roi_pad)
+
+class DISVelocity(VelocityEstimator):
+    """Dense Inverse Search optical flow in one of OpenCV's presets."""
+    PRESETS = {
+        "ultrafast": cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST,
+        "fast": cv2.DISOPTICAL_FLOW_PRESET_FAST,
+        "medium": cv2.DISOPTICAL_FLOW_PRESET_MEDIUM,
+    }
+    
+    def __init__(self, preset="fast", roi_pad=FLOW_ROI_PAD):
+        if preset not in self.PRESETS:
+            raise ValueError(f"Unknown DIS preset: {preset}")
+        self.name = f"dis-{preset}"
+        self.roi_pad = roi_pad
+        self.dis = cv2.DISOpticalFlow_create(self.PRESETS[preset])
+        
+    def estimate(self, prev_gray, curr_gray, mask, px_to_cm, fps):
+        if mask is None or cv2.countNonZero(mask) == 0:
+            return 0.0
+        
+        if self.roi_pad is not None:
+            prev_gray, curr_gray, mask = crop_to_mask(prev_gray, curr_gray, mask, self.roi_pad)
+            # DIS needs contiguous input
+            prev_gray = np.ascontiguousarray(prev_gray)
+            curr_gray = np.ascontiguousarray(curr_gray)
+            
+        flow = self.dis.calc(prev_gray, curr_gray, None)
+        return mean_flow_velocity(flow, mask, px_to_cm, fps)
+
+class LucasKanadeVelocity(VelocityEstimator):
+    """
+    Sparse pyramidal Lucas-Kanade on good features inside the mask.
+    Velocity is the mean displacement of the successfully tracked points.
+    """
+    name = "lk"
+    
+    def __init__(self, max_corners=200, quality_level=0.01, min_distance=3, win_size=(15, 15), max_level=3):
+        self.feature_params = dict(maxCorners=max_corners, qualityLevel=quality_level, minDistance=min_distance)
+        self.lk_params = dict(winSize=win_size, maxLevel=max_level,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        
+    def estimate(self, prev_gray, curr_gray, mask, px_to_cm, fps):
+        if mask is None or cv2.countNonZero(mask) == 0:
+            return 0.0
+        
+        points = cv2.goodFeaturesToTrack(prev_gray, mask=mask, **self.feature_params)
+        if points is None:
+            return 0.0
+        
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, curr_gray, points, None, **self.lk_params)
+        if next_points is None:
+            return 0.0
+        
+        tracked = status.ravel() == 1
+        if not np.any(tracked):
+            return 0.0
+        
+        displacement = np.linalg.norm((next_points - points).reshape(-1, 2)[tracked], axis=1)
+        return float(np.mean(displacement)) * px_to_cm * fps
+
+VELOCITY_BACKENDS = {
+    "farneback": FarnebackVelocity,
+    "dis-ultrafast": lambda: DISVelocity("ultrafast"),
+    "dis-fast": lambda: DISVelocity("fast"),
+    "dis-medium": lambda: DISVelocity("medium"),
+    "lk": LucasKanadeVelocity,
+}
+
+def create_velocity_estimator(backend="farneback"):
+    """
+    Returns a VelocityEstimator for a backend name (see VELOCITY_BACKENDS).
+    Estimator instances are passed through unchanged.
+    """
+    if isinstance(backend, VelocityEstimator):
+        return backend
+    if backend not in VELOCITY_BACKENDS:
+        raise ValueError(f"Unknown velocity backend: {backend}. Choose from {', '.join(VELOCITY_BACKENDS)}")
+    return VELOCITY_BACKENDS[backend]()
+
 class StreamTracker:
-    def __init__(self, px_to_cm):
+    def __init__(self, px_to_cm, velocity_estimator=None):
         self.px_to_cm = px_to_cm
+        # Backend name or VelocityEstimator; defaults to Farneback
+        self.velocity_estimator = create_velocity_estimator(velocity_estimator or "farneback")
         self.prev_frame_gray = None
     
-    def process(self, frame, mask, contour, fps):
+    def set_reference(self, gray):
+        """
+        Sets the frame the next velocity is measured against (grayscale),
+        for callers that skipped process() on the previous frame.
+        """
+        self.prev_frame_gray = gray
+    
+    def process(self, frame, mask, contour, fps, gray=None):
         """
         Track stream stats.
+        `gray` is the frame's grayscale if the caller already has it; it
+        must stay unchanged until the next process() call (it becomes the
+        optical flow reference).
         Returns: { 'area_cm2': float, 'velocity_cm_s': float, 'centroid': (x,y) }
         """
         if self.px_to_cm <= 0:
             raise ValueError("Invalid pixel_to_cm scale")
 
-        curr_frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        curr_frame_gray = gray if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         stats = {
             'area_px': 0,
@@ -75,7 +221,7 @@ class StreamTracker:
             
             # Velocity estimation
             if self.prev_frame_gray is not None:
-                vel = estimate_velocity_optical_flow(self.prev_frame_gray, curr_frame_gray, mask, self.px_to_cm, fps)
+                vel = self.velocity_estimator.estimate(self.prev_frame_gray, curr_frame_gray, mask, self.px_to_cm, fps)
                 stats['velocity_cm_s'] = vel
             else:
                 # First frame, no velocity yet
@@ -1,55 +1,118 @@
+import subprocess
+import tempfile
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 from .utils import draw_text
+from .preprocess import find_ffmpeg
+from .buffers import BufferPool
+
+# "mp4v": cv2.VideoWriter (fast, but browsers will not play it)
+# "h264": raw BGR frames piped into FFmpeg libx264/yuv420p/faststart, so the
+#         file is browser-ready without a second transcode
+VISUALIZER_ENCODERS = ("mp4v", "h264")
 
 class Visualizer:
-    def __init__(self, output_video_path, fps, frame_size):
+    def __init__(self, output_video_path, fps, frame_size, encoder="mp4v"):
+        """
+        Args:
+            output_video_path: Annotated video to write.
+            fps: Output frame rate.
+            frame_size: (width, height) of the frames passed to process_frame.
+            encoder: One of VISUALIZER_ENCODERS. "h264" falls back to "mp4v"
+                if FFmpeg cannot be started; check `browser_compatible`
+                after release() to know what was written.
+        """
+        if encoder not in VISUALIZER_ENCODERS:
+            raise ValueError(f"Unknown encoder '{encoder}'. Available: {', '.join(VISUALIZER_ENCODERS)}")
         self.output_path = output_video_path
         self.fps = fps
         self.frame_size = frame_size # (width, height)
+        self.writer = None
+        self.encoder_proc = None
+        self.encoder_stderr = None
+        self.browser_compatible = False
+        # Per-frame composite arrays, reused (frames are written synchronously)
+        self.buffers = BufferPool()
+        self.color_block = None
+        
+        if encoder == "h264":
+            self.encoder_proc = self._start_ffmpeg()
+            self.browser_compatible = self.encoder_proc is not None
         
-        # Initialize VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.writer = cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+        if self.encoder_proc is None:
+            # Initialize VideoWriter
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.writer = cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
     
-    def process_frame(self, frame, contour, flow_val, velocity, area, frame_idx, flow_history_df=None):
+    def _start_ffmpeg(self):
+        w, h = self.frame_size
+        # Same output settings as the backend's browser conversion; odd frame
+        # sizes are padded since yuv420p needs even dimensions
+        cmd = [
+            find_ffmpeg(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{w}x{h}', '-r', str(self.fps),
+            '-i', '-',
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-c:v', 'libx264',
+            '-preset', 'fast',
+            '-crf', '23',
+            '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart',
+            '-an',
+            self.output_path
+        ]
+        # stderr goes to a file: a full stderr pipe would stall FFmpeg and
+        # with it the frame writes
+        self.encoder_stderr = tempfile.TemporaryFile()
+        try:
+            return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.encoder_stderr)
+        except OSError as e:
+            self.encoder_stderr.close()
+            self.encoder_stderr = None
+            print(f"FFmpeg unavailable ({e}), writing mp4v instead")
+            return None
+    
+    def _write(self, vis_frame):
+        if self.writer is not None:
+            self.writer.write(vis_frame)
+            return
+        try:
+            self.encoder_proc.stdin.write(np.ascontiguousarray(vis_frame).data)
+        except (BrokenPipeError, ValueError):
+            # FFmpeg died; release() reports its error
+            self.browser_compatible = False
+    
+    def process_frame(self, frame, contour, flow_val, velocity, area, frame_idx, flow_history_df=None,
+                      stream_mask=None):
         """
         Draws overlays on the frame and writes to video.
+        `stream_mask` is the filled contour if the caller already has it
+        (FrameContext.stream_mask()); otherwise it is drawn here.
         """
         # 1. Create Blur Background
-        # Strong blur
-        blurred_bg = cv2.GaussianBlur(frame, (31, 31), 0)
+        # Strong blur, straight into the output frame
+        vis_frame = cv2.GaussianBlur(frame, (31, 31), 0, dst=self.buffers.get("vis", frame.shape))
         
         # 2. Masking
-        # We need the mask for the contour. 
-        # If contour is passed, regenerate mask or pass mask to this function?
-        # Ideally pass mask. But contour is available.
-        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        if contour is not None:
-             cv2.drawContours(mask, [contour], -1, 255, -1)
+        mask = stream_mask
+        if mask is None:
+            mask = self.buffers.zeros("mask", frame.shape[:2])
+            if contour is not None:
+                cv2.drawContours(mask, [contour], -1, 255, -1)
              
-        # 3. Stream Isolation and Colorization
-        # Stream pixels from original frame
-        stream_original = cv2.bitwise_and(frame, frame, mask=mask)
-        
-        # Color Overlay (e.g. Cyan/Blue tint)
-        # Create solid color block
-        color_block = np.zeros_like(frame)
-        color_block[:] = (255, 255, 0) # Cyan in BGR
-        
-        # Blend original stream with color block
-        stream_colored = cv2.addWeighted(stream_original, 0.7, color_block, 0.3, 0)
-        
-        # Mask the colored stream
-        stream_colored_masked = cv2.bitwise_and(stream_colored, stream_colored, mask=mask)
-        
-        # 4. Composite
-        # Inverse mask for background
-        mask_inv = cv2.bitwise_not(mask)
-        bg_masked = cv2.bitwise_and(blurred_bg, blurred_bg, mask=mask_inv)
-        
-        vis_frame = cv2.add(bg_masked, stream_colored_masked)
+        # 3. Stream Colorization
+        if contour is not None:
+            # Color Overlay (Cyan in BGR), created once
+            if self.color_block is None or self.color_block.shape != frame.shape:
+                self.color_block = np.empty_like(frame)
+                self.color_block[:] = (255, 255, 0)
+            # Blend original stream with color block
+            stream_colored = cv2.addWeighted(frame, 0.7, self.color_block, 0.3, 0,
+                                             dst=self.buffers.get("stream", frame.shape))
+            
+            # 4. Composite: colored stream over the blurred background
+            cv2.copyTo(stream_colored, mask, vis_frame)
         
         # Draw contour border for sharpness
         if contour is not None:
@@ -93,7 +156,21 @@ class Visualizer:
                 for i in range(len(points) - 1):
                     cv2.line(vis_frame, points[i], points[i+1], (0, 255, 255), 1)
                     
-        self.writer.write(vis_frame)
+        self._write(vis_frame)
         
     def release(self):
-        self.writer.release()
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.encoder_proc is not None:
+            proc, self.encoder_proc = self.encoder_proc, None
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            stderr, self.encoder_stderr = self.encoder_stderr, None
+            if proc.wait() != 0:
+                stderr.seek(0)
+                print(f"FFmpeg error: {stderr.read().decode(errors='replace')}")
+                self.browser_compatible = False
+            stderr.close()
@@ -0,0 +1,23 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.benchmark_suite import compare, case_id
+
+def _case(fps):
+    return {'fps': fps, 'peak_rss_mb': 100.0}
+
+def test_compare_flags_only_drops_past_threshold():
+    baseline = {
+        case_id("480p", 10, 1): _case(100.0),
+        case_id("720p", 10, 1): _case(50.0),
+        case_id("1080p", 10, 2): _case(20.0),
+    }
+    results = {
+        case_id("480p", 10, 1): _case(90.0),   # -10%, within 15%
+        case_id("720p", 10, 1): _case(40.0),   # -20%
+        case_id("1080p", 10, 2): _case(25.0),  # faster
+        case_id("4k", 10, 1): _case(5.0),      # not in baseline
+    }
+    assert compare(results, baseline, 0.15) == [case_id("720p", 10, 1)]
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import sys
 import os
 
@@ -26,3 +27,52 @@ def test_flow_estimation_logic():
     # df['flow_smooth'] = df['flow_ml_s'] (since len < 5)
     assert qmax == 200.0
     assert volume == 150.0 # Trapz (100+200)/2 * 1 = 150
+
+def test_flow_history_grows_and_is_columnar():
+    estimator = FlowEstimator(initial_capacity=2)
+    for i in range(10):
+        estimator.update(1.0, float(i), i / 30.0, i)
+    
+    assert len(estimator) == 10
+    history = estimator.history()
+    assert list(history['frame_id']) == list(range(10))
+    assert list(history['flow_ml_s']) == [float(i) for i in range(10)]
+    
+    df, metrics = estimator.get_results()
+    assert len(df) == 10
+    assert list(df['frame_id']) == list(range(10))
+
+def _feed_recording(estimator, n_frames, seed=0, first_frame=0):
+    # Silence, a noisy voiding phase, then silence again
+    rng = np.random.default_rng(seed)
+    for k in range(n_frames):
+        i = first_frame + k
+        area = max(0.0, rng.normal(0.5, 0.3)) if 30 < k < n_frames - 40 else 0.0
+        estimator.update(area, rng.normal(30.0, 10.0), i / 30.0, i)
+
+def test_online_metrics_match_full_pass():
+    batch = FlowEstimator()
+    online = FlowEstimator(online=True, initial_capacity=16)
+    _feed_recording(batch, 600)
+    _feed_recording(online, 600)
+    
+    df_batch, m_batch = batch.get_results()
+    df_online, m_online = online.get_results()
+    
+    assert list(df_online.columns) == list(df_batch.columns)
+    np.testing.assert_allclose(df_online['flow_smooth'], df_batch['flow_smooth'], atol=1e-9)
+    np.testing.assert_allclose(df_online['accumulated_volume_ml'], df_batch['accumulated_volume_ml'], atol=1e-9)
+    for key, value in m_batch.items():
+        assert m_online[key] == pytest.approx(value, abs=1e-9)
+
+def test_online_metrics_are_queryable_mid_recording():
+    online = FlowEstimator(online=True)
+    _feed_recording(online, 300)
+    provisional = online.current_metrics()
+    # Only the final `lag` frames are still waiting for their window
+    assert provisional['Voided_Volume'] > 0
+    
+    # Querying (and even finishing) does not disturb later updates
+    online.get_results()
+    _feed_recording(online, 300, seed=1, first_frame=300)
+    assert online.current_metrics()['Voided_Volume'] >= provisional['Voided_Volume']
@@ -0,0 +1,62 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.segmentation import StreamSegmenter
+from src.tracking import StreamTracker
+from src.frame_analysis import FrameAnalyzer
+from tests.test_segmentation import synthetic_stream_frames
+
+FPS = 30.0
+
+def recording(n=120):
+    """Noisy static scene, a straight stream in the middle."""
+    return synthetic_stream_frames(n, noise=3, sway=0)
+
+def test_context_matches_separate_stages():
+    analyzer = FrameAnalyzer(0.05, idle_stride=1)
+    segmenter = StreamSegmenter()
+    tracker = StreamTracker(0.05)
+    
+    streams = 0
+    for frame in recording():
+        ctx = analyzer.analyse(frame, FPS)
+        
+        mask = segmenter.process_frame(frame)
+        contour = segmenter.get_stream_contour(mask)
+        stats = tracker.process(frame, mask, contour, FPS)
+        
+        assert np.array_equal(ctx.mask, mask)
+        assert ctx.stats == stats
+        assert ctx.centroid == stats['centroid']
+        if contour is not None:
+            streams += 1
+            assert np.array_equal(ctx.contour, contour)
+            x, y, w, h = ctx.bbox
+            assert np.all(ctx.contour[:, 0, 0] >= x) and np.all(ctx.contour[:, 0, 0] < x + w)
+            assert np.all(ctx.contour[:, 0, 1] >= y) and np.all(ctx.contour[:, 0, 1] < y + h)
+            assert ctx.stream_mask()[ctx.centroid[1], ctx.centroid[0]] == 255
+        else:
+            assert ctx.contour is None and ctx.bbox is None
+    assert streams > 50
+
+def test_context_reuses_buffers():
+    analyzer = FrameAnalyzer(0.05, idle_stride=1)
+    frames = list(recording(n=40))
+    
+    ctx = analyzer.analyse(frames[0], FPS)
+    grays = [ctx.gray]
+    mask = ctx.mask
+    for frame in frames[1:]:
+        prev_gray = ctx.gray.copy()
+        prev_buffer = ctx.gray
+        ctx = analyzer.analyse(frame, FPS)
+        grays.append(ctx.gray)
+        # Same mask array every frame; the gray alternates between two,
+        # so the previous frame's gray (the flow reference) is intact
+        assert ctx.mask is mask
+        assert ctx.gray is not prev_buffer
+        assert np.array_equal(prev_buffer, prev_gray)
+    assert len({id(g) for g in grays}) == 2
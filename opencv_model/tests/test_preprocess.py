@@ -0,0 +1,97 @@
+import pytest
+import os
+import sys
+import shutil
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.preprocess import (read_video_frames, PrefetchFrameReader, FFmpegFrameReader, check_complete,
+                            TruncatedVideoError, find_ffmpeg)
+
+SAMPLE_VIDEO_PATH = "data/sample_videos/synthetic_test.mp4"
+
+def _ffmpeg_available():
+    ffmpeg = find_ffmpeg()
+    return os.path.exists(ffmpeg) or shutil.which(ffmpeg) is not None
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_VIDEO_PATH), reason="sample video missing")
+def test_prefetch_matches_inline_decode():
+    inline = [(i, f.copy()) for i, f in read_video_frames(SAMPLE_VIDEO_PATH, resize_shape=(320, 240))]
+    prefetched = [(i, f.copy()) for i, f in read_video_frames(SAMPLE_VIDEO_PATH, resize_shape=(320, 240), prefetch_depth=3)]
+    
+    assert len(inline) == len(prefetched)
+    for (i_a, f_a), (i_b, f_b) in zip(inline, prefetched):
+        assert i_a == i_b
+        assert f_b.shape == (240, 320, 3)
+        assert np.array_equal(f_a, f_b)
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_VIDEO_PATH), reason="sample video missing")
+def test_start_frame_seeks_exactly():
+    inline = [f.copy() for _, f in read_video_frames(SAMPLE_VIDEO_PATH, resize_shape=(320, 240))]
+    for depth in (0, 3):
+        frames = [(i, f.copy()) for i, f in read_video_frames(SAMPLE_VIDEO_PATH, resize_shape=(320, 240),
+                                                              prefetch_depth=depth, start_frame=100, max_frames=5)]
+        # Frame ids stay absolute, max_frames counts from start_frame
+        assert [i for i, _ in frames] == [100, 101, 102, 103, 104]
+        for i, frame in frames:
+            assert np.array_equal(frame, inline[i])
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_VIDEO_PATH), reason="sample video missing")
+def test_prefetch_reuses_ring_slots():
+    reader = PrefetchFrameReader(SAMPLE_VIDEO_PATH, depth=2, max_frames=6)
+    seen = set()
+    for _, frame in reader:
+        seen.add(frame.__array_interface__['data'][0])
+    # Only the preallocated slots are ever handed out
+    assert len(seen) <= 2
+
+def test_prefetch_rejects_tiny_depth():
+    with pytest.raises(ValueError):
+        PrefetchFrameReader(SAMPLE_VIDEO_PATH, depth=1)
+
+def test_check_complete_detects_truncation():
+    check_complete("v.mp4", 150, 150)
+    check_complete("v.mp4", 149, 150)  # within tolerance
+    check_complete("v.mp4", 10, 0)     # frame count unknown
+    with pytest.raises(TruncatedVideoError):
+        check_complete("v.mp4", 75, 150)
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_VIDEO_PATH), reason="sample video missing")
+def test_require_complete_accepts_full_video():
+    frames = sum(1 for _ in read_video_frames(SAMPLE_VIDEO_PATH, prefetch_depth=2, require_complete=True))
+    assert frames == 150
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_VIDEO_PATH) or not _ffmpeg_available(),
+                    reason="sample video or FFmpeg missing")
+def test_ffmpeg_decoder_scales_during_decode():
+    reference = [f.copy() for _, f in read_video_frames(SAMPLE_VIDEO_PATH, resize_shape=(320, 240))]
+    reader = FFmpegFrameReader(SAMPLE_VIDEO_PATH, (320, 240), require_complete=True)
+    assert reader.start()
+    
+    buffers = set()
+    frames = []
+    for i, frame in reader:
+        assert i == len(frames)
+        assert frame.shape == (240, 320, 3)
+        buffers.add(frame.__array_interface__['data'][0])
+        frames.append(frame.copy())
+    
+    # Same frames as the cv2 path, decoded into one reused buffer
+    assert len(frames) == len(reference)
+    assert len(buffers) == 1
+    diff = np.mean([np.abs(a.astype(np.int16) - b).mean() for a, b in zip(reference, frames)])
+    assert diff < 5
+
+def test_ffmpeg_decoder_falls_back_to_cv2():
+    reader = FFmpegFrameReader(SAMPLE_VIDEO_PATH, (320, 240), ffmpeg="/nonexistent/ffmpeg")
+    assert not reader.start()
+    assert reader.error
+    
+    # A video FFmpeg cannot open goes to the cv2 path, which raises as usual
+    with pytest.raises(ValueError):
+        list(read_video_frames("missing.mp4", resize_shape=(320, 240), decoder="ffmpeg"))
+
+def test_unknown_decoder_rejected():
+    with pytest.raises(ValueError):
+        list(read_video_frames(SAMPLE_VIDEO_PATH, decoder="gstreamer"))
@@ -0,0 +1,72 @@
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.segmentation import StreamSegmenter
+from src.tracking import StreamTracker
+from src.flow_estimation import FlowEstimator
+from src.sampling import AdaptiveSampler, IDLE_STATS
+from tests.test_segmentation import synthetic_stream_frames
+
+FPS = 30.0
+
+def recording():
+    """Noisy static scene, a straight stream in the middle third; yields (index, frame)."""
+    return enumerate(synthetic_stream_frames(240, stream_frames=(90, 170), noise=3, sway=0))
+
+def run_pipeline(sampler):
+    segmenter = StreamSegmenter()
+    tracker = StreamTracker(0.05)
+    estimator = FlowEstimator(online=True)
+    for frame_idx, frame in recording():
+        fgmask, x_offset = segmenter.foreground(frame)
+        if sampler is None or sampler.should_analyse(frame, fgmask):
+            if sampler is not None and sampler.reference is not None:
+                tracker.set_reference(sampler.reference)
+            mask = segmenter.select_stream(fgmask, x_offset, frame.shape)
+            contour = segmenter.get_stream_contour(mask)
+            stats = tracker.process(frame, mask, contour, FPS)
+            if sampler is not None:
+                sampler.observe(contour is not None or segmenter.locked_x_center is not None)
+        else:
+            stats = IDLE_STATS
+        estimator.update(stats['area_cm2'], stats['velocity_cm_s'], frame_idx / FPS, frame_idx)
+    return estimator.get_results()
+
+def test_adaptive_sampling_keeps_metrics():
+    df_full, metrics_full = run_pipeline(None)
+    sampler = AdaptiveSampler(idle_stride=4)
+    df_sampled, metrics_sampled = run_pipeline(sampler)
+
+    # Lead-in and tail were mostly skipped
+    assert sampler.skipped > 80
+    # Every frame is still on the timeline, at its own timestamp
+    assert np.array_equal(df_full['timestamp_s'].values, df_sampled['timestamp_s'].values)
+
+    assert metrics_full['Qmax'] > 0
+    for key, value in metrics_full.items():
+        assert metrics_sampled[key] == pytest.approx(value, rel=0.02, abs=1.0 / FPS)
+
+def test_sampler_stays_active_while_stream_present():
+    sampler = AdaptiveSampler(idle_stride=4, hold_frames=3)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    empty = np.zeros((48, 64), dtype=np.uint8)
+
+    # Idle: every 4th frame
+    assert [sampler.should_analyse(frame, empty) for _ in range(8)] == [False, False, False, True] * 2
+
+    sampler.observe(True)
+    assert all(sampler.should_analyse(frame, empty) for _ in range(3))
+    for _ in range(3):
+        sampler.observe(False)
+    # Hold expired: back to idle
+    assert not sampler.should_analyse(frame, empty)
+
+    # Enough foreground is analysed right away
+    busy = empty.copy()
+    busy[10:30, 20:25] = 255
+    assert sampler.should_analyse(frame, busy)
+    assert sampler.reference is not None
@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.segmentation import StreamSegmenter
+
+def synthetic_stream_frames(n=120, w=640, h=480, stream_frames=(20, 100), seed=0, noise=0, sway=6):
+    """
+    Static noisy background with a thin, textured vertical stream moving
+    down 5 px/frame. Shared by the other test modules.
+
+    Args:
+        noise: Per-frame pixel noise amplitude (sensor noise), 0 for none.
+        sway: Amplitude in px of the stream's slow horizontal sway.
+    """
+    rng = np.random.default_rng(seed)
+    bg = rng.integers(60, 90, (h, w, 3), dtype=np.uint8)
+    stream_texture = rng.integers(150, 255, (h, 12, 3), dtype=np.uint8)
+    for i in range(n):
+        if noise:
+            frame = np.clip(bg.astype(np.int16) + rng.integers(-noise, noise + 1, (h, w, 1)), 0, 255).astype(np.uint8)
+        else:
+            frame = bg.copy()
+        if stream_frames[0] <= i < stream_frames[1]:
+            x = 300 + int(sway * np.sin(i / 20))
+            texture = np.roll(stream_texture, i * 5, axis=0)
+            frame[60:420, x:x + 12] = texture[60:420]
+        yield frame
+
+def test_locked_crop_matches_full_frame():
+    frames = synthetic_stream_frames()
+    full = StreamSegmenter(roi_crop=False)
+    cropped = StreamSegmenter(roi_crop=True)
+    
+    used_crop = False
+    for frame in frames:
+        m_full = full.process_frame(frame)
+        m_crop = cropped.process_frame(frame)
+        used_crop = used_crop or cropped.crop_window is not None
+        
+        assert m_crop.shape == m_full.shape
+        union = np.count_nonzero(m_full | m_crop)
+        if union:
+            assert np.count_nonzero(m_full & m_crop) / union > 0.95
+    
+    assert used_crop
+
+def test_crop_released_when_lock_lost():
+    frames = synthetic_stream_frames(n=130, stream_frames=(20, 80))
+    segmenter = StreamSegmenter(roi_crop=True)
+    for frame in frames:
+        segmenter.process_frame(frame)
+    
+    assert segmenter.locked_x_center is None
+    assert segmenter.crop_window is None
+
+def test_selection_keeps_thin_components_and_hands_over_stream():
+    rng = np.random.default_rng(1)
+    fgmask = np.zeros((480, 640), dtype=np.uint8)
+    # Hundreds of small noise blobs, plus one thin vertical stream
+    for x, y in zip(rng.integers(0, 630, 400), rng.integers(0, 470, 400)):
+        fgmask[y:y + 4, x:x + 4] = 255
+    fgmask[60:420, 300:310] = 255
+    
+    segmenter = StreamSegmenter()
+    mask = segmenter.select_stream(fgmask, 0, (480, 640, 3))
+    
+    contour = segmenter.stream_contour
+    assert contour is not None
+    x, y, w, h = cv2.boundingRect(contour)
+    assert 285 <= x <= 300 and w <= 30 and h >= 300
+    assert mask[240, 305] == 255
+    # Only thin candidates of at least min_candidate_px pixels made it into the mask
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    assert n_labels > 2
+    widths, heights = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+    assert np.all(stats[1:, cv2.CC_STAT_AREA] >= segmenter.min_candidate_px)
+    assert np.all(np.maximum(widths, heights) > 2 * np.minimum(widths, heights))
+    assert abs(segmenter.locked_x_center - 305) <= 5
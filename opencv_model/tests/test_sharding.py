@@ -0,0 +1,69 @@
+import pytest
+import os
+import sys
+import contextlib
+import io
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.generate_test_video import generate_video
+from src.sharding import plan_shards, analyse_shard, analyse_sharded, stitch_shards
+
+FPS = 30.0
+PX_TO_CM = 0.0855
+SIZE = (640, 480)
+
+@pytest.fixture(scope="module")
+def stream_video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("sharding") / "stream.mp4")
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_video(path, duration=10, seed=1, lead_in=1, tail=1, style="stream")
+    return path
+
+def test_plan_shards_adds_warmup_prefix():
+    assert plan_shards(900, 3, 100) == [(0, 0, 300), (200, 300, 600), (500, 600, None)]
+    # Explicit boundaries (out of range ones are dropped)
+    assert plan_shards(900, 1, 50, boundaries=[400, 0, 1000]) == [(0, 0, 400), (350, 400, None)]
+    # No shard shorter than its warm-up
+    assert len(plan_shards(900, 8, 300)) == 3
+    assert plan_shards(100, 4, 500) == [(0, 0, None)]
+    with pytest.raises(ValueError):
+        plan_shards(900, 0, 100)
+
+def test_full_warmup_reproduces_sequential(stream_video):
+    sequential = analyse_shard(stream_video, 0, 0, None, SIZE, FPS, PX_TO_CM)
+    # A warm-up from frame 0 replays the sequential state exactly
+    parts = [analyse_shard(stream_video, 0, 0, 200, SIZE, FPS, PX_TO_CM),
+             analyse_shard(stream_video, 0, 200, None, SIZE, FPS, PX_TO_CM)]
+
+    df_seq, metrics_seq = stitch_shards([sequential], FPS).get_results()
+    df, metrics = stitch_shards(parts, FPS).get_results()
+    assert df.equals(df_seq)
+    assert metrics == metrics_seq
+
+def test_sharded_matches_sequential(stream_video):
+    sequential = analyse_shard(stream_video, 0, 0, None, SIZE, FPS, PX_TO_CM)
+    df_seq, metrics_seq = stitch_shards([sequential], FPS).get_results()
+
+    plan = plan_shards(len(df_seq), 2, 150)
+    estimator, counts = analyse_sharded(stream_video, plan, SIZE, FPS, PX_TO_CM)
+    df, metrics = estimator.get_results()
+
+    # Same timeline as the sequential run
+    assert list(df.columns) == list(df_seq.columns)
+    assert df['frame_id'].tolist() == df_seq['frame_id'].tolist()
+    assert counts['analysed'] + counts['skipped'] == len(df) + 150
+
+    assert metrics_seq['Qmax'] > 0
+    for key in ("Qmax", "Voided_Volume", "Average_Flow_Rate"):
+        assert metrics[key] == pytest.approx(metrics_seq[key], rel=0.05)
+    for key in ("Flow_Time", "Voiding_Time", "Hesitancy"):
+        assert metrics[key] == pytest.approx(metrics_seq[key], abs=0.5)
+
+def test_stitch_rejects_gaps():
+    def part(ids):
+        return {'frame_id': np.asarray(ids), 'area_cm2': np.zeros(len(ids)), 'velocity_cm_s': np.zeros(len(ids))}
+    assert len(stitch_shards([part([0, 1, 2]), part([3, 4])], FPS)) == 5
+    with pytest.raises(ValueError):
+        stitch_shards([part([0, 1, 2]), part([4, 5])], FPS)
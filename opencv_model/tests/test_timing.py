@@ -0,0 +1,48 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.timing import StageTimer, NULL_TIMER, format_timings
+from src.segmentation import StreamSegmenter
+from tests.test_segmentation import synthetic_stream_frames
+
+def test_summary_percentiles():
+    timer = StageTimer()
+    for ms in range(1, 101):
+        timer.add("decode", ms / 1000.0)
+    timer.add("ensemble", 0.5)
+    
+    summary = timer.summary()
+    assert list(summary) == ["decode", "ensemble"]
+    assert summary["decode"]["count"] == 100
+    assert summary["decode"]["p50_ms"] == pytest.approx(50.5)
+    assert summary["decode"]["p95_ms"] == pytest.approx(95.05)
+    assert summary["decode"]["max_ms"] == pytest.approx(100.0)
+    assert summary["ensemble"]["total_s"] == pytest.approx(0.5)
+    assert "decode" in format_timings(summary)
+
+def test_stage_and_lap_record_one_sample_per_call():
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.stage("mog2"):
+            pass
+        mark = timer.now()
+        timer.lap("morphology", mark)
+    summary = timer.summary()
+    assert summary["mog2"]["count"] == 3
+    assert summary["morphology"]["count"] == 3
+
+def test_segmenter_records_per_frame_stages():
+    timer = StageTimer()
+    segmenter = StreamSegmenter(timer=timer)
+    frames = list(synthetic_stream_frames(20))
+    for frame in frames:
+        segmenter.process_frame(frame)
+    summary = timer.summary()
+    for stage in ("mog2", "morphology", "contour_selection"):
+        assert summary[stage]["count"] == len(frames)
+    
+    # The default null timer records nothing
+    assert NULL_TIMER.summary() == {}
@@ -0,0 +1,51 @@
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tracking import (estimate_velocity_optical_flow, FLOW_ROI_PAD, FLOW_ROI_TOLERANCE,
+                          VELOCITY_BACKENDS, create_velocity_estimator)
+
+def textured_stream(i, w=640, h=480, x=300, speed=5, seed=0):
+    """Gray frame with a thin textured stream moving down `speed` px/frame."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(60, 90, (h, w), dtype=np.uint8)
+    texture = rng.integers(150, 255, (h, 12), dtype=np.uint8)
+    frame[60:420, x:x + 12] = np.roll(texture, i * speed, axis=0)[60:420]
+    mask = np.zeros((h, w), dtype=np.uint8)
+    mask[60:420, x:x + 12] = 255
+    return frame, mask
+
+def test_roi_flow_matches_full_frame():
+    for i in range(1, 6):
+        prev_gray, _ = textured_stream(i - 1)
+        curr_gray, mask = textured_stream(i)
+        
+        v_full = estimate_velocity_optical_flow(prev_gray, curr_gray, mask, 1.0, 1.0)
+        v_roi = estimate_velocity_optical_flow(prev_gray, curr_gray, mask, 1.0, 1.0, roi_pad=FLOW_ROI_PAD)
+        
+        assert v_full > 0
+        assert abs(v_roi - v_full) / v_full < FLOW_ROI_TOLERANCE
+
+def test_roi_flow_empty_mask():
+    prev_gray, _ = textured_stream(0)
+    curr_gray, _ = textured_stream(1)
+    mask = np.zeros_like(curr_gray)
+    assert estimate_velocity_optical_flow(prev_gray, curr_gray, mask, 1.0, 30.0, roi_pad=FLOW_ROI_PAD) == 0.0
+
+@pytest.mark.parametrize("backend", list(VELOCITY_BACKENDS))
+def test_velocity_backends_track_stream(backend):
+    estimator = create_velocity_estimator(backend)
+    prev_gray, _ = textured_stream(0)
+    curr_gray, mask = textured_stream(1)
+    
+    # Texture moves 5 px/frame; 1 cm/px at 1 fps -> ~5 cm/s.
+    # Accuracy is compared by scripts/benchmark_velocity.py; this is a sanity check.
+    vel = estimator.estimate(prev_gray, curr_gray, mask, 1.0, 1.0)
+    assert 1.0 < vel < 7.5
+
+def test_unknown_velocity_backend():
+    with pytest.raises(ValueError):
+        create_velocity_estimator("nope")
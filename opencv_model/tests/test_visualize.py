@@ -0,0 +1,65 @@
+import pytest
+import sys
+import os
+import shutil
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.visualize import Visualizer, find_ffmpeg
+
+def _ffmpeg_available():
+    ffmpeg = find_ffmpeg()
+    return os.path.exists(ffmpeg) or shutil.which(ffmpeg) is not None
+
+def _write_frames(visualizer, n_frames, size):
+    w, h = size
+    for i in range(n_frames):
+        frame = np.full((h, w, 3), (i * 5) % 255, dtype=np.uint8)
+        visualizer.process_frame(frame, None, 1.0, 2.0, 0.5, i)
+    visualizer.release()
+
+@pytest.mark.skipif(not _ffmpeg_available(), reason="FFmpeg not available")
+def test_h264_encoder_writes_browser_ready_video(tmp_path):
+    out = str(tmp_path / "annotated.mp4")
+    # Odd height exercises the even-size padding yuv420p needs
+    visualizer = Visualizer(out, 30, (320, 241), encoder="h264")
+    _write_frames(visualizer, 20, (320, 241))
+    
+    assert visualizer.browser_compatible
+    cap = cv2.VideoCapture(out)
+    assert cap.isOpened()
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    codec = "".join(chr((fourcc >> (8 * k)) & 0xFF) for k in range(4))
+    assert codec.lower() in ("avc1", "h264")
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 20
+    cap.release()
+
+def test_mp4v_encoder_is_not_browser_ready(tmp_path):
+    out = str(tmp_path / "annotated.mp4")
+    visualizer = Visualizer(out, 30, (320, 240))
+    _write_frames(visualizer, 5, (320, 240))
+    assert not visualizer.browser_compatible
+    assert os.path.getsize(out) > 0
+
+def test_unknown_encoder_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Visualizer(str(tmp_path / "x.mp4"), 30, (320, 240), encoder="vp9")
+
+def test_stream_mask_from_caller_matches_drawn_contour(tmp_path):
+    frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    contour = np.array([[[150, 20]], [[170, 20]], [[170, 220]], [[150, 220]]], dtype=np.int32)
+    stream_mask = np.zeros((240, 320), dtype=np.uint8)
+    cv2.drawContours(stream_mask, [contour], -1, 255, -1)
+    
+    written = []
+    for kwargs in ({}, {'stream_mask': stream_mask}):
+        visualizer = Visualizer(str(tmp_path / "annotated.mp4"), 30, (320, 240))
+        visualizer._write = lambda vis_frame: written.append(vis_frame.copy())
+        visualizer.process_frame(frame, contour, 1.0, 2.0, 0.5, 0, **kwargs)
+        visualizer.release()
+    
+    assert np.array_equal(written[0], written[1])
+    # Stream tinted, background blurred
+    assert not np.array_equal(written[0][120, 160], frame[120, 160])